@@ -7,7 +7,36 @@ BASE_DIR = Path(__file__).resolve().parent
 OUTPUT_DIR = BASE_DIR / "output"
 RENDERS_DIR = OUTPUT_DIR / "renders"
 ZIPS_DIR = OUTPUT_DIR / "zips"
+CACHE_DIR = OUTPUT_DIR / "cache"
+RESTORED_DIR = OUTPUT_DIR / "restored"  # destino de "unzip" (un subdirectorio por zip)
+RESULTS_DIR = OUTPUT_DIR / "results"    # resultado de cada job (results/<job_id>/<fichero>), servido por HTTP
+
+# Caché de renders (escenas con "seed"): LRU por tamaño total en disco
+RENDER_CACHE_MAX_BYTES = 256 * 1024 * 1024
 
 # Paralelismo
-DEFAULT_WORKERS = 0  # 0 => usa os.cpu_count()
+DEFAULT_WORKERS = 0  # 0 => usa os.cpu_count() (tamaño del pool compartido)
+
+# Cola de jobs: en espera como máximo MAX_QUEUED_JOBS (el resto => "queue_full")
+# y en ejecución a la vez como máximo MAX_CONCURRENT_JOBS[kind] por tipo
+MAX_QUEUED_JOBS = 32
+MAX_CONCURRENT_JOBS = {"render": 1, "render_sequence": 1, "zip_outputs": 1, "unzip": 1}
+
+# Registro persistente de jobs (consultas "status" tras reinicios)
+JOBS_DB = OUTPUT_DIR / "jobs.sqlite3"
+
+
+# Trazas por job (JSON de Chrome trace; acción "stats"). Con "profile": true
+# en el mensaje se ejecuta con cProfile una de cada TRACE_PROFILE_EVERY tareas.
+TRACES_DIR = OUTPUT_DIR / "traces"
+TRACE_PROFILE_EVERY = 8
+
+# Progreso por WS: como mucho un mensaje de cada tipo (progress, preview) por
+# cliente y job cada PROGRESS_MIN_INTERVAL_S; entre medias gana el último
+PROGRESS_MIN_INTERVAL_S = 0.1
 
+# Descarga de resultados por HTTP (GET /results/<job_id>/<fichero>) en el
+# puerto del WS + HTTP_PORT_OFFSET (--http-port; 0 => sin HTTP). Se guardan
+# los resultados de los últimos RESULTS_MAX_JOBS jobs.
+HTTP_PORT_OFFSET = 100
+RESULTS_MAX_JOBS = 256
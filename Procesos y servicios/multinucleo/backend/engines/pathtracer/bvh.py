@@ -0,0 +1,173 @@
+"""
+BVH (bounding volume hierarchy) de esferas para el path tracer.
+
+Se construye una vez por render en el proceso padre (prepare_scene) y viaja a
+los workers dentro del RenderSetup. Nodos en arrays planos (picklables y
+convertibles a NumPy) con partición por mediana del eje más largo.
+Recorrido escalar (closest_hit) y por paquetes (numpy_tracer.trace_packet).
+"""
+from array import array
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+# Con pocas esferas el bucle lineal es más barato que recorrer nodos
+BVH_MIN_SPHERES = 8
+LEAF_SIZE = 4
+
+
+@dataclass
+class BVH:
+    bmin: array    # 3 floats por nodo
+    bmax: array    # 3 floats por nodo
+    left: array    # hijo izquierdo (-1 => hoja)
+    right: array   # hijo derecho
+    start: array   # hoja: primer índice en prims
+    count: array   # hoja: nº de esferas
+    prims: array   # índices de esfera ordenados por hoja
+
+    @property
+    def nodes(self) -> int:
+        return len(self.left)
+
+def build_bvh(spheres: Sequence, leaf_size: int = LEAF_SIZE) -> BVH:
+    bvh = BVH(array("d"), array("d"), array("i"), array("i"), array("i"), array("i"), array("i"))
+    if not spheres:
+        return bvh
+    idx = list(range(len(spheres)))
+    lo = [tuple(s.center[k] - s.radius for k in range(3)) for s in spheres]
+    hi = [tuple(s.center[k] + s.radius for k in range(3)) for s in spheres]
+
+    def new_node(items: List[int]) -> int:
+        n = len(bvh.left)
+        bvh.bmin.extend(min(lo[i][k] for i in items) for k in range(3))
+        bvh.bmax.extend(max(hi[i][k] for i in items) for k in range(3))
+        bvh.left.append(-1)
+        bvh.right.append(-1)
+        bvh.start.append(0)
+        bvh.count.append(0)
+        return n
+
+    # construcción iterativa (sin recursión: escenas de miles de esferas)
+    root = new_node(idx)
+    stack = [(root, idx)]
+    while stack:
+        node, items = stack.pop()
+        if len(items) <= leaf_size:
+            bvh.start[node] = len(bvh.prims)
+            bvh.count[node] = len(items)
+            bvh.prims.extend(items)
+            continue
+        cmin = [min(spheres[i].center[k] for i in items) for k in range(3)]
+        cmax = [max(spheres[i].center[k] for i in items) for k in range(3)]
+        axis = max(range(3), key=lambda k: cmax[k] - cmin[k])
+        items = sorted(items, key=lambda i: spheres[i].center[axis])
+        mid = len(items) // 2
+        l_items, r_items = items[:mid], items[mid:]
+        l = new_node(l_items)
+        r = new_node(r_items)
+        bvh.left[node] = l
+        bvh.right[node] = r
+        stack.append((l, l_items))
+        stack.append((r, r_items))
+    return bvh
+
+def want_bvh(scene: dict, n_spheres: int) -> bool:
+    """scene["accel"]: "bvh" (siempre), "none" (nunca) o "auto" (por defecto, según nº de esferas)."""
+    accel = scene.get("accel", "auto")
+    if accel not in ("auto", "bvh", "none"):
+        raise ValueError("accel must be one of ('auto', 'bvh', 'none')")
+    if accel == "auto":
+        return n_spheres >= BVH_MIN_SPHERES
+    return accel == "bvh"
+
+def closest_hit(bvh: BVH, spheres: Sequence, ray_o, ray_d, t_max: float, hit_fn) -> Optional[object]:
+    """Hit más cercano entre las esferas del BVH (hit_fn = tracer.hit_sphere)."""
+    if not bvh.left:
+        return None
+    ox, oy, oz = ray_o
+    ix = 1.0/ray_d[0] if ray_d[0] != 0.0 else 1e30
+    iy = 1.0/ray_d[1] if ray_d[1] != 0.0 else 1e30
+    iz = 1.0/ray_d[2] if ray_d[2] != 0.0 else 1e30
+    bmin, bmax = bvh.bmin, bvh.bmax
+    left, right, start, count, prims = bvh.left, bvh.right, bvh.start, bvh.count, bvh.prims
+
+    closest = None
+    stack = [0]
+    while stack:
+        n = stack.pop()
+        b = 3*n
+        t0 = (bmin[b]-ox)*ix
+        t1 = (bmax[b]-ox)*ix
+        tn, tf = (t0, t1) if t0 < t1 else (t1, t0)
+        t0 = (bmin[b+1]-oy)*iy
+        t1 = (bmax[b+1]-oy)*iy
+        if t0 > t1:
+            t0, t1 = t1, t0
+        tn = t0 if t0 > tn else tn
+        tf = t1 if t1 < tf else tf
+        t0 = (bmin[b+2]-oz)*iz
+        t1 = (bmax[b+2]-oz)*iz
+        if t0 > t1:
+            t0, t1 = t1, t0
+        tn = t0 if t0 > tn else tn
+        tf = t1 if t1 < tf else tf
+        if tn > tf or tf < 0.0 or tn > t_max:
+            continue
+        if left[n] < 0:
+            s0 = start[n]
+            for k in range(s0, s0 + count[n]):
+                h = hit_fn(ray_o, ray_d, spheres[prims[k]], t_max=t_max)
+                if h and h.t < t_max:
+                    t_max = h.t
+                    closest = h
+        else:
+            stack.append(left[n])
+            stack.append(right[n])
+    return closest
+
+def packet_hit(bvh: BVH, o, d, centers, radii, closest, hit_id, t_min: float):
+    """
+    Recorrido por paquetes (NumPy): cada nodo se visita con el subconjunto de
+    rayos activos que cruzan su caja. Actualiza closest / hit_id in situ.
+    """
+    import numpy as np
+
+    if not bvh.left:
+        return
+    bmin = np.frombuffer(bvh.bmin).reshape(-1, 3)
+    bmax = np.frombuffer(bvh.bmax).reshape(-1, 3)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inv = np.where(d != 0.0, 1.0/d, 1e30)
+    a_all = np.einsum("ij,ij->i", d, d)
+
+    stack = [(0, np.arange(o.shape[0]))]
+    while stack:
+        n, rays = stack.pop()
+        t0 = (bmin[n] - o[rays]) * inv[rays]
+        t1 = (bmax[n] - o[rays]) * inv[rays]
+        tn = np.minimum(t0, t1).max(axis=1)
+        tf = np.maximum(t0, t1).min(axis=1)
+        rays = rays[(tn <= tf) & (tf >= 0.0) & (tn <= closest[rays])]
+        if rays.shape[0] == 0:
+            continue
+        if bvh.left[n] < 0:
+            s0 = bvh.start[n]
+            for k in bvh.prims[s0:s0 + bvh.count[n]]:
+                oc = o[rays] - centers[k]
+                dd = d[rays]
+                a = a_all[rays]
+                b = np.einsum("ij,ij->i", oc, dd)
+                c = np.einsum("ij,ij->i", oc, oc) - radii[k]*radii[k]
+                disc = b*b - a*c
+                ok = disc >= 0
+                sq = np.sqrt(np.where(ok, disc, 0.0))
+                cl = closest[rays]
+                root = (-b - sq) / a
+                bad = (root < t_min) | (root > cl)
+                root = np.where(bad, (-b + sq) / a, root)
+                ok &= ~((root < t_min) | (root > cl))
+                closest[rays[ok]] = root[ok]
+                hit_id[rays[ok]] = k
+        else:
+            stack.append((bvh.left[n], rays))
+            stack.append((bvh.right[n], rays))
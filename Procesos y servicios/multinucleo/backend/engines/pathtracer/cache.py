@@ -0,0 +1,93 @@
+"""
+Caché de renders direccionada por contenido.
+
+La clave es el SHA-256 del JSON canónico de la escena (claves ordenadas,
+números normalizados, sin campos que no cambian la imagen) más una versión
+del motor. Solo es cacheable una escena con "seed": sin semilla fija el
+render no es reproducible. Los ficheros viven en `<dir>/<clave>.<ext>` y se
+expulsan por LRU (mtime, que se refresca en cada acierto) al superar max_bytes.
+"""
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+from backend.utils.files import ensure_dir
+
+# Subir al cambiar cualquier cosa que altere los píxeles para el mismo seed
+CACHE_VERSION = 2
+
+# No afectan al resultado (el BVH da la misma imagen bit a bit)
+_IGNORED_KEYS = ("accel",)
+
+
+def _canonical(value):
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)  # 1 y 1.0 => misma clave
+    if isinstance(value, dict):
+        return {k: _canonical(v) for k, v in value.items() if k not in _IGNORED_KEYS}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    raise TypeError(f"valor no serializable en la escena: {type(value).__name__}")
+
+def is_cacheable(scene: dict) -> bool:
+    return scene.get("seed") is not None
+
+def scene_key(scene: dict, variant: str = "") -> str:
+    """Clave estable de la escena; `variant` distingue salidas (p.ej. formato)."""
+    payload = json.dumps(
+        {"v": CACHE_VERSION, "scene": _canonical(scene), "variant": variant},
+        sort_keys=True, separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class RenderCache:
+    def __init__(self, cache_dir: Path, max_bytes: int):
+        self.dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def path(self, key: str, ext: str) -> Path:
+        return self.dir / f"{key}.{ext}"
+
+    def get(self, key: str, ext: str) -> Optional[Path]:
+        p = self.path(key, ext)
+        with self._lock:
+            if not p.exists():
+                return None
+            os.utime(p)  # LRU: marca como usado recientemente
+        return p
+
+    def put(self, key: str, ext: str, data) -> Path:
+        ensure_dir(self.dir)
+        p = self.path(key, ext)
+        tmp = p.with_suffix(p.suffix + ".tmp")
+        tmp.write_bytes(data)
+        with self._lock:
+            os.replace(tmp, p)  # atómico: nunca se sirve un fichero a medias
+            self._evict()
+        return p
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for p in self.dir.iterdir():
+            if p.is_file() and not p.name.endswith(".tmp"):
+                st = p.stat()
+                entries.append((st.st_mtime, st.st_size, p))
+                total += st.st_size
+        entries.sort()
+        for _, size, p in entries:
+            if total <= self.max_bytes:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+
+    def size_bytes(self) -> int:
+        if not self.dir.exists():
+            return 0
+        return sum(p.stat().st_size for p in self.dir.iterdir() if p.is_file())
@@ -0,0 +1,291 @@
+"""
+Render repartido entre varios nodos multinucleo (modo coordinador).
+
+El coordinador parte el frame en tiles y los reparte entre su propio pool
+(un "nodo" más, que escribe directamente en el framebuffer compartido) y los
+nodos registrados, que son servidores multinucleo normales: a cada uno le
+llegan lotes por WS con {"action": "render_tiles"} y devuelve un frame
+binario por tile ([batch 12 bytes ASCII][índice uint32 BE][rayos uint64 BE][RGB])
+y al final {"type": "tiles_done", "batch", "rays"}. Los rayos se cuentan por
+tile aceptado en el framebuffer: las copias repetidas que llegan tarde no
+suman.
+
+- La escena va con "seed" y "tile_size" fijados por el coordinador: cada tile
+  sale idéntico lo trace quien lo trace, así que se puede repetir.
+- Cada nodo pide lotes a la cola común a su ritmo (NODE_IN_FLIGHT lotes en
+  vuelo, de ~workers tiles): los rápidos se llevan más.
+- Un nodo que se cae, falla o tarda más de NODE_BATCH_TIMEOUT_S en un lote
+  se descarta y sus tiles sin terminar vuelven a la cola.
+- Al final, con la cola vacía, los nodos ociosos repiten los tiles que aún
+  están en vuelo en otro nodo (lo que tarde un nodo lento): gana la primera
+  copia que llega.
+"""
+import asyncio
+import itertools
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import websockets
+
+from backend.engines.pathtracer.framebuffer import SharedFramebuffer
+from backend.engines.pathtracer.scheduler import in_flight_limit, make_tiles
+from backend.engines.pathtracer.tracer import (
+    CANCEL_POLL_S, _render_tiles, cancel_batches, job_context, prepare_scene
+)
+from backend.jobs.cancel import JobCancelled
+from backend.jobs.protocols import unpack_tile
+from backend.utils.files import ensure_dir, safe_name
+
+NODE_IN_FLIGHT = 2
+NODE_BATCH_TIMEOUT_S = 30.0
+NODE_CONNECT_TIMEOUT_S = 5.0
+
+
+class _TilePool:
+    """Estado de los tiles del frame: cola, en vuelo (con qué nodos) y terminados."""
+
+    def __init__(self, tiles: Sequence[tuple], on_done: Callable[[tuple, int], None]):
+        self.tiles = list(tiles)
+        self.todo = deque(t[0] for t in self.tiles)
+        self.running: Dict[int, List[str]] = {}  # índice => nodos que lo están trazando
+        self.started: Dict[int, float] = {}    # índice => primera vez que se lanzó
+        self.done = set()
+        self.on_done = on_done
+        self.changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return len(self.done) == len(self.tiles)
+
+    def take(self, n: int, node: str) -> List[tuple]:
+        """Hasta n tiles de la cola; si está vacía, copias de los que llevan más tiempo en otro nodo."""
+        batch = []
+        while self.todo and len(batch) < n:
+            i = self.todo.popleft()
+            if i not in self.done:
+                batch.append(i)
+        if not batch:
+            # cola vacía: repetir lo que sigue en vuelo en un solo nodo, el más antiguo primero
+            stragglers = sorted((i for i, owners in self.running.items() if owners != [node]
+                                 and len(owners) == 1), key=self.started.get)
+            batch = stragglers[:n]
+        now = time.perf_counter()
+        for i in batch:
+            self.running.setdefault(i, []).append(node)
+            self.started.setdefault(i, now)
+        return [self.tiles[i] for i in batch]
+
+    def complete(self, index: int, rays: int) -> bool:
+        """Marca un tile terminado; False si ya lo había traído otra copia."""
+        self.running.pop(index, None)
+        if index in self.done:
+            return False
+        self.done.add(index)
+        self.on_done(self.tiles[index], rays)
+        self.changed.set()
+        return True
+
+    def release(self, batch: Sequence[tuple], node: str):
+        """Tiles de un lote que no llegó: vuelven a la cola si nadie más los está trazando."""
+        for tile in batch:
+            owners = self.running.get(tile[0])
+            if owners is None or node not in owners:
+                continue
+            owners.remove(node)
+            if not owners:
+                del self.running[tile[0]]
+                self.todo.appendleft(tile[0])
+        self.changed.set()
+
+    async def wait_change(self):
+        self.changed.clear()
+        await self.changed.wait()
+
+class _NodeStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.tiles = 0
+        self.rays = 0
+        self.batches = 0
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {"node": self.name, "tiles": self.tiles, "rays": self.rays,
+                "batches": self.batches, "error": self.error}
+
+async def _local_runner(pool: _TilePool, ex: Executor, ctx, seed: int, st: _NodeStats, pending: set):
+    """Una ranura del pool local: un tile cada vez, escrito por el worker en el framebuffer."""
+    while not pool.finished:
+        batch = pool.take(1, st.name)
+        if not batch:
+            await pool.wait_change()
+            continue
+        fut = ex.submit(_render_tiles, ctx, batch, seed)
+        pending.add(fut)
+        try:
+            result = await asyncio.wrap_future(fut)
+        finally:
+            if fut.done():  # si sigue trazando, render_distributed lo cancela y espera
+                pending.discard(fut)
+        st.batches += 1
+        for tile, rays in result:
+            if pool.complete(tile[0], rays):
+                st.tiles += 1
+                st.rays += rays
+
+async def _remote_node(url: str, pool: _TilePool, fb: SharedFramebuffer, scene: dict, st: _NodeStats):
+    """Un nodo remoto: lotes de ~workers tiles, NODE_IN_FLIGHT a la vez, hasta acabar o caerse."""
+    batches: Dict[str, Tuple[List[tuple], asyncio.Future]] = {}
+    ids = itertools.count(1)
+
+    async def reader(ws):
+        async for msg in ws:
+            if isinstance(msg, bytes):
+                bid, index, rays, rgb = unpack_tile(msg)
+                if bid in batches and index not in pool.done:
+                    fb.write_tile(pool.tiles[index], rgb)
+                    if pool.complete(index, rays):
+                        st.tiles += 1
+                        st.rays += rays
+                continue
+            m = json.loads(msg)
+            entry = batches.get(m.get("batch"))
+            if entry is None or entry[1].done():
+                continue
+            if m.get("type") == "tiles_done":
+                entry[1].set_result(int(m.get("rays", 0)))
+            elif m.get("type") == "error":
+                entry[1].set_exception(RuntimeError(m.get("error")))
+        raise ConnectionError("node closed the connection")
+
+    async def slot(ws, size: int):
+        while not pool.finished:
+            batch = pool.take(size, st.name)
+            if not batch:
+                await pool.wait_change()
+                continue
+            bid = f"{next(ids):012d}"
+            fut = asyncio.get_running_loop().create_future()
+            batches[bid] = (batch, fut)
+            try:
+                await ws.send(json.dumps({"action": "render_tiles", "batch": bid, "scene": scene,
+                                          "tiles": [list(t) for t in batch]}))
+                await asyncio.wait_for(fut, NODE_BATCH_TIMEOUT_S)
+                st.batches += 1
+            finally:
+                pool.release(batch, st.name)  # lo que no llegó vuelve a la cola
+                del batches[bid]
+
+    try:
+        async with websockets.connect(url, max_size=None, open_timeout=NODE_CONNECT_TIMEOUT_S) as ws:
+            hello = json.loads(await asyncio.wait_for(ws.recv(), NODE_CONNECT_TIMEOUT_S))
+            size = max(1, int(hello.get("workers", 1)))
+            read = asyncio.ensure_future(reader(ws))
+            slots = asyncio.ensure_future(asyncio.gather(*(slot(ws, size) for _ in range(NODE_IN_FLIGHT))))
+            try:
+                done, _ = await asyncio.wait({read, slots}, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    t.result()  # propaga la caída del nodo
+            finally:
+                for t in (read, slots):
+                    t.cancel()
+                # los finally de cada ranura devuelven sus tiles a la cola
+                await asyncio.gather(read, slots, return_exceptions=True)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        st.error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+
+async def render_distributed(
+    scene: dict,
+    out_dir: Path,
+    nodes: Sequence[str],
+    workers: int = 0,
+    on_progress: Callable[[int, str], None] = lambda pct, msg: None,
+    stats: Optional[dict] = None,
+    executor: Optional[Executor] = None,
+    should_stop: Callable[[], bool] = lambda: False
+) -> Tuple[str, bytes]:
+    """
+    Como render_pathtracer_ppm pero repartiendo los tiles entre el pool local
+    y los nodos `nodes` (URLs ws://). Corre en el event loop del servidor.
+    Si se pasa `stats`, se rellena con rays, seconds, rays_per_sec, tiles y
+    "nodes": [{node, tiles, rays, batches, error}] ("local" = este servidor).
+    """
+    from backend.jobs.pool import borrow_pool
+
+    ensure_dir(out_dir)
+    workers = workers or (os.cpu_count() or 2)
+    setup = await asyncio.to_thread(prepare_scene, scene, workers)
+    w, h = setup.width, setup.height
+    # los nodos preparan la misma escena: misma semilla y mismo tiling
+    shared_scene = dict(scene, seed=setup.seed, tile_size=setup.tile_size)
+    tiles = make_tiles(w, h, setup.tile_size)
+    on_progress(0, f"Starting distributed render {w}x{h} ({len(tiles)} tiles) on {len(nodes) + 1} nodes…")
+
+    step = max(1, len(tiles)//20)
+    rays_total = [0]
+
+    def on_done(tile, rays):
+        rays_total[0] += rays
+        done = len(pool.done)
+        if done % step == 0 or done == len(tiles):
+            on_progress(int(done*100/len(tiles)), f"Rendered tiles: {done}/{len(tiles)}")
+
+    pool = _TilePool(tiles, on_done)
+    local = _NodeStats("local")
+    remotes = [_NodeStats(url) for url in nodes]
+    t0 = time.perf_counter()
+    fb = SharedFramebuffer.create(w, h)
+    try:
+        with borrow_pool(executor, workers) as ex, job_context(setup, fb.name, "ppm") as (ctx, token):
+            pending = set()
+            tasks = [asyncio.ensure_future(_local_runner(pool, ex, ctx, setup.seed, local, pending))
+                     for _ in range(in_flight_limit(workers))]
+            tasks += [asyncio.ensure_future(_remote_node(st.name, pool, fb, shared_scene, st)) for st in remotes]
+            try:
+                while not pool.finished:
+                    if should_stop():
+                        raise JobCancelled(f"render cancelled after {len(pool.done)}/{len(tiles)} tiles")
+                    failed = [t for t in tasks if t.done() and not t.cancelled() and t.exception() is not None]
+                    if failed:
+                        raise failed[0].exception()
+                    alive = [t for t in tasks if not t.done()]
+                    await asyncio.wait(alive, timeout=CANCEL_POLL_S, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for t in tasks:
+                    t.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                # copias locales que aún se estén trazando: que no escriban tras cerrar el framebuffer
+                await asyncio.to_thread(cancel_batches, token, list(pending))
+
+        elapsed = time.perf_counter() - t0
+        # rayos de los tiles aceptados, de cualquier nodo
+        rays = rays_total[0]
+        if stats is not None:
+            stats.update({
+                "engine": setup.engine,
+                "workers": workers,
+                "tiles": len(tiles),
+                "tile_size": setup.tile_size,
+                "rays": rays,
+                "seconds": elapsed,
+                "rays_per_sec": rays / elapsed if elapsed > 0 else 0.0,
+                "spp_avg": rays / (w*h),
+                "nodes": [local.to_dict()] + [st.to_dict() for st in remotes],
+            })
+        filename = safe_name(f"render_{w}x{h}.ppm")
+        view = fb.view()
+        (out_dir / filename).write_bytes(view)
+        file_bytes = bytes(view)
+        view.release()
+    finally:
+        fb.close()
+
+    on_progress(100, f"Render done: {filename}")
+    return filename, file_bytes
@@ -0,0 +1,190 @@
+"""
+Framebuffers en memoria compartida (multiprocessing.shared_memory).
+
+- SharedFramebuffer: el fichero P6 final (cabecera + cuerpo RGB). Los workers
+  escriben sus tiles directamente en su sitio; el padre solo vuelca un
+  memoryview a disco, sin unir filas ni concatenar cabecera.
+- Accumulator: buffer float de acumulación (sumas RGB, sumas de luminancia^2 y
+  nº de muestras por píxel) para el render progresivo. Cada pasada reparte
+  tiles disjuntos, así que los workers suman sin carreras.
+"""
+import math
+from multiprocessing import shared_memory
+from typing import Optional
+
+
+def clamp(x, lo=0.0, hi=0.999):
+    return lo if x < lo else hi if x > hi else x
+
+def to_byte(x: float) -> int:
+    """Color lineal => byte con gamma 2 (igual para todos los motores)."""
+    return int(256*clamp(math.sqrt(x) if x > 0 else 0.0))
+
+def luminance(r: float, g: float, b: float) -> float:
+    return 0.2126*r + 0.7152*g + 0.0722*b
+
+def ppm_header(w: int, h: int) -> bytes:
+    return f"P6\n{w} {h}\n255\n".encode("ascii")
+
+def attach_shm(name: str) -> shared_memory.SharedMemory:
+    """
+    Abre un segmento creado por el proceso padre. Los workers del pool
+    comparten el resource_tracker del padre, así que solo el padre (owner)
+    hace unlink.
+    """
+    return shared_memory.SharedMemory(name=name)
+
+class SharedFramebuffer:
+    """Fichero P6 completo en memoria compartida: [cabecera][w*h*3 bytes RGB]."""
+    def __init__(self, w: int, h: int, shm: shared_memory.SharedMemory, owner: bool):
+        self.w = w
+        self.h = h
+        self.shm = shm
+        self.owner = owner
+        self.body_offset = len(ppm_header(w, h))
+        self.size = self.body_offset + w*h*3
+
+    @classmethod
+    def create(cls, w: int, h: int) -> "SharedFramebuffer":
+        header = ppm_header(w, h)
+        shm = shared_memory.SharedMemory(create=True, size=len(header) + w*h*3)
+        shm.buf[:len(header)] = header
+        return cls(w, h, shm, owner=True)
+
+    @classmethod
+    def attach(cls, w: int, h: int, name: str) -> "SharedFramebuffer":
+        return cls(w, h, attach_shm(name), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def write_tile(self, tile, rgb):
+        """Copia las filas RGB de un tile (index, x0, y0, tw, th) a su posición."""
+        _, x0, y0, tw, th = tile
+        buf = self.shm.buf
+        row = tw*3
+        for j in range(th):
+            off = self.body_offset + ((y0+j)*self.w + x0)*3
+            buf[off:off+row] = rgb[j*row:(j+1)*row]
+
+    def read_tile(self, tile) -> bytes:
+        """Filas RGB de un tile (inversa de write_tile)."""
+        _, x0, y0, tw, th = tile
+        buf = self.shm.buf
+        row = tw*3
+        out = bytearray(row*th)
+        for j in range(th):
+            off = self.body_offset + ((y0+j)*self.w + x0)*3
+            out[j*row:(j+1)*row] = buf[off:off+row]
+        return bytes(out)
+
+    def view(self) -> memoryview:
+        """memoryview del fichero P6 completo (válido hasta close())."""
+        return self.shm.buf[:self.size]
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+class Accumulator:
+    """
+    Framebuffer float: sumas RGB, sumas de luminancia^2 y nº de muestras por
+    píxel. Vive en un bytearray local o sobre un SharedMemory (buf).
+    """
+    def __init__(self, w: int, h: int, buf=None):
+        self.w = w
+        self.h = h
+        n = w*h
+        self._mv = memoryview(buf if buf is not None else bytearray(self.nbytes(w, h)))
+        self.sums = self._mv[:8*n*3].cast("d")
+        self.sq = self._mv[8*n*3:8*n*4].cast("d")
+        self.count = self._mv[8*n*4:8*n*5].cast("d")
+
+    @staticmethod
+    def nbytes(w: int, h: int) -> int:
+        return 8*w*h*5
+
+    def release(self):
+        """Suelta los memoryviews (necesario antes de cerrar el SharedMemory)."""
+        for mv in (self.sums, self.sq, self.count, self._mv):
+            mv.release()
+
+    def add_tile(self, tile, sums, sq, spp: int):
+        _, x0, y0, tw, th = tile
+        w = self.w
+        S, Q, C = self.sums, self.sq, self.count
+        for j in range(th):
+            p = (y0+j)*w + x0
+            for i in range(tw):
+                k = j*tw + i
+                S[3*(p+i)] += sums[3*k]
+                S[3*(p+i)+1] += sums[3*k+1]
+                S[3*(p+i)+2] += sums[3*k+2]
+                Q[p+i] += sq[k]
+                C[p+i] += spp
+
+    def noise(self) -> Optional[float]:
+        """
+        Error estándar medio de la luminancia por píxel (unidades lineales).
+        None si aún no hay >= 2 muestras por píxel (la varianza no es estimable).
+        """
+        total = 0.0
+        n_px = self.w*self.h
+        S, Q, C = self.sums, self.sq, self.count
+        for p in range(n_px):
+            n = C[p]
+            if n < 2:
+                return None
+            mean = luminance(S[3*p], S[3*p+1], S[3*p+2]) / n
+            var = max(0.0, (Q[p] - n*mean*mean) / (n - 1))  # varianza muestral
+            total += math.sqrt(var/n)
+        return total / n_px
+
+    def resolve_into(self, out, offset: int = 0):
+        """Tonemapping de todo el framebuffer a RGB bytes en out[offset:]."""
+        S, C = self.sums, self.count
+        for p in range(self.w*self.h):
+            inv = 1.0 / (C[p] or 1.0)
+            q = offset + 3*p
+            out[q] = to_byte(S[3*p]*inv)
+            out[q+1] = to_byte(S[3*p+1]*inv)
+            out[q+2] = to_byte(S[3*p+2]*inv)
+
+    def to_ppm(self) -> bytes:
+        out = bytearray(ppm_header(self.w, self.h))
+        offset = len(out)
+        out.extend(bytes(self.w*self.h*3))
+        self.resolve_into(out, offset)
+        return bytes(out)
+
+    def preview_ppm(self, max_side: int) -> bytes:
+        """PPM reducido (promedio por bloques) con el lado mayor <= max_side."""
+        f = max(1, math.ceil(max(self.w, self.h) / max(1, max_side)))
+        pw = math.ceil(self.w / f)
+        ph = math.ceil(self.h / f)
+        S, C = self.sums, self.count
+        out = bytearray(pw*ph*3)
+        for by in range(ph):
+            for bx in range(pw):
+                r = g = b = 0.0
+                n = 0
+                for y in range(by*f, min(self.h, (by+1)*f)):
+                    for x in range(bx*f, min(self.w, (bx+1)*f)):
+                        p = y*self.w + x
+                        inv = 1.0 / (C[p] or 1.0)
+                        r += S[3*p]*inv
+                        g += S[3*p+1]*inv
+                        b += S[3*p+2]*inv
+                        n += 1
+                q = 3*(by*pw + bx)
+                out[q] = to_byte(r/n)
+                out[q+1] = to_byte(g/n)
+                out[q+2] = to_byte(b/n)
+        return ppm_header(pw, ph) + bytes(out)
+
+def create_accumulator_shm(w: int, h: int):
+    """(SharedMemory a ceros, Accumulator sobre él) para compartir con los workers."""
+    shm = shared_memory.SharedMemory(create=True, size=Accumulator.nbytes(w, h))
+    return shm, Accumulator(w, h, shm.buf)
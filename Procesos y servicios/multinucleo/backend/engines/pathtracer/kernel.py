@@ -0,0 +1,222 @@
+"""
+Kernel escalar del path tracer: un camino por llamada, iterativo y con floats
+sueltos en variables locales (sin tuplas por operación ni un Hit por
+intersección). La escena se aplana una vez por setup en listas por campo
+(FlatScene); el BVH se recorre con la misma pila que bvh.closest_hit.
+
+Mismo estimador y mismo orden de consumo del RNG que tracer.ray_color (la
+referencia recursiva): con la misma semilla ambos dan el mismo color salvo
+redondeo.
+"""
+import math
+from typing import Optional
+
+T_MIN = 0.001
+T_FAR = 1e9
+TWO_PI = 2.0*math.pi
+
+# Ruleta rusa: probabilidad de supervivencia acotada (ver tracer.ray_color)
+RR_MIN_P = 0.05
+RR_MAX_P = 0.95
+
+
+def random_unit_vector(random):
+    """Dirección uniforme en la esfera sin rechazo (z uniforme y ángulo); normal + esto = coseno."""
+    z = 2.0*random() - 1.0
+    a = TWO_PI*random()
+    s = math.sqrt(max(0.0, 1.0 - z*z))
+    return s*math.cos(a), s*math.sin(a), z
+
+class FlatScene:
+    """Escena de un RenderSetup en listas planas de floats, lista para el kernel."""
+    __slots__ = ("n", "cx", "cy", "cz", "r2", "inv_r", "ar", "ag", "ab",
+                 "gy", "gr", "gg", "gb", "bvh", "max_depth", "rr_below")
+
+    def __init__(self, setup):
+        spheres = setup.spheres
+        self.n = len(spheres)
+        self.cx = [float(s.center[0]) for s in spheres]
+        self.cy = [float(s.center[1]) for s in spheres]
+        self.cz = [float(s.center[2]) for s in spheres]
+        self.r2 = [float(s.radius)*float(s.radius) for s in spheres]
+        self.inv_r = [1.0/float(s.radius) for s in spheres]
+        self.ar = [float(s.albedo[0]) for s in spheres]
+        self.ag = [float(s.albedo[1]) for s in spheres]
+        self.ab = [float(s.albedo[2]) for s in spheres]
+        self.gy = float(setup.ground_y)
+        self.gr, self.gg, self.gb = (float(c) for c in setup.ground_albedo)
+        b = setup.bvh
+        self.bvh = None if b is None or not b.left else (
+            b.bmin.tolist(), b.bmax.tolist(), b.left.tolist(), b.right.tolist(),
+            b.start.tolist(), b.count.tolist(), b.prims.tolist()
+        )
+        self.max_depth = setup.max_depth
+        self.rr_below = setup.rr_below
+
+def flat_scene(setup) -> FlatScene:
+    """FlatScene del setup, construida la primera vez y guardada en él (no es un campo)."""
+    flat = setup.__dict__.get("_flat")
+    if flat is None:
+        flat = setup.__dict__["_flat"] = FlatScene(setup)
+    return flat
+
+def _closest_bvh(fs: FlatScene, ox, oy, oz, dx, dy, dz, t_max):
+    """(t, índice de esfera) más cercano vía BVH; índice -1 si no hay hit. d unitario."""
+    bmin, bmax, left, right, start, count, prims = fs.bvh
+    cx, cy, cz, r2 = fs.cx, fs.cy, fs.cz, fs.r2
+    ix = 1.0/dx if dx != 0.0 else 1e30
+    iy = 1.0/dy if dy != 0.0 else 1e30
+    iz = 1.0/dz if dz != 0.0 else 1e30
+    best = -1
+    stack = [0]
+    pop = stack.pop
+    push = stack.append
+    while stack:
+        n = pop()
+        b = 3*n
+        t0 = (bmin[b]-ox)*ix
+        t1 = (bmax[b]-ox)*ix
+        if t0 < t1:
+            tn, tf = t0, t1
+        else:
+            tn, tf = t1, t0
+        t0 = (bmin[b+1]-oy)*iy
+        t1 = (bmax[b+1]-oy)*iy
+        if t0 > t1:
+            t0, t1 = t1, t0
+        if t0 > tn:
+            tn = t0
+        if t1 < tf:
+            tf = t1
+        t0 = (bmin[b+2]-oz)*iz
+        t1 = (bmax[b+2]-oz)*iz
+        if t0 > t1:
+            t0, t1 = t1, t0
+        if t0 > tn:
+            tn = t0
+        if t1 < tf:
+            tf = t1
+        if tn > tf or tf < 0.0 or tn > t_max:
+            continue
+        if left[n] < 0:
+            s0 = start[n]
+            for j in range(s0, s0 + count[n]):
+                k = prims[j]
+                ocx = ox - cx[k]
+                ocy = oy - cy[k]
+                ocz = oz - cz[k]
+                hb = ocx*dx + ocy*dy + ocz*dz
+                disc = hb*hb - (ocx*ocx + ocy*ocy + ocz*ocz - r2[k])
+                if disc < 0.0:
+                    continue
+                sq = math.sqrt(disc)
+                root = -hb - sq
+                if root < T_MIN or root > t_max:
+                    root = -hb + sq
+                    if root < T_MIN or root > t_max:
+                        continue
+                t_max = root
+                best = k
+        else:
+            push(left[n])
+            push(right[n])
+    return t_max, best
+
+def trace_path(fs: FlatScene, ox: float, oy: float, oz: float, dx: float, dy: float, dz: float, random,
+               depth: Optional[int] = None):
+    """
+    Color (r, g, b) de un camino desde o en la dirección unitaria d, con
+    hasta `depth` (por defecto fs.max_depth) rebotes difusos. random =
+    rng.random del tile.
+    """
+    sqrt = math.sqrt
+    n = fs.n
+    cx, cy, cz, r2, inv_r = fs.cx, fs.cy, fs.cz, fs.r2, fs.inv_r
+    gy = fs.gy
+    rr_below = fs.rr_below
+    bvh = fs.bvh
+    tr = tg = tb = 1.0  # atenuación acumulada
+
+    for left in range(fs.max_depth if depth is None else depth, 0, -1):
+        if bvh is not None:
+            t_best, hit = _closest_bvh(fs, ox, oy, oz, dx, dy, dz, T_FAR)
+        else:
+            t_best = T_FAR
+            hit = -1
+            for k in range(n):
+                ocx = ox - cx[k]
+                ocy = oy - cy[k]
+                ocz = oz - cz[k]
+                hb = ocx*dx + ocy*dy + ocz*dz
+                disc = hb*hb - (ocx*ocx + ocy*ocy + ocz*ocz - r2[k])
+                if disc < 0.0:
+                    continue
+                sq = sqrt(disc)
+                root = -hb - sq
+                if root < T_MIN or root > t_best:
+                    root = -hb + sq
+                    if root < T_MIN or root > t_best:
+                        continue
+                t_best = root
+                hit = k
+
+        # suelo (plano y = gy)
+        if dy >= 1e-8 or dy <= -1e-8:
+            t = (gy - oy)/dy
+            if T_MIN <= t <= t_best:
+                t_best = t
+                hit = -2
+
+        if hit == -1:
+            # cielo: degradado según la altura de la dirección
+            s = 0.5*(dy + 1.0)
+            return tr*(1.0 - 0.5*s), tg*(1.0 - 0.3*s), tb
+
+        px = ox + dx*t_best
+        py = oy + dy*t_best
+        pz = oz + dz*t_best
+        if hit >= 0:
+            ir = inv_r[hit]
+            nx = (px - cx[hit])*ir
+            ny = (py - cy[hit])*ir
+            nz = (pz - cz[hit])*ir
+            ar = fs.ar[hit]
+            ag = fs.ag[hit]
+            ab = fs.ab[hit]
+        else:
+            nx = nz = 0.0
+            ny = 1.0 if dy < 0 else -1.0
+            ar, ag, ab = fs.gr, fs.gg, fs.gb
+
+        if left <= rr_below:
+            p = ar if ar > ag else ag
+            if ab > p:
+                p = ab
+            p = RR_MIN_P if p < RR_MIN_P else RR_MAX_P if p > RR_MAX_P else p
+            if random() >= p:
+                return 0.0, 0.0, 0.0
+            ar /= p
+            ag /= p
+            ab /= p
+        tr *= ar
+        tg *= ag
+        tb *= ab
+
+        # rebote difuso: normal + vector unitario aleatorio (sin rechazo)
+        z = 2.0*random() - 1.0
+        a = TWO_PI*random()
+        s = sqrt(max(0.0, 1.0 - z*z))
+        dx = nx + s*math.cos(a)
+        dy = ny + s*math.sin(a)
+        dz = nz + z
+        L = sqrt(dx*dx + dy*dy + dz*dz)
+        if L < 1e-12:
+            dx, dy, dz = nx, ny, nz
+        else:
+            dx /= L
+            dy /= L
+            dz /= L
+        ox, oy, oz = px, py, pz
+
+    # agota la profundidad: negro (igual que la referencia recursiva)
+    return 0.0, 0.0, 0.0
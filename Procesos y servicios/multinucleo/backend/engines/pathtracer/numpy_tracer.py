@@ -0,0 +1,234 @@
+"""
+Motor vectorizado (NumPy) del path tracer.
+
+En lugar de trazar rayo a rayo, traza paquetes completos (tile x spp)
+como arrays: intersección esfera/plano en lote, rebote difuso en lote y
+terminación por profundidad con máscaras. Misma escena y mismo modelo de
+sombreado que el motor escalar => imágenes estadísticamente equivalentes.
+"""
+from array import array
+from typing import Callable, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy es opcional: solo lo necesita engine="numpy"
+    np = None
+
+from backend.engines.pathtracer.bvh import packet_hit
+from backend.engines.pathtracer.tracer import ADAPTIVE_MIN_LUM, RR_MAX_P, RR_MIN_P, RenderSetup
+from backend.jobs.cancel import JobCancelled
+
+
+T_MIN = 0.001
+T_FAR = 1e9
+LUMA = (0.2126, 0.7152, 0.0722)
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("engine 'numpy' requiere numpy (pip install numpy)")
+
+def _unit(v):
+    L = np.sqrt(np.einsum("ij,ij->i", v, v))
+    L[L == 0] = 1.0
+    return v / L[:, None]
+
+def _random_unit_vector(rng, n: int):
+    # Misma distribución que kernel.random_unit_vector (uniforme en la
+    # esfera): dirección gaussiana normalizada.
+    return _unit(rng.standard_normal((n, 3)))
+
+def _sky(d):
+    u = _unit(d)
+    t = 0.5*(u[:, 1] + 1.0)
+    return np.stack([
+        (1.0-t)*1.0 + t*0.5,
+        (1.0-t)*1.0 + t*0.7,
+        (1.0-t)*1.0 + t*1.0,
+    ], axis=1)
+
+def _hit_spheres_linear(o, d, centers, radii, closest, hit_id):
+    """Intersección de todos los rayos contra todas las esferas (actualiza closest / hit_id in situ)."""
+    a = np.einsum("ij,ij->i", d, d)
+    for k in range(radii.shape[0]):
+        oc = o - centers[k]
+        b = np.einsum("ij,ij->i", oc, d)
+        c = np.einsum("ij,ij->i", oc, oc) - radii[k]*radii[k]
+        disc = b*b - a*c
+        ok = disc >= 0
+        sq = np.sqrt(np.where(ok, disc, 0.0))
+        root = (-b - sq) / a
+        bad = (root < T_MIN) | (root > closest)
+        root = np.where(bad, (-b + sq) / a, root)
+        ok &= ~((root < T_MIN) | (root > closest))
+        closest[ok] = root[ok]
+        hit_id[ok] = k
+
+def trace_packet(orig, dirs, setup: RenderSetup, max_depth: int, rng, stop: Optional[Callable[[], bool]] = None):
+    """
+    Traza un paquete de N rayos (arrays (N,3)) y devuelve el color (N,3).
+    Los rayos se compactan en cada rebote: solo siguen activos los que golpean
+    (y, con setup.rr_start, los que sobreviven a la ruleta rusa).
+    stop(): se consulta antes de cada rebote; si es True => JobCancelled.
+    """
+    spheres = setup.spheres
+    centers = np.array([s.center for s in spheres], dtype=np.float64).reshape(-1, 3)
+    radii = np.array([s.radius for s in spheres], dtype=np.float64)
+    albedos = np.array([s.albedo for s in spheres], dtype=np.float64).reshape(-1, 3)
+    ground_y = setup.ground_y
+    ground_albedo = np.array(setup.ground_albedo, dtype=np.float64)
+
+    n = orig.shape[0]
+    color = np.zeros((n, 3))
+    atten = np.ones((n, 3))
+    idx = np.arange(n)
+    o = orig
+    d = dirs
+
+    for bounce in range(max_depth):
+        m = idx.shape[0]
+        if m == 0:
+            break
+        if stop is not None and stop():
+            raise JobCancelled("packet")
+
+        closest = np.full(m, T_FAR)
+        hit_id = np.full(m, -1)  # -1 => nada, -2 => suelo, >=0 => esfera
+
+        if setup.bvh is not None:
+            packet_hit(setup.bvh, o, d, centers, radii, closest, hit_id, T_MIN)
+        else:
+            _hit_spheres_linear(o, d, centers, radii, closest, hit_id)
+
+        dy = d[:, 1]
+        safe_dy = np.where(np.abs(dy) < 1e-8, 1.0, dy)
+        tg = (ground_y - o[:, 1]) / safe_dy
+        okg = (np.abs(dy) >= 1e-8) & (tg >= T_MIN) & (tg <= closest)
+        closest = np.where(okg, tg, closest)
+        hit_id = np.where(okg, -2, hit_id)
+
+        miss = hit_id == -1
+        if miss.any():
+            color[idx[miss]] = atten[idx[miss]] * _sky(d[miss])
+
+        hit = ~miss
+        idx = idx[hit]
+        if idx.shape[0] == 0:
+            break
+        o = o[hit]
+        d = d[hit]
+        t = closest[hit]
+        hid = hit_id[hit]
+
+        p = o + d*t[:, None]
+        is_ground = hid == -2
+        sph = ~is_ground
+        normal = np.empty_like(p)
+        alb = np.empty_like(p)
+        normal[sph] = (p[sph] - centers[hid[sph]]) / radii[hid[sph]][:, None]
+        alb[sph] = albedos[hid[sph]]
+        normal[is_ground] = 0.0
+        normal[is_ground, 1] = np.where(d[is_ground, 1] < 0, 1.0, -1.0)
+        alb[is_ground] = ground_albedo
+
+        if setup.rr_start and bounce >= setup.rr_start:
+            surv = np.clip(alb.max(axis=1), RR_MIN_P, RR_MAX_P)
+            live = rng.random(idx.shape[0]) < surv
+            idx = idx[live]
+            p = p[live]
+            normal = normal[live]
+            alb = alb[live] / surv[live, None]
+
+        atten[idx] *= alb
+        o = p
+        d = _unit(normal + _random_unit_vector(rng, idx.shape[0]))
+
+    # rayos que agotan max_depth aportan negro (igual que el motor escalar)
+    return color
+
+def _trace_pixels(setup: RenderSetup, X, Y, rng, stop):
+    """Una muestra de cámara por cada (X[i], Y[i]) con jitter => colores (N,3)."""
+    w = setup.width
+    h = setup.height
+    origin, llc, horiz, vert = (np.array(v) for v in setup.camera)
+    n = X.shape[0]
+    u = (X + rng.random(n)) / (w-1)
+    v = ((h-1-Y) + rng.random(n)) / (h-1)  # flip
+    dirs = _unit(llc + horiz*u[:, None] + vert*v[:, None] - origin)
+    orig = np.broadcast_to(origin, (n, 3))
+    return trace_packet(orig, dirs, setup, setup.max_depth, rng, stop)
+
+def accum_tile_numpy(setup: RenderSetup, tile, seed: int, spp: int, stop: Optional[Callable[[], bool]] = None):
+    """
+    Traza `spp` muestras por píxel del tile (index, x0, y0, tw, th) como un
+    único paquete. Devuelve (sumas RGB (th*tw*3), sumas lum^2 (th*tw), rayos).
+    """
+    _require_numpy()
+    index, x0, y0, tw, th = tile
+    rng = np.random.default_rng(seed + index*7919)
+
+    # rejilla (th, tw, spp)
+    X = np.broadcast_to(np.arange(x0, x0+tw)[None, :, None], (th, tw, spp)).reshape(-1)
+    Y = np.broadcast_to(np.arange(y0, y0+th)[:, None, None], (th, tw, spp)).reshape(-1)
+    n = X.shape[0]
+    col = _trace_pixels(setup, X, Y, rng, stop).reshape(th, tw, spp, 3)
+    lum = col @ LUMA
+    sums = array("d", col.sum(axis=2).tobytes())
+    sq = array("d", (lum*lum).sum(axis=2).tobytes())
+    return sums, sq, n
+
+def render_tile_numpy(setup: RenderSetup, tile, seed: int, stop: Optional[Callable[[], bool]] = None) -> Tuple[bytes, int]:
+    """
+    Renderiza un tile (index, x0, y0, tw, th) como un único paquete de rayos.
+    Devuelve (bytes RGB fila a fila, nº de rayos de cámara).
+    """
+    if setup.min_spp:
+        return adaptive_tile_numpy(setup, tile, seed, stop)
+    sums, _, n = accum_tile_numpy(setup, tile, seed, setup.spp, stop)
+    return tonemap(np.frombuffer(sums) / setup.spp), n
+
+def adaptive_tile_numpy(setup: RenderSetup, tile, seed: int, stop: Optional[Callable[[], bool]] = None) -> Tuple[bytes, int]:
+    """
+    Muestreo adaptativo por rondas (mismo criterio que tracer.adaptive_tile):
+    setup.min_spp muestras a todo el tile y luego un paquete por ronda solo con
+    los píxeles cuyo error estándar supera setup.noise_threshold, duplicando
+    sus muestras hasta setup.spp. Devuelve (bytes RGB, rayos de cámara).
+    """
+    _require_numpy()
+    index, x0, y0, tw, th = tile
+    rng = np.random.default_rng(seed + index*7919)
+
+    npix = tw*th
+    sums = np.zeros((npix, 3))
+    s1 = np.zeros(npix)
+    s2 = np.zeros(npix)
+    counts = np.zeros(npix)
+    active = np.arange(npix)
+    n = 0  # muestras por píxel activo (todos los activos llevan las mismas)
+    k = setup.min_spp
+    rays = 0
+    while active.size:
+        X = np.repeat(x0 + active % tw, k)
+        Y = np.repeat(y0 + active // tw, k)
+        col = _trace_pixels(setup, X, Y, rng, stop).reshape(-1, k, 3)
+        lum = col @ LUMA
+        sums[active] += col.sum(axis=1)
+        s1[active] += lum.sum(axis=1)
+        s2[active] += (lum*lum).sum(axis=1)
+        counts[active] += k
+        rays += X.shape[0]
+        n += k
+        if n >= setup.spp:
+            break
+        mean = s1[active] / n
+        var = np.maximum(0.0, (s2[active] - n*mean*mean) / (n - 1))
+        # error en pantalla: tonemap sqrt => d(sqrt(L)) = dL / (2 sqrt(L))
+        err = np.sqrt(var / n) / (2*np.sqrt(np.maximum(mean, ADAPTIVE_MIN_LUM)))
+        active = active[err > setup.noise_threshold]
+        k = min(n, setup.spp - n)
+    return tonemap(sums / counts[:, None]), rays
+
+def tonemap(col):
+    """Color lineal => bytes con gamma 2 (misma cuantización que tracer.to_byte)."""
+    col = np.clip(np.sqrt(np.maximum(col, 0.0)), 0.0, 0.999)
+    return (256*col).astype(np.uint8).tobytes()
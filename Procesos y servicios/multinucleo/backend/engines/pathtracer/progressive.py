@@ -0,0 +1,154 @@
+"""
+Render progresivo: el tracer trabaja por pasadas (1 spp, 2, 4, … acumulados)
+sobre un framebuffer float compartido. Tras cada pasada se publica una
+preview reducida y se decide si parar (cancelación, ruido objetivo o
+presupuesto de tiempo). La imagen final sale de lo acumulado hasta entonces.
+"""
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, wait
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+from backend.engines.pathtracer.scheduler import GuidedBatcher, estimate_tile_costs, in_flight_limit, make_tiles
+from backend.engines.pathtracer.framebuffer import create_accumulator_shm
+from backend.engines.pathtracer.tracer import CANCEL_POLL_S, _accum_tiles, cancel_batches, job_context, prepare_scene
+from backend.jobs.pool import borrow_pool
+from backend.utils.files import ensure_dir, safe_name
+from backend.utils.trace import span
+
+
+def pass_schedule(max_spp: int):
+    """spp acumulados tras cada pasada: 1, 2, 4, 8, … hasta max_spp."""
+    total = 1
+    while True:
+        yield min(total, max_spp)
+        if total >= max_spp:
+            return
+        total *= 2
+
+def render_pathtracer_progressive(
+    scene: dict,
+    out_dir: Path,
+    workers: int = 0,
+    on_progress: Callable[[int,str], None] = lambda pct, msg: None,
+    on_pass: Callable[[dict, bytes], None] = lambda info, preview: None,
+    should_stop: Callable[[], bool] = lambda: False,
+    target_noise: Optional[float] = None,
+    time_budget: Optional[float] = None,
+    preview_max: int = 128,
+    stats: Optional[dict] = None,
+    executor: Optional[Executor] = None
+) -> Tuple[str, bytes]:
+    """
+    Renderiza por pasadas hasta scene["samples_per_pixel"] acumulados o hasta
+    que should_stop() sea True, el ruido baje de target_noise o se agote
+    time_budget (segundos). Tras cada pasada llama on_pass(info, preview_ppm).
+    Devuelve (filename, file_bytes) con la imagen acumulada.
+    `executor`: pool compartido (ver render_pathtracer_ppm).
+    """
+    ensure_dir(out_dir)
+
+    workers = workers or (os.cpu_count() or 2)
+    setup = prepare_scene(scene, workers)
+    w, h = setup.width, setup.height
+
+    tiles = make_tiles(w, h, setup.tile_size)
+    costs = estimate_tile_costs(setup, tiles)
+    # framebuffer float compartido: los workers acumulan directamente en él
+    shm, acc = create_accumulator_shm(w, h)
+
+    on_progress(0, f"Starting progressive render {w}x{h} ({setup.engine}, up to {setup.spp} spp) with {workers} processes…")
+
+    t0 = time.perf_counter()
+    rays = 0
+    passes = 0
+    spp_done = 0
+    noise = None
+    reason = "max_spp"
+    last_pass_s = 0.0
+    try:
+        with borrow_pool(executor, workers) as ex, job_context(setup, shm.name, "accum") as (ctx, token):
+            for target_spp in pass_schedule(setup.spp):
+                elapsed = time.perf_counter() - t0
+                if should_stop():
+                    reason = "cancelled"
+                    break
+                # la siguiente pasada dobla el trabajo: estima su duración antes de lanzarla
+                pass_spp = target_spp - spp_done
+                if time_budget is not None and passes and elapsed + last_pass_s * pass_spp / max(1, spp_done) > time_budget:
+                    reason = "time_budget"
+                    break
+
+                tp = time.perf_counter()
+                seed = setup.seed + passes*104729
+                batcher = GuidedBatcher(tiles, costs, workers)
+                pending = set()
+                cancelled = False
+                with span("pass", n=passes + 1, spp=pass_spp):
+                    while batcher or pending:
+                        while batcher and len(pending) < in_flight_limit(workers):
+                            pending.add(ex.submit(_accum_tiles, ctx, batcher.next_batch(), seed, pass_spp))
+                        finished, pending = wait(pending, timeout=CANCEL_POLL_S, return_when=FIRST_COMPLETED)
+                        for f in finished:
+                            for _, n in f.result():
+                                rays += n
+                        if should_stop():
+                            cancelled = True
+                            # los lotes que terminan ya están sumados; los cortados no suman nada
+                            cancel_batches(token, pending)
+                            for f in pending:
+                                if not f.cancelled() and f.exception() is None:
+                                    rays += sum(n for _, n in f.result())
+                            break
+                if cancelled:
+                    reason = "cancelled"
+                    break
+
+                passes += 1
+                spp_done = target_spp
+                last_pass_s = time.perf_counter() - tp
+                with span("preview", n=passes):
+                    noise = acc.noise()
+                    info = {
+                        "pass": passes,
+                        "spp": spp_done,
+                        "noise": noise,
+                        "elapsed": round(time.perf_counter() - t0, 3),
+                    }
+                    on_pass(info, acc.preview_ppm(preview_max))
+                on_progress(int(spp_done*100/setup.spp), f"Pass {passes}: {spp_done}/{setup.spp} spp, noise={noise if noise is None else round(noise, 5)}")
+
+                if target_noise is not None and noise is not None and noise <= target_noise:
+                    reason = "target_noise"
+                    break
+                if time_budget is not None and time.perf_counter() - t0 >= time_budget:
+                    reason = "time_budget"
+                    break
+
+        with span("to_ppm"):
+            file_bytes = acc.to_ppm()
+    finally:
+        acc.release()
+        shm.close()
+        shm.unlink()
+
+    elapsed = time.perf_counter() - t0
+    if stats is not None:
+        stats.update({
+            "engine": setup.engine,
+            "workers": workers,
+            "passes": passes,
+            "spp": spp_done,
+            "noise": noise,
+            "stopped": reason,
+            "rays": rays,
+            "seconds": elapsed,
+            "rays_per_sec": rays / elapsed if elapsed > 0 else 0.0,
+        })
+
+    filename = safe_name(f"render_{w}x{h}.ppm")
+    (out_dir / filename).write_bytes(file_bytes)
+
+    on_progress(100, f"Render done ({reason}): {filename}")
+    return filename, file_bytes
@@ -0,0 +1,43 @@
+"""
+Generadores de escenas para pruebas y benchmarks.
+"""
+import random
+from typing import Optional
+
+
+def random_spheres_scene(
+    n: int,
+    seed: int = 0,
+    width: int = 64,
+    height: int = 40,
+    samples_per_pixel: int = 2,
+    max_depth: int = 3,
+    extent: float = 6.0,
+    radius: Optional[float] = None
+) -> dict:
+    """
+    Campo procedural de N esferas apoyadas en el suelo dentro de un cuadrado
+    de lado `extent` delante de la cámara. El radio se ajusta a N para que la
+    densidad visual sea parecida (salvo que se fije `radius`).
+    """
+    rng = random.Random(seed)
+    r_base = radius or max(0.02, min(0.4, 0.5*extent / max(1.0, n ** 0.5)))
+    spheres = []
+    for _ in range(n):
+        r = r_base*rng.uniform(0.6, 1.0)
+        spheres.append({
+            "center": [rng.uniform(-extent/2, extent/2), r, rng.uniform(-extent, 0.0)],
+            "radius": r,
+            "albedo": [rng.uniform(0.2, 0.9), rng.uniform(0.2, 0.9), rng.uniform(0.2, 0.9)],
+        })
+    return {
+        "width": width,
+        "height": height,
+        "samples_per_pixel": samples_per_pixel,
+        "max_depth": max_depth,
+        "camera": {"origin": [0.0, 1.5, 3.0], "look_at": [0.0, 0.3, -extent/2], "fov_degrees": 50},
+        "world": {
+            "spheres": spheres,
+            "ground": {"y": 0.0, "albedo": [0.8, 0.8, 0.8]},
+        },
+    }
@@ -0,0 +1,88 @@
+"""
+Planificación por tiles del path tracer.
+
+- make_tiles: divide el frame en tiles cuadrados (los bordes pueden ser menores).
+- estimate_tile_costs: estimación barata del coste de cada tile lanzando unos
+  pocos rayos de sonda (cielo = barato, geometría = rebotes = caro).
+- GuidedBatcher: reparte tiles en lotes de tamaño decreciente (guided
+  self-scheduling ponderado por coste): lotes grandes al principio para
+  amortizar IPC y lotes de un tile al final para que no queden núcleos ociosos.
+"""
+import math
+from typing import List, Sequence, Tuple
+
+# (index, x0, y0, tw, th)
+Tile = Tuple[int, int, int, int, int]
+
+
+def make_tiles(width: int, height: int, size: int) -> List[Tile]:
+    size = max(1, int(size))
+    tiles = []
+    for y0 in range(0, height, size):
+        for x0 in range(0, width, size):
+            tiles.append((len(tiles), x0, y0, min(size, width-x0), min(size, height-y0)))
+    return tiles
+
+def estimate_tile_costs(setup, tiles: Sequence[Tile]) -> List[float]:
+    """
+    Coste relativo por tile: 1 + nº de rayos de sonda (centro + esquinas) que
+    golpean geometría, ponderado por max_depth (cada golpe implica rebotes).
+    """
+    from backend.engines.pathtracer.tracer import primary_ray, probe_hit
+
+    costs = []
+    w, h = setup.width, setup.height
+    for _, x0, y0, tw, th in tiles:
+        pts = (
+            (x0 + tw*0.5, y0 + th*0.5),
+            (x0, y0), (x0 + tw - 1, y0),
+            (x0, y0 + th - 1), (x0 + tw - 1, y0 + th - 1),
+        )
+        hits = 0
+        for px, py in pts:
+            o, d = primary_ray(setup, px / max(1, w-1), (h-1-py) / max(1, h-1))
+            if probe_hit(setup, o, d):
+                hits += 1
+        area = tw*th
+        costs.append(area * (1.0 + setup.max_depth * hits / len(pts)))
+    return costs
+
+class GuidedBatcher:
+    """
+    Cola de tiles ordenada por coste descendente (LPT). Cada next_batch()
+    devuelve tiles hasta cubrir ~remaining_cost / (factor*workers).
+    """
+    def __init__(self, tiles: Sequence[Tile], costs: Sequence[float], workers: int, factor: int = 2):
+        order = sorted(range(len(tiles)), key=lambda i: costs[i], reverse=True)
+        self.tiles = [tiles[i] for i in order]
+        self.costs = [costs[i] for i in order]
+        self.workers = max(1, workers)
+        self.factor = factor
+        self.pos = 0
+        self.remaining_cost = float(sum(costs))
+
+    def __bool__(self):
+        return self.pos < len(self.tiles)
+
+    def next_batch(self) -> List[Tile]:
+        if not self:
+            return []
+        target = self.remaining_cost / (self.factor*self.workers)
+        batch = []
+        acc = 0.0
+        while self.pos < len(self.tiles) and (not batch or acc + self.costs[self.pos] <= target):
+            acc += self.costs[self.pos]
+            batch.append(self.tiles[self.pos])
+            self.pos += 1
+        self.remaining_cost = max(0.0, self.remaining_cost - acc)
+        return batch
+
+def in_flight_limit(workers: int) -> int:
+    """Lotes pendientes simultáneos: 2 por worker mantiene la cola llena sin acaparar tiles."""
+    return max(2, 2*workers)
+
+def default_tile_size(width: int, height: int, workers: int) -> int:
+    """Tile cuadrado que deja al menos ~8 tiles por worker (acotado a [8, 64])."""
+    target = max(1, 8*workers)
+    size = int(math.sqrt(width*height / target))
+    return max(8, min(64, size))
@@ -0,0 +1,255 @@
+"""
+Render de secuencias (animaciones): muchas escenas que solo se diferencian en
+algunas claves (normalmente "camera") renderizadas en un único job.
+
+- expand_frames: escena base + overrides por frame, o keyframes cuyos valores
+  numéricos se interpolan linealmente entre un keyframe y el siguiente.
+- Si un frame solo cambia la cámara respecto al anterior se reutiliza su
+  RenderSetup (esferas, BVH, seed) y solo se recalcula la cámara; la escena
+  se publica a los workers una vez por tramo de frames así (_SceneBlob) y
+  cada worker la deserializa y aplana una sola vez: las tareas solo llevan
+  la cámara.
+- Un solo pool y una sola cola: hay hasta SEQUENCE_OPEN_FRAMES frames abiertos
+  a la vez y los tiles del siguiente entran en cuanto se agotan los del
+  actual, así que los núcleos no esperan al último tile de cada frame.
+- Cada frame se escribe como frame_NNNN.ppm en out_dir al terminar.
+"""
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, wait
+from contextlib import ExitStack
+from dataclasses import replace
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+from backend.engines.pathtracer.framebuffer import SharedFramebuffer
+from backend.engines.pathtracer.scheduler import GuidedBatcher, estimate_tile_costs, in_flight_limit, make_tiles
+from backend.engines.pathtracer.tracer import (
+    CANCEL_POLL_S, RenderSetup, _render_tiles, build_camera, cancel_batches, job_context, prepare_scene, shared_setup
+)
+from backend.jobs.cancel import JobCancelled
+from backend.jobs.pool import borrow_pool
+from backend.utils.files import ensure_dir
+from backend.utils.trace import span
+
+SEQUENCE_OPEN_FRAMES = 2
+MAX_SEQUENCE_FRAMES = 10000
+
+
+def merge_scene(base: dict, override: dict) -> dict:
+    """Copia de base con override encima (los dicts se mezclan; el resto se sustituye)."""
+    out = dict(base)
+    for k, v in override.items():
+        out[k] = merge_scene(out[k], v) if isinstance(v, dict) and isinstance(out.get(k), dict) else v
+    return out
+
+def _lerp(a, b, t: float):
+    """Interpola números, listas de la misma longitud y dicts; lo demás se queda en a."""
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)) and not isinstance(a, bool) and not isinstance(b, bool):
+        return a + (b - a)*t
+    if isinstance(a, list) and isinstance(b, list) and len(a) == len(b):
+        return [_lerp(x, y, t) for x, y in zip(a, b)]
+    if isinstance(a, dict) and isinstance(b, dict):
+        return {k: _lerp(v, b[k], t) if k in b else v for k, v in a.items()}
+    return a
+
+def expand_frames(base: dict, frames: Optional[list] = None, keyframes: Optional[list] = None,
+                  count: Optional[int] = None) -> List[dict]:
+    """
+    Escenas completas de la secuencia:
+    - frames: [override, ...] => un frame por override sobre base.
+    - keyframes: [{"frame": n, ...override}, ...] => count frames (por defecto
+      hasta el último keyframe); entre dos keyframes se interpola, fuera de
+      ellos se mantiene el más cercano.
+    """
+    if (frames is None) == (keyframes is None):
+        raise ValueError("give either frames or keyframes")
+    if frames is not None:
+        if not isinstance(frames, list) or not all(isinstance(f, dict) for f in frames):
+            raise ValueError("frames must be a list of objects")
+        scenes = [merge_scene(base, f) for f in frames]
+    else:
+        if not isinstance(keyframes, list) or not keyframes or \
+                not all(isinstance(k, dict) and isinstance(k.get("frame"), int) for k in keyframes):
+            raise ValueError("keyframes must be a non-empty list of objects with an integer 'frame'")
+        keys = sorted(keyframes, key=lambda k: k["frame"])
+        count = int(count) if count is not None else keys[-1]["frame"] + 1
+        if count > MAX_SEQUENCE_FRAMES:
+            raise ValueError(f"at most {MAX_SEQUENCE_FRAMES} frames")
+        overrides = [{k: v for k, v in key.items() if k != "frame"} for key in keys]
+        scenes = []
+        for i in range(count):
+            j = sum(1 for key in keys if key["frame"] <= i) - 1
+            if j < 0:
+                over = overrides[0]
+            elif j == len(keys) - 1:
+                over = overrides[j]
+            else:
+                t = (i - keys[j]["frame"]) / (keys[j + 1]["frame"] - keys[j]["frame"])
+                over = _lerp(overrides[j], overrides[j + 1], t)
+            scenes.append(merge_scene(base, over))
+    if not scenes:
+        raise ValueError("sequence has no frames")
+    if len(scenes) > MAX_SEQUENCE_FRAMES:
+        raise ValueError(f"at most {MAX_SEQUENCE_FRAMES} frames")
+    return scenes
+
+def _same_but_camera(a: dict, b: dict) -> bool:
+    return {k: v for k, v in a.items() if k != "camera"} == {k: v for k, v in b.items() if k != "camera"}
+
+class _SceneBlob:
+    """Escena publicada a los workers, compartida por los frames que solo cambian la cámara."""
+
+    def __init__(self, setup: RenderSetup):
+        self.stack = ExitStack()
+        self.name = self.stack.enter_context(shared_setup(setup))
+        self.users = 0
+        self.current = True  # aún puede usarla el siguiente frame
+
+    def release(self):
+        self.users -= 1
+        if not self.users and not self.current:
+            self.stack.close()
+
+    def retire(self):
+        self.current = False
+        if not self.users:
+            self.stack.close()
+
+class _Frame:
+    """Un frame abierto: su contexto para los workers, su framebuffer y sus tiles."""
+
+    def __init__(self, index: int, setup: RenderSetup, blob: _SceneBlob, workers: int):
+        self.index = index
+        self.setup = setup
+        tiles = make_tiles(setup.width, setup.height, setup.tile_size)
+        self.total = len(tiles)
+        self.done = 0
+        self.batcher = GuidedBatcher(tiles, estimate_tile_costs(setup, tiles), workers)
+        self.stack = ExitStack()
+        try:
+            blob.users += 1
+            self.stack.callback(blob.release)
+            self.fb = SharedFramebuffer.create(setup.width, setup.height)
+            self.stack.callback(self.fb.close)
+            self.ctx, self.token = self.stack.enter_context(job_context(setup, self.fb.name, "ppm", blob.name))
+        except BaseException:
+            self.stack.close()
+            raise
+
+    @property
+    def finished(self) -> bool:
+        return self.done == self.total
+
+    def save(self, path: Path):
+        view = self.fb.view()
+        path.write_bytes(view)
+        view.release()
+
+def render_sequence(
+    scenes: Sequence[dict],
+    out_dir: Path,
+    workers: int = 0,
+    on_progress: Callable[[int, str], None] = lambda pct, msg: None,
+    on_frame: Callable[[int, str], None] = lambda index, filename: None,
+    stats: Optional[dict] = None,
+    executor: Optional[Executor] = None,
+    should_stop: Callable[[], bool] = lambda: False
+) -> List[str]:
+    """
+    Renderiza las escenas como frames de una secuencia en out_dir
+    (frame_0000.ppm, …) y devuelve los nombres en orden. on_frame(índice,
+    nombre) se llama al terminar cada frame (en orden de llegada).
+    Si se pasa `stats`, se rellena con frames, seconds, frames_per_min, rays,
+    rays_per_sec, batches y setups_reused (frames que solo cambiaron la cámara).
+    Si should_stop() pasa a True se cancela y se lanza JobCancelled.
+    """
+    ensure_dir(out_dir)
+    workers = workers or (os.cpu_count() or 2)
+    n = len(scenes)
+    digits = max(4, len(str(n - 1)))
+    names: List[Optional[str]] = [None]*n
+    on_progress(0, f"Starting sequence of {n} frames with {workers} processes…")
+
+    t0 = time.perf_counter()
+    rays = 0
+    batches = 0
+    reused = 0
+    frames_done = 0
+    pct = 0
+    opened: List[_Frame] = []        # frames con tiles por lanzar o en vuelo
+    pending: Dict[object, _Frame] = {}
+    next_index = 0
+    prev = None                      # (escena, setup, blob) del último frame preparado
+    limit = in_flight_limit(workers)
+
+    with borrow_pool(executor, workers) as ex, span("frames", count=n):
+        try:
+            while next_index < n or opened:
+                # llenar el pool: tiles del frame abierto más antiguo; si no quedan, abrir el siguiente
+                while len(pending) < limit:
+                    frame = next((f for f in opened if f.batcher), None)
+                    if frame is None:
+                        if next_index >= n or len(opened) >= SEQUENCE_OPEN_FRAMES:
+                            break
+                        scene = scenes[next_index]
+                        with span("prepare_frame", index=next_index):
+                            if prev is not None and _same_but_camera(prev[0], scene):
+                                setup = replace(prev[1], camera=build_camera(scene))
+                                blob = prev[2]
+                                reused += 1
+                            else:
+                                setup = prepare_scene(scene, workers)
+                                if prev is not None:
+                                    prev[2].retire()
+                                    prev = None
+                                blob = _SceneBlob(setup)
+                            prev = (scene, setup, blob)
+                            opened.append(_Frame(next_index, setup, blob, workers))
+                        next_index += 1
+                        continue
+                    pending[ex.submit(_render_tiles, frame.ctx, frame.batcher.next_batch(), frame.setup.seed)] = frame
+                    batches += 1
+                finished, _ = wait(pending, timeout=CANCEL_POLL_S, return_when=FIRST_COMPLETED)
+                if should_stop():
+                    raise JobCancelled(f"sequence cancelled after {frames_done}/{n} frames")
+                for f in finished:
+                    frame = pending.pop(f)
+                    for _, r in f.result():
+                        rays += r
+                        frame.done += 1
+                    if frame.finished:
+                        name = f"frame_{frame.index:0{digits}d}.ppm"
+                        with span("write_ppm", index=frame.index):
+                            frame.save(out_dir / name)
+                        frame.stack.close()
+                        opened.remove(frame)
+                        names[frame.index] = name
+                        frames_done += 1
+                        on_frame(frame.index, name)
+                partial = sum(f.done / f.total for f in opened)
+                now = int((frames_done + partial)*100/n)
+                if now != pct:
+                    pct = now
+                    on_progress(pct, f"Frames: {frames_done}/{n}")
+        finally:
+            # error o cancelación: ningún worker sigue con frames que se van a cerrar
+            for frame in opened:
+                cancel_batches(frame.token, [f for f, fr in pending.items() if fr is frame])
+                frame.stack.close()
+            if prev is not None:
+                prev[2].retire()
+
+    elapsed = time.perf_counter() - t0
+    if stats is not None:
+        stats.update({
+            "frames": n,
+            "seconds": elapsed,
+            "frames_per_min": n*60 / elapsed if elapsed > 0 else 0.0,
+            "rays": rays,
+            "rays_per_sec": rays / elapsed if elapsed > 0 else 0.0,
+            "batches": batches,
+            "setups_reused": reused,
+        })
+    on_progress(100, f"Sequence done: {n} frames")
+    return names
@@ -2,14 +2,40 @@ import base64
 import json
 import math
 import os
+import pickle
 import random
-from dataclasses import dataclass
+import time
+from array import array
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, replace
+from multiprocessing import shared_memory
 from pathlib import Path
-from concurrent.futures import ProcessPoolExecutor, as_completed
-from typing import Callable, List, Tuple
-
+from concurrent.futures import FIRST_COMPLETED, Executor, wait
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from backend.engines.pathtracer.bvh import BVH, build_bvh, closest_hit, want_bvh
+from backend.engines.pathtracer.kernel import RR_MAX_P, RR_MIN_P, flat_scene, random_unit_vector, trace_path
+from backend.engines.pathtracer.framebuffer import (
+    Accumulator, SharedFramebuffer, attach_shm, clamp, to_byte
+)
+from backend.jobs.cancel import CancelToken, JobCancelled
+from backend.jobs.pool import borrow_pool
 from backend.utils.files import ensure_dir, safe_name
+from backend.utils.trace import span
+
+
+# Ruleta rusa: rebotes garantizados por defecto y tope de seguridad de la
+# profundidad (probabilidad de supervivencia: kernel.RR_MIN_P..RR_MAX_P)
+RR_MIN_DEPTH = 3
+RR_MAX_DEPTH = 64
 
+# Muestreo adaptativo: muestras iniciales por píxel y error estándar objetivo
+# de cada píxel en pantalla (tras la gamma 2 del tonemap, escala 0..1: los
+# píxeles oscuros necesitan menos error lineal para verse igual de limpios)
+ADAPTIVE_MIN_SPP = 8
+ADAPTIVE_NOISE = 0.01
+ADAPTIVE_MIN_LUM = 1e-3
 
 # Vector utils 
 def v_add(a, b): return (a[0]+b[0], a[1]+b[1], a[2]+b[2])
@@ -21,15 +47,6 @@ def v_unit(a):
     L = v_len(a) or 1.0
     return (a[0]/L, a[1]/L, a[2]/L)
 
-def clamp(x, lo=0.0, hi=0.999):
-    return lo if x < lo else hi if x > hi else x
-
-def random_in_unit_sphere(rng: random.Random):
-    while True:
-        p = (rng.uniform(-1,1), rng.uniform(-1,1), rng.uniform(-1,1))
-        if v_dot(p, p) < 1:
-            return p
-
 # Ray/sphere
 @dataclass
 class Sphere:
@@ -71,9 +88,16 @@ def hit_ground_plane(ray_o, ray_d, y0: float, albedo, t_min=0.001, t_max=1e9):
         return None
     p = v_add(ray_o, v_mul(ray_d, t))
     n = (0.0, 1.0 if ray_d[1] < 0 else -1.0, 0.0)
-    return Hit(t=t, p=p, normal=n, albedo=tuple(albedo))
+    return Hit(t=t, p=p, normal=n, albedo=albedo)
 
-def ray_color(ray_o, ray_d, spheres: List[Sphere], ground_y: float, ground_albedo, depth: int, rng: random.Random):
+def ray_color(ray_o, ray_d, spheres: List[Sphere], ground_y: float, ground_albedo, depth: int, rng: random.Random, bvh=None, rr_below: int = 0):
+    """
+    Color de un camino de hasta `depth` rebotes. rr_below > 0: ruleta rusa
+    cuando quedan <= rr_below rebotes; el camino sigue con probabilidad p =
+    albedo máximo (acotado) y su aporte se divide entre p (sin sesgo).
+    Referencia recursiva (lenta): los motores usan kernel.trace_path, que
+    sigue el mismo camino con el mismo RNG.
+    """
     if depth <= 0:
         return (0.0, 0.0, 0.0)
 
@@ -81,11 +105,16 @@ def ray_color(ray_o, ray_d, spheres: List[Sphere], ground_y: float, ground_albed
     closest_t = 1e9
 
     # spheres
-    for s in spheres:
-        h = hit_sphere(ray_o, ray_d, s, t_max=closest_t)
-        if h and h.t < closest_t:
-            closest_t = h.t
-            closest = h
+    if bvh is not None:
+        closest = closest_hit(bvh, spheres, ray_o, ray_d, closest_t, hit_sphere)
+        if closest:
+            closest_t = closest.t
+    else:
+        for s in spheres:
+            h = hit_sphere(ray_o, ray_d, s, t_max=closest_t)
+            if h and h.t < closest_t:
+                closest_t = h.t
+                closest = h
 
     # ground
     hg = hit_ground_plane(ray_o, ray_d, ground_y, ground_albedo, t_max=closest_t)
@@ -94,10 +123,15 @@ def ray_color(ray_o, ray_d, spheres: List[Sphere], ground_y: float, ground_albed
         closest_t = hg.t
 
     if closest:
-        target = v_add(closest.p, v_add(closest.normal, random_in_unit_sphere(rng)))
-        new_d = v_unit(v_sub(target, closest.p))
         atten = closest.albedo
-        col = ray_color(closest.p, new_d, spheres, ground_y, ground_albedo, depth-1, rng)
+        if depth <= rr_below:
+            p = clamp(max(atten), RR_MIN_P, RR_MAX_P)
+            if rng.random() >= p:
+                return (0.0, 0.0, 0.0)
+            atten = (atten[0]/p, atten[1]/p, atten[2]/p)
+        bounce = v_add(closest.normal, random_unit_vector(rng.random))
+        new_d = v_unit(bounce) if v_dot(bounce, bounce) >= 1e-24 else closest.normal
+        col = ray_color(closest.p, new_d, spheres, ground_y, ground_albedo, depth-1, rng, bvh, rr_below)
         return (atten[0]*col[0], atten[1]*col[1], atten[2]*col[2])
 
     # background gradient
@@ -143,87 +177,493 @@ def build_camera(scene):
 
     return origin, llc, horiz, vert
 
-def _render_row(y: int, scene: dict, seed: int) -> Tuple[int, bytes]:
-    rng = random.Random(seed + y*1337)
+ENGINES = ("python", "numpy")
 
-    w = scene["width"]
-    h = scene["height"]
-    spp = scene.get("samples_per_pixel", 10)
-    max_depth = scene.get("max_depth", 4)
+@dataclass
+class RenderSetup:
+    """Escena ya parseada: se construye una vez y se envía a cada worker al arrancar."""
+    width: int
+    height: int
+    spp: int
+    max_depth: int
+    engine: str
+    tile_size: int
+    spheres: List[Sphere]
+    ground_y: float
+    ground_albedo: Tuple[float,float,float]
+    camera: Tuple[tuple, tuple, tuple, tuple]  # origin, llc, horiz, vert
+    seed: int = 0
+    bvh: Optional[BVH] = None
+    min_spp: int = 0             # > 0 => muestreo adaptativo (spp es el máximo)
+    noise_threshold: float = 0.0
+    rr_start: int = 0            # > 0 => ruleta rusa tras rr_start rebotes (max_depth = RR_MAX_DEPTH)
+
+    @property
+    def rr_below(self) -> int:
+        """Rebotes restantes por debajo de los cuales se juega la ruleta (0 = sin ruleta)."""
+        return self.max_depth - self.rr_start if self.rr_start else 0
+
+# Con seed fijo el tiling no puede depender de los workers (el RNG va por tile)
+SEEDED_TILE_SIZE = 32
+
+def prepare_scene(scene: dict, workers: int = 1) -> RenderSetup:
+    """
+    scene["seed"] (opcional): semilla entera => render reproducible bit a bit
+    (mismo resultado con cualquier nº de workers). Sin seed se usa os.urandom.
+    scene["adaptive"]: muestreo adaptativo por píxel (render no progresivo):
+    "min_spp" muestras y más solo donde el error estándar supera
+    "noise_threshold", hasta samples_per_pixel.
+    scene["russian_roulette"]: caminos cortados por ruleta rusa tras
+    "rr_min_depth" rebotes en lugar de por max_depth.
+    """
+    from backend.engines.pathtracer.scheduler import default_tile_size
 
+    w = int(scene["width"])
+    h = int(scene["height"])
+    engine = scene.get("engine", "python")
+    if engine not in ENGINES:
+        raise ValueError(f"engine must be one of {ENGINES}")
+    seed = scene.get("seed")
+    if seed is None:
+        seed = int.from_bytes(os.urandom(4), "little")
+        tile_size = int(scene.get("tile_size") or default_tile_size(w, h, workers))
+    else:
+        seed = int(seed)
+        tile_size = int(scene.get("tile_size") or SEEDED_TILE_SIZE)
     spheres = [Sphere(tuple(s["center"]), float(s["radius"]), tuple(s["albedo"])) for s in scene["world"]["spheres"]]
-    ground_y = float(scene["world"]["ground"]["y"])
-    ground_albedo = scene["world"]["ground"]["albedo"]
-
-    origin, llc, horiz, vert = build_camera(scene)
-
-    row = bytearray()
-    for x in range(w):
-        col = (0.0,0.0,0.0)
-        for _ in range(spp):
-            u = (x + rng.random())/(w-1)
-            v = ((h-1-y) + rng.random())/(h-1)  # flip
-            dir_ = v_unit(v_sub(v_add(v_add(llc, v_mul(horiz, u)), v_mul(vert, v)), origin))
-            c = ray_color(origin, dir_, spheres, ground_y, ground_albedo, max_depth, rng)
-            col = (col[0]+c[0], col[1]+c[1], col[2]+c[2])
-        scale = 1.0/spp
-        r = math.sqrt(col[0]*scale)
-        g = math.sqrt(col[1]*scale)
-        b = math.sqrt(col[2]*scale)
-        ir = int(256*clamp(r))
-        ig = int(256*clamp(g))
-        ib = int(256*clamp(b))
-        row += bytes([ir, ig, ib])
-    return y, bytes(row)
+    spp = int(scene.get("samples_per_pixel", 10))
+    # hacen falta >= 2 muestras para estimar la varianza de un píxel
+    min_spp = min(spp, max(2, int(scene.get("min_spp", ADAPTIVE_MIN_SPP)))) if scene.get("adaptive") else 0
+    rr_start = max(1, int(scene.get("rr_min_depth", RR_MIN_DEPTH))) if scene.get("russian_roulette") else 0
+    return RenderSetup(
+        width=w,
+        height=h,
+        spp=spp,
+        max_depth=RR_MAX_DEPTH if rr_start else int(scene.get("max_depth", 4)),
+        engine=engine,
+        tile_size=tile_size,
+        spheres=spheres,
+        ground_y=float(scene["world"]["ground"]["y"]),
+        ground_albedo=tuple(scene["world"]["ground"]["albedo"]),
+        camera=build_camera(scene),
+        seed=seed,
+        bvh=build_bvh(spheres) if want_bvh(scene, len(spheres)) else None,
+        min_spp=min_spp,
+        noise_threshold=float(scene.get("noise_threshold", ADAPTIVE_NOISE)),
+        rr_start=rr_start,
+    )
+
+def primary_ray(setup: RenderSetup, u: float, v: float):
+    origin, llc, horiz, vert = setup.camera
+    return origin, v_unit(v_sub(v_add(v_add(llc, v_mul(horiz, u)), v_mul(vert, v)), origin))
+
+def probe_hit(setup: RenderSetup, ray_o, ray_d) -> bool:
+    """¿El rayo golpea alguna esfera o el suelo? (sin sombreado, para estimar coste)"""
+    if setup.bvh is not None:
+        if closest_hit(setup.bvh, setup.spheres, ray_o, ray_d, 1e9, hit_sphere):
+            return True
+        return hit_ground_plane(ray_o, ray_d, setup.ground_y, setup.ground_albedo) is not None
+    for s in setup.spheres:
+        if hit_sphere(ray_o, ray_d, s):
+            return True
+    return hit_ground_plane(ray_o, ray_d, setup.ground_y, setup.ground_albedo) is not None
+
+def accum_tile(setup: RenderSetup, tile, seed: int, spp: int, stop: Optional[Callable[[], bool]] = None) -> Tuple[array, array, int]:
+    """
+    Traza `spp` muestras por píxel del tile (index, x0, y0, tw, th) y devuelve
+    (sumas RGB lineales, sumas de luminancia^2, rayos de cámara) para acumular.
+    stop(): se consulta antes de cada fila; si es True => JobCancelled.
+    """
+    index, x0, y0, tw, th = tile
+    rng = random.Random(seed + index*7919)
+
+    w = setup.width
+    h = setup.height
+    fs = flat_scene(setup)
+    random_ = rng.random
+    sqrt = math.sqrt
+    (ox, oy, oz), (lx, ly, lz), (hx, hy, hz), (vx, vy, vz) = setup.camera
+    lx -= ox
+    ly -= oy
+    lz -= oz
+
+    sums = array("d", bytes(8*tw*th*3))
+    sq = array("d", bytes(8*tw*th))
+    i = 0
+    for y in range(y0, y0+th):
+        if stop is not None and stop():
+            raise JobCancelled(f"tile {index}")
+        for x in range(x0, x0+tw):
+            r = g = b = s2 = 0.0
+            for _ in range(spp):
+                u = (x + random_())/(w-1)
+                v = ((h-1-y) + random_())/(h-1)  # flip
+                dx = lx + hx*u + vx*v
+                dy = ly + hy*u + vy*v
+                dz = lz + hz*u + vz*v
+                L = sqrt(dx*dx + dy*dy + dz*dz) or 1.0
+                cr, cg, cb = trace_path(fs, ox, oy, oz, dx/L, dy/L, dz/L, random_)
+                r += cr
+                g += cg
+                b += cb
+                lum = 0.2126*cr + 0.7152*cg + 0.0722*cb
+                s2 += lum*lum
+            sums[3*i] = r
+            sums[3*i+1] = g
+            sums[3*i+2] = b
+            sq[i] = s2
+            i += 1
+    return sums, sq, tw*th*spp
+
+def adaptive_tile(setup: RenderSetup, tile, seed: int, stop: Optional[Callable[[], bool]] = None) -> Tuple[array, array, int]:
+    """
+    Muestreo adaptativo de un tile: cada píxel toma setup.min_spp muestras y
+    duplica mientras el error estándar de su luminancia supere
+    setup.noise_threshold, hasta setup.spp. Devuelve (sumas RGB, muestras por
+    píxel, rayos de cámara).
+    """
+    index, x0, y0, tw, th = tile
+    rng = random.Random(seed + index*7919)
+
+    w = setup.width
+    h = setup.height
+    spp = setup.spp
+    min_spp = setup.min_spp
+    threshold = setup.noise_threshold
+    fs = flat_scene(setup)
+    random_ = rng.random
+    sqrt = math.sqrt
+    (ox, oy, oz), (lx, ly, lz), (hx, hy, hz), (vx, vy, vz) = setup.camera
+    lx -= ox
+    ly -= oy
+    lz -= oz
+
+    sums = array("d", bytes(8*tw*th*3))
+    counts = array("d", bytes(8*tw*th))
+    rays = 0
+    i = 0
+    for y in range(y0, y0+th):
+        if stop is not None and stop():
+            raise JobCancelled(f"tile {index}")
+        for x in range(x0, x0+tw):
+            r = g = b = s1 = s2 = 0.0
+            n = 0
+            target = min_spp
+            while True:
+                while n < target:
+                    u = (x + random_())/(w-1)
+                    v = ((h-1-y) + random_())/(h-1)  # flip
+                    dx = lx + hx*u + vx*v
+                    dy = ly + hy*u + vy*v
+                    dz = lz + hz*u + vz*v
+                    L = sqrt(dx*dx + dy*dy + dz*dz) or 1.0
+                    cr, cg, cb = trace_path(fs, ox, oy, oz, dx/L, dy/L, dz/L, random_)
+                    r += cr
+                    g += cg
+                    b += cb
+                    lum = 0.2126*cr + 0.7152*cg + 0.0722*cb
+                    s1 += lum
+                    s2 += lum*lum
+                    n += 1
+                if n >= spp:
+                    break
+                mean = s1/n
+                var = max(0.0, (s2 - n*mean*mean)/(n - 1))
+                if sqrt(var/n) / (2*sqrt(max(mean, ADAPTIVE_MIN_LUM))) <= threshold:
+                    break
+                target = min(spp, 2*n)
+            sums[3*i] = r
+            sums[3*i+1] = g
+            sums[3*i+2] = b
+            counts[i] = n
+            rays += n
+            i += 1
+    return sums, counts, rays
+
+def render_tile(setup: RenderSetup, tile, seed: int, stop: Optional[Callable[[], bool]] = None) -> Tuple[bytes, int]:
+    """Renderiza un tile (index, x0, y0, tw, th) => (bytes RGB fila a fila, rayos de cámara)."""
+    if setup.min_spp:
+        sums, counts, rays = adaptive_tile(setup, tile, seed, stop)
+        return bytes(to_byte(c/counts[k//3]) for k, c in enumerate(sums)), rays
+    sums, _, rays = accum_tile(setup, tile, seed, setup.spp, stop)
+    scale = 1.0/setup.spp
+    return bytes(to_byte(c*scale) for c in sums), rays
+
+# Contexto por job en los workers. El pool es compartido y de larga vida (sin
+# initializer por render), así que el padre publica la escena ya parseada en un
+# segmento de memoria compartida y las tareas solo llevan su nombre más las
+# coordenadas de los tiles: cada worker la deserializa una vez y la guarda en
+# una pequeña LRU (por escena), y el framebuffer ya abierto en otra (por job).
+_CTX_CACHE_SIZE = 4
+_WORKER_CTX: "OrderedDict[str, tuple]" = OrderedDict()
+_WORKER_SCENES: "OrderedDict[str, RenderSetup]" = OrderedDict()
+
+# Cada cuánto revisa el padre should_stop() mientras espera lotes
+CANCEL_POLL_S = 0.1
+
+@dataclass(frozen=True)
+class JobContext:
+    setup_shm: str   # escena (RenderSetup serializado con pickle)
+    target_shm: str  # SharedFramebuffer (modo "ppm") o Accumulator (modo "accum")
+    mode: str
+    cancel_shm: str  # CancelToken del job
+    camera: Optional[tuple] = None  # escena compartida (shared_setup): cámara de este job
+
+@contextmanager
+def shared_setup(setup: RenderSetup) -> Iterator[str]:
+    """Publica la escena en memoria compartida mientras dure el bloque; devuelve su nombre."""
+    blob = pickle.dumps(setup, protocol=pickle.HIGHEST_PROTOCOL)
+    shm = shared_memory.SharedMemory(create=True, size=8 + len(blob))
+    try:
+        shm.buf[:8] = len(blob).to_bytes(8, "little")
+        shm.buf[8:8+len(blob)] = blob
+        yield shm.name
+    finally:
+        shm.close()
+        shm.unlink()
+
+@contextmanager
+def job_context(setup: RenderSetup, target_shm: str, mode: str,
+                setup_shm: Optional[str] = None) -> Iterator[Tuple[JobContext, CancelToken]]:
+    """
+    Publica la escena en memoria compartida mientras dure el job y crea su
+    CancelToken. Devuelve (ctx para las tareas, token). El padre hace unlink.
+    Con setup_shm (escena ya publicada con shared_setup que solo difiere en
+    la cámara) no se vuelve a serializar: las tareas llevan la cámara y los
+    workers reutilizan la escena ya cargada (frames de una secuencia).
+    """
+    with ExitStack() as stack:
+        camera = None
+        if setup_shm is None:
+            setup_shm = stack.enter_context(shared_setup(setup))
+        else:
+            camera = setup.camera
+        token = CancelToken.create()
+        stack.callback(token.close)
+        yield JobContext(setup_shm, target_shm, mode, token.name, camera), token
+
+def cancel_batches(token: CancelToken, pending):
+    """
+    Cancela un job en marcha: los lotes aún en cola no llegan a empezar y los
+    que se están trazando abandonan su tile en la siguiente fila (CancelToken).
+    Vuelve cuando ningún worker sigue trabajando para este job.
+    """
+    token.set()
+    for f in pending:
+        f.cancel()
+    if pending:
+        wait(pending)
+
+def _load_setup(name: str) -> RenderSetup:
+    """RenderSetup publicado en `name`; se deserializa la primera vez que se ve."""
+    setup = _WORKER_SCENES.get(name)
+    if setup is not None:
+        _WORKER_SCENES.move_to_end(name)
+        return setup
+    shm = attach_shm(name)
+    try:
+        n = int.from_bytes(shm.buf[:8], "little")
+        setup = pickle.loads(shm.buf[8:8+n])
+    finally:
+        shm.close()
+    _WORKER_SCENES[name] = setup
+    while len(_WORKER_SCENES) > _CTX_CACHE_SIZE:
+        _WORKER_SCENES.popitem(last=False)
+    return setup
+
+def _load_context(ctx: JobContext):
+    """(setup, target, token) del job en este worker; lo abre la primera vez que lo ve."""
+    hit = _WORKER_CTX.get(ctx.target_shm)
+    if hit is not None:
+        _WORKER_CTX.move_to_end(ctx.target_shm)
+        return hit[:3]
+    setup = _load_setup(ctx.setup_shm)
+    if ctx.camera is not None:
+        # misma escena, otra cámara: la escena aplanada del kernel no depende de ella
+        flat = flat_scene(setup)
+        setup = replace(setup, camera=ctx.camera)
+        setup.__dict__["_flat"] = flat
+    token = CancelToken.attach(ctx.cancel_shm)
+    if ctx.mode == "ppm":
+        target = SharedFramebuffer.attach(setup.width, setup.height, ctx.target_shm)
+        def closer():
+            target.close()
+            token.close()
+    else:
+        target_shm = attach_shm(ctx.target_shm)
+        target = Accumulator(setup.width, setup.height, target_shm.buf)
+        def closer():
+            target.release()
+            target_shm.close()
+            token.close()
+    _WORKER_CTX[ctx.target_shm] = (setup, target, token, closer)
+    while len(_WORKER_CTX) > _CTX_CACHE_SIZE:
+        _, old = _WORKER_CTX.popitem(last=False)
+        old[3]()
+    return setup, target, token
+
+def _render_tiles(ctx: JobContext, batch, seed: int):
+    """Renderiza tiles y los escribe en el P6 compartido. Devuelve [(tile, rays)]."""
+    setup, target, token = _load_context(ctx)
+    if setup.engine == "numpy":
+        from backend.engines.pathtracer.numpy_tracer import render_tile_numpy as fn
+    else:
+        fn = render_tile
+    out = []
+    for tile in batch:
+        with span("tile", index=tile[0]):
+            rgb, rays = fn(setup, tile, seed, token.is_set)
+            target.write_tile(tile, rgb)
+        out.append((tile, rays))
+    return out
+
+def _accum_tiles(ctx: JobContext, batch, seed: int, spp: int):
+    """Suma `spp` muestras por píxel de cada tile en el acumulador compartido. Devuelve [(tile, rays)]."""
+    setup, target, token = _load_context(ctx)
+    if setup.engine == "numpy":
+        from backend.engines.pathtracer.numpy_tracer import accum_tile_numpy as fn
+    else:
+        fn = accum_tile
+    out = []
+    for tile in batch:
+        with span("tile", index=tile[0], spp=spp):
+            sums, sq, rays = fn(setup, tile, seed, spp, token.is_set)
+            target.add_tile(tile, sums, sq, spp)
+        out.append((tile, rays))
+    return out
 
 def render_pathtracer_ppm(
     scene: dict,
     out_dir: Path,
     workers: int = 0,
-    on_progress: Callable[[int,str], None] = lambda pct, msg: None
+    on_progress: Callable[[int,str], None] = lambda pct, msg: None,
+    stats: Optional[dict] = None,
+    executor: Optional[Executor] = None,
+    should_stop: Callable[[], bool] = lambda: False
 ) -> Tuple[str, bytes]:
     """
     Renderiza a PPM binario (P6) y devuelve (filename, file_bytes).
-    Paraleliza por filas con ProcessPoolExecutor => multinúcleo real.
+    Paraleliza por tiles con ProcessPoolExecutor => multinúcleo real:
+    cada worker carga la escena parseada una vez por job (job_context) y los
+    tiles se reparten en lotes de tamaño adaptativo (ver scheduler.GuidedBatcher).
+    `executor`: pool compartido (backend.jobs.pool); si no, se crea uno propio
+    de `workers` procesos.
+    Los workers escriben en un SharedFramebuffer con el P6 final: el padre
+    no recibe píxeles por IPC, solo vuelca el buffer a disco.
+    scene["engine"]: "python" (escalar, por defecto) o "numpy" (paquetes por tile).
+    scene["tile_size"]: lado del tile en píxeles (por defecto según tamaño y workers).
+    scene["seed"]: semilla fija => imagen reproducible (ver prepare_scene).
+    Si se pasa `stats`, se rellena con rays (rayos de cámara), seconds, rays_per_sec,
+    spp_avg (muestras medias por píxel: < spp con "adaptive"), tiles y batches.
+    Si should_stop() pasa a True se cancela el render (ver cancel_batches) y se lanza JobCancelled.
     """
-    ensure_dir(out_dir)
+    from backend.engines.pathtracer.scheduler import (
+        GuidedBatcher, estimate_tile_costs, in_flight_limit, make_tiles
+    )
 
-    w = int(scene["width"])
-    h = int(scene["height"])
+    ensure_dir(out_dir)
 
     workers = workers or (os.cpu_count() or 2)
-
-    # header PPM
-    header = f"P6\n{w} {h}\n255\n".encode("ascii")
-    rows = [None]*h
-
-    on_progress(0, f"Starting render {w}x{h} with {workers} processes…")
-
-    with ProcessPoolExecutor(max_workers=workers) as ex:
-        futs = []
-        base_seed = int.from_bytes(os.urandom(4), "little")
-        for y in range(h):
-            futs.append(ex.submit(_render_row, y, scene, base_seed))
-
-        done = 0
-        for f in as_completed(futs):
-            y, row = f.result()
-            rows[y] = row
-            done += 1
-            pct = int(done*100/h)
-            if done % max(1, h//20) == 0 or done == h:
-                on_progress(pct, f"Rendered rows: {done}/{h}")
-
-    body = b"".join(rows)
-    file_bytes = header + body
-
-    filename = safe_name(f"render_{w}x{h}.ppm")
-    out_path = out_dir / filename
-    out_path.write_bytes(file_bytes)
+    with span("prepare_scene"):
+        setup = prepare_scene(scene, workers)
+        w, h = setup.width, setup.height
+
+        tiles = make_tiles(w, h, setup.tile_size)
+        batcher = GuidedBatcher(tiles, estimate_tile_costs(setup, tiles), workers)
+
+    on_progress(0, f"Starting render {w}x{h} ({setup.engine}, {len(tiles)} tiles of {setup.tile_size}px) with {workers} processes…")
+
+    t0 = time.perf_counter()
+    rays = 0
+    batches = 0
+    done = 0
+    step = max(1, len(tiles)//20)
+    # los workers escriben directamente en el fichero P6 final (cabecera incluida)
+    fb = SharedFramebuffer.create(w, h)
+    try:
+        with borrow_pool(executor, workers) as ex, job_context(setup, fb.name, "ppm") as (ctx, token), \
+                span("tiles", count=len(tiles)):
+            pending = set()
+            while batcher or pending:
+                while batcher and len(pending) < in_flight_limit(workers):
+                    pending.add(ex.submit(_render_tiles, ctx, batcher.next_batch(), setup.seed))
+                    batches += 1
+                finished, pending = wait(pending, timeout=CANCEL_POLL_S, return_when=FIRST_COMPLETED)
+                if should_stop():
+                    cancel_batches(token, pending)
+                    raise JobCancelled(f"render cancelled after {done}/{len(tiles)} tiles")
+                for f in finished:
+                    for _, n in f.result():
+                        rays += n
+                        prev = done
+                        done += 1
+                        if done // step != prev // step or done == len(tiles):
+                            on_progress(int(done*100/len(tiles)), f"Rendered tiles: {done}/{len(tiles)}")
+
+        elapsed = time.perf_counter() - t0
+        if stats is not None:
+            stats.update({
+                "engine": setup.engine,
+                "workers": workers,
+                "tiles": len(tiles),
+                "tile_size": setup.tile_size,
+                "batches": batches,
+                "rays": rays,
+                "seconds": elapsed,
+                "rays_per_sec": rays / elapsed if elapsed > 0 else 0.0,
+                "spp_avg": rays / (w*h),
+            })
+
+        filename = safe_name(f"render_{w}x{h}.ppm")
+        out_path = out_dir / filename
+        with span("write_ppm", bytes=fb.size):
+            view = fb.view()
+            out_path.write_bytes(view)  # cabecera + cuerpo de una vez, sin copias
+            file_bytes = bytes(view)    # única copia: la que se entrega al llamador
+            view.release()
+    finally:
+        fb.close()
 
     on_progress(100, f"Render done: {filename}")
     return filename, file_bytes
 
+def render_tiles(
+    scene: dict,
+    tiles: List[tuple],
+    workers: int = 0,
+    executor: Optional[Executor] = None,
+    should_stop: Callable[[], bool] = lambda: False
+) -> List[Tuple[tuple, bytes, int]]:
+    """
+    Renderiza solo los tiles dados (index, x0, y0, tw, th) de la escena y
+    devuelve [(tile, rgb, rays)] en orden de llegada. Es la parte de un nodo
+    en un render repartido (ver distributed.py): la escena trae "seed" fijo,
+    así un tile sale igual lo trace quien lo trace.
+    """
+    from backend.engines.pathtracer.scheduler import in_flight_limit
+
+    workers = workers or (os.cpu_count() or 2)
+    setup = prepare_scene(scene, workers)
+    queue = list(reversed(tiles))
+    out = []
+    fb = SharedFramebuffer.create(setup.width, setup.height)
+    try:
+        with borrow_pool(executor, workers) as ex, job_context(setup, fb.name, "ppm") as (ctx, token):
+            pending = set()
+            while queue or pending:
+                while queue and len(pending) < in_flight_limit(workers):
+                    pending.add(ex.submit(_render_tiles, ctx, [queue.pop()], setup.seed))
+                finished, pending = wait(pending, timeout=CANCEL_POLL_S, return_when=FIRST_COMPLETED)
+                if should_stop():
+                    cancel_batches(token, pending)
+                    raise JobCancelled(f"render_tiles cancelled after {len(out)}/{len(tiles)} tiles")
+                for f in finished:
+                    for tile, n in f.result():
+                        out.append((tile, fb.read_tile(tile), n))
+    finally:
+        fb.close()
+    return out
+
 def b64(data: bytes) -> str:
     return base64.b64encode(data).decode("ascii")
 
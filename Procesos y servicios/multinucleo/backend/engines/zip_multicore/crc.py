@@ -0,0 +1,45 @@
+"""
+crc32_combine: CRC32 de A+B a partir de crc(A), crc(B) y len(B).
+
+zlib lo tiene en C pero el módulo de Python no lo expone. Mismo algoritmo
+(matrices 32x32 sobre GF(2), O(log len2)): permite calcular el CRC de un
+fichero grande por rangos en paralelo y juntarlos en el padre.
+"""
+
+CRC32_POLY = 0xedb88320  # polinomio reflejado de CRC-32 (zlib)
+
+
+def _gf2_times(mat, vec: int) -> int:
+    s = 0
+    i = 0
+    while vec:
+        if vec & 1:
+            s ^= mat[i]
+        vec >>= 1
+        i += 1
+    return s
+
+def _gf2_square(mat):
+    return [_gf2_times(mat, mat[n]) for n in range(32)]
+
+def crc32_combine(crc1: int, crc2: int, len2: int) -> int:
+    if len2 <= 0:
+        return crc1
+    odd = [CRC32_POLY] + [1 << n for n in range(31)]  # operador "un bit cero"
+    even = _gf2_square(odd)  # dos bits cero
+    odd = _gf2_square(even)  # cuatro bits cero
+    # aplica len2 bytes cero a crc1 (primer cuadrado: un byte = ocho bits)
+    while True:
+        even = _gf2_square(odd)
+        if len2 & 1:
+            crc1 = _gf2_times(even, crc1)
+        len2 >>= 1
+        if not len2:
+            break
+        odd = _gf2_square(even)
+        if len2 & 1:
+            crc1 = _gf2_times(odd, crc1)
+        len2 >>= 1
+        if not len2:
+            break
+    return crc1 ^ crc2
@@ -0,0 +1,314 @@
+"""
+Extracción y verificación de ZIP en paralelo (contraparte de zip_outputs).
+
+El padre solo lee el directorio central (clásico o ZIP64) y reparte las
+entradas por el pool: cada worker lee su payload con pread, lo descomprime,
+comprueba el CRC y, si se extrae, escribe con pwrite. Nadie comparte posición
+de fichero, así que varios workers leen el mismo zip (y escriben el mismo
+fichero de salida) a la vez. Las entradas STORE grandes se reparten por
+rangos y el padre combina sus CRCs, como al comprimir.
+"""
+import os
+import struct
+import time
+import zlib
+from concurrent.futures import FIRST_COMPLETED, Executor, wait
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import Callable, Iterator, List, Optional
+
+from backend.engines.zip_multicore.crc import crc32_combine
+from backend.engines.zip_multicore.zipper import BLOCK_SIZE, RANGE_SIZE, SPLIT_MIN, ZIP_CANCEL_POLL_S, ZIP_METHODS, _mb
+from backend.engines.zip_multicore.zipstream import (
+    CENTRAL_HEADER, CENTRAL_SIG, END_LOCATOR64, END_RECORD, END_RECORD64, END_SIG, END64_SIG,
+    LOCAL_HEADER, LOCAL_SIG, LOCATOR64_SIG, MARK16, MARK32, ZIP64_EXTRA_ID
+)
+from backend.jobs.cancel import JobCancelled
+from backend.jobs.pool import borrow_pool
+from backend.utils.files import ensure_dir
+from backend.utils.trace import span
+
+# El EOCD está en los últimos 22 bytes + comentario (como mucho 64 KiB)
+MAX_COMMENT = 0xFFFF
+
+
+@dataclass(frozen=True)
+class ZipEntry:
+    name: str
+    method: int
+    flags: int
+    crc32: int
+    size: int
+    compressed_size: int
+    header_offset: int
+
+@dataclass
+class EntryResult:
+    name: str
+    size: int             # bytes descomprimidos
+    crc32: int            # CRC calculado (se compara en el padre)
+    seconds: float        # tiempo de worker
+    error: Optional[str] = None
+
+def read_central_directory(path: Path) -> List[ZipEntry]:
+    """Entradas del zip según su directorio central (con extras ZIP64 si los hay)."""
+    with open(path, "rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        tail_len = min(end, END_RECORD.size + MAX_COMMENT)
+        f.seek(end - tail_len)
+        tail = f.read(tail_len)
+        pos = tail.rfind(END_SIG.to_bytes(4, "little"))
+        if pos < 0 or pos + END_RECORD.size > len(tail):
+            raise ValueError(f"{path.name}: not a zip file")
+        _, _, _, _, count, cd_size, cd_offset, _ = END_RECORD.unpack_from(tail, pos)
+        if count == MARK16 or cd_size == MARK32 or cd_offset == MARK32:
+            f.seek(end - tail_len + pos - END_LOCATOR64.size)
+            sig, _, end64_offset, _ = END_LOCATOR64.unpack(f.read(END_LOCATOR64.size))
+            if sig != LOCATOR64_SIG:
+                raise ValueError(f"{path.name}: ZIP64 locator not found")
+            f.seek(end64_offset)
+            record = END_RECORD64.unpack(f.read(END_RECORD64.size))
+            if record[0] != END64_SIG:
+                raise ValueError(f"{path.name}: bad ZIP64 end record")
+            count, cd_size, cd_offset = record[7:10]
+        f.seek(cd_offset)
+        cd = f.read(cd_size)
+    if len(cd) != cd_size:
+        raise ValueError(f"{path.name}: truncated central directory")
+
+    entries = []
+    pos = 0
+    for _ in range(count):
+        (sig, _, _, flags, method, _, _, crc, csize, size,
+         name_len, extra_len, comment_len, _, _, _, offset) = CENTRAL_HEADER.unpack_from(cd, pos)
+        if sig != CENTRAL_SIG:
+            raise ValueError(f"{path.name}: bad central directory entry")
+        pos += CENTRAL_HEADER.size
+        name = _decode_name(cd[pos:pos + name_len], flags)
+        extra = cd[pos + name_len:pos + name_len + extra_len]
+        pos += name_len + extra_len + comment_len
+        # los campos marcados van en el extra ZIP64, en orden: size, csize, offset
+        values = iter(_zip64_values(extra))
+        if size == MARK32:
+            size = next(values)
+        if csize == MARK32:
+            csize = next(values)
+        if offset == MARK32:
+            offset = next(values)
+        entries.append(ZipEntry(name, method, flags, crc, size, csize, offset))
+    return entries
+
+def _decode_name(raw: bytes, flags: int) -> str:
+    # bit 11: nombre en UTF-8; si no, CP437 (ZipStreamWriter escribe UTF-8 sin el bit)
+    if flags & 0x800:
+        return raw.decode("utf-8")
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return raw.decode("cp437")
+
+def _zip64_values(extra: bytes) -> List[int]:
+    pos = 0
+    while pos + 4 <= len(extra):
+        tag, length = struct.unpack_from("<HH", extra, pos)
+        if tag == ZIP64_EXTRA_ID:
+            return list(struct.unpack_from(f"<{length // 8}Q", extra, pos + 4))
+        pos += 4 + length
+    return []
+
+def _dest(out_dir: Path, name: str) -> Path:
+    """Ruta de salida de una entrada; rechaza rutas absolutas o con '..' (zip slip)."""
+    parts = PurePosixPath(name).parts
+    if not parts or name.startswith("/") or "\\" in name or ".." in parts or ":" in parts[0]:
+        raise ValueError(f"unsafe entry name: {name!r}")
+    return out_dir.joinpath(*parts)
+
+def _data_offset(fd: int, e: ZipEntry) -> int:
+    head = os.pread(fd, LOCAL_HEADER.size, e.header_offset)
+    if len(head) != LOCAL_HEADER.size or LOCAL_HEADER.unpack(head)[0] != LOCAL_SIG:
+        raise ValueError("bad local header")
+    name_len, extra_len = LOCAL_HEADER.unpack(head)[9:11]
+    return e.header_offset + LOCAL_HEADER.size + name_len + extra_len
+
+def _pread_blocks(fd: int, offset: int, length: int) -> Iterator[bytes]:
+    while length > 0:
+        block = os.pread(fd, min(BLOCK_SIZE, length), offset)
+        if not block:
+            raise ValueError("truncated data")
+        offset += len(block)
+        length -= len(block)
+        yield block
+
+def _inflate(blocks: Iterator[bytes]) -> Iterator[bytes]:
+    """Deflate raw a bloques de como mucho BLOCK_SIZE (aunque el ratio sea enorme)."""
+    d = zlib.decompressobj(-15)
+    for block in blocks:
+        while block:
+            yield d.decompress(block, BLOCK_SIZE)
+            block = d.unconsumed_tail
+    tail = d.flush()
+    if tail:
+        yield tail
+    if not d.eof:
+        raise ValueError("incomplete deflate stream")
+
+def _extract_entry(zip_path: str, e: ZipEntry, dest: Optional[str]) -> EntryResult:
+    """
+    Worker: descomprime una entrada entera y calcula su CRC; si hay `dest`,
+    la escribe con pwrite. Los errores de datos se devuelven, no se lanzan,
+    para que la verificación informe de todas las entradas.
+    """
+    with span("file", name=e.name):
+        t0 = time.perf_counter()
+        crc = 0
+        size = 0
+        zfd = os.open(zip_path, os.O_RDONLY)
+        out = os.open(dest, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644) if dest else None
+        try:
+            blocks = _pread_blocks(zfd, _data_offset(zfd, e), e.compressed_size)
+            for block in (_inflate(blocks) if e.method == 8 else blocks):
+                crc = zlib.crc32(block, crc)
+                if out is not None:
+                    os.pwrite(out, block, size)
+                size += len(block)
+            error = None if size == e.size else f"size mismatch ({size} != {e.size})"
+        except (ValueError, zlib.error) as ex:
+            error = str(ex)
+        finally:
+            os.close(zfd)
+            if out is not None:
+                os.close(out)
+        return EntryResult(e.name, size, crc & 0xffffffff, time.perf_counter() - t0, error)
+
+def _extract_range(zip_path: str, e: ZipEntry, offset: int, length: int, dest: Optional[str]) -> EntryResult:
+    """Worker: rango [offset, offset+length) de una entrada STORE (dest ya creado con su tamaño)."""
+    with span("range", name=e.name, offset=offset):
+        t0 = time.perf_counter()
+        crc = 0
+        done = 0
+        zfd = os.open(zip_path, os.O_RDONLY)
+        out = os.open(dest, os.O_WRONLY) if dest else None
+        try:
+            for block in _pread_blocks(zfd, _data_offset(zfd, e) + offset, length):
+                crc = zlib.crc32(block, crc)
+                if out is not None:
+                    os.pwrite(out, block, offset + done)
+                done += len(block)
+            error = None
+        except ValueError as ex:
+            error = str(ex)
+        finally:
+            os.close(zfd)
+            if out is not None:
+                os.close(out)
+        return EntryResult(e.name, done, crc & 0xffffffff, time.perf_counter() - t0, error)
+
+def _report(e: ZipEntry, r: EntryResult) -> dict:
+    error = r.error or (None if r.crc32 == e.crc32 else f"CRC mismatch ({r.crc32:08x} != {e.crc32:08x})")
+    return {
+        "name": e.name, "size": e.size, "compressed_size": e.compressed_size,
+        "ok": error is None, "error": error, "seconds": round(r.seconds, 4),
+        "mb_s": round(e.size / 2**20 / r.seconds, 1) if r.seconds > 0 else None,
+    }
+
+def unzip_archive(
+    zip_path: Path,
+    out_dir: Optional[Path] = None,
+    workers: int = 0,
+    on_progress: Callable[[int,str], None] = lambda pct, msg: None,
+    executor: Optional[Executor] = None,
+    should_stop: Callable[[], bool] = lambda: False,
+    stats: Optional[dict] = None
+) -> List[dict]:
+    """
+    Verifica (out_dir=None) o extrae en out_dir el zip, repartiendo las
+    entradas por el pool. Devuelve un informe por fichero, ordenado por nombre:
+    {name, size, compressed_size, ok, error, seconds, mb_s}; seconds y mb_s
+    son tiempo y throughput de worker (suma de rangos en entradas partidas).
+    Métodos admitidos: store y deflate, sin cifrado.
+    Si should_stop() pasa a True se cancela lo pendiente y se lanza JobCancelled
+    (lo ya extraído se queda en out_dir).
+    Si se pasa `stats`, se rellena con files, bad_files, bytes, seconds y mb_s.
+    """
+    with span("read_central_directory"):
+        entries = read_central_directory(zip_path)
+    for e in entries:
+        if e.method not in ZIP_METHODS.values():
+            raise ValueError(f"{e.name}: unsupported compression method {e.method}")
+        if e.flags & 0x1:
+            raise ValueError(f"{e.name}: encrypted entries are not supported")
+    files = [e for e in entries if not e.name.endswith("/")]
+    dests = {}
+    if out_dir is not None:
+        ensure_dir(out_dir)
+        for e in entries:
+            if e.name.endswith("/"):
+                ensure_dir(_dest(out_dir, e.name))
+            else:
+                dests[e.name] = _dest(out_dir, e.name)
+                ensure_dir(dests[e.name].parent)
+
+    action = "Extracting" if out_dir is not None else "Verifying"
+    on_progress(0, f"{action} {len(files)} entries with {workers or os.cpu_count()} processes…")
+    t0 = time.perf_counter()
+    report = []
+    reported = 0
+    step = max(1, len(files)//10)
+    with borrow_pool(executor, workers or (os.cpu_count() or 2)) as ex:
+        pending = {}  # future => (entrada, None) o (entrada, estado de la entrada por rangos)
+        for e in files:
+            dest = str(dests[e.name]) if e.name in dests else None
+            if e.method != 0 or e.size < SPLIT_MIN:
+                pending[ex.submit(_extract_entry, str(zip_path), e, dest)] = (e, None)
+                continue
+            if dest:
+                with open(dest, "wb") as f:
+                    f.truncate(e.size)
+            n = -(-e.size // RANGE_SIZE)
+            split = {"parts": [None]*n, "left": n}
+            for i in range(n):
+                offset = i*RANGE_SIZE
+                fut = ex.submit(_extract_range, str(zip_path), e, offset, min(RANGE_SIZE, e.size - offset), dest)
+                pending[fut] = (e, (split, i))
+        while pending:
+            finished, _ = wait(pending, timeout=ZIP_CANCEL_POLL_S, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                e, split = pending.pop(fut)
+                r = fut.result()
+                if split is not None:
+                    state, i = split
+                    state["parts"][i] = r
+                    state["left"] -= 1
+                    if state["left"]:
+                        continue
+                    parts = state["parts"]
+                    crc = parts[0].crc32
+                    for part in parts[1:]:
+                        crc = crc32_combine(crc, part.crc32, part.size)
+                    r = EntryResult(e.name, sum(p.size for p in parts), crc, sum(p.seconds for p in parts),
+                                    next((p.error for p in parts if p.error), None))
+                report.append(_report(e, r))
+            done = len(report)
+            if done // step != reported // step or (done == len(files) and reported != done):
+                reported = done
+                bad = sum(not x["ok"] for x in report)
+                on_progress(int(done*100/len(files)), f"{done}/{len(files)} entries, {bad} bad")
+            if pending and should_stop():
+                for fut in pending:
+                    fut.cancel()
+                wait(pending)
+                raise JobCancelled(f"unzip cancelled after {done}/{len(files)} entries")
+
+    report.sort(key=lambda x: x["name"])
+    seconds = time.perf_counter() - t0
+    total = sum(e.size for e in files)
+    if stats is not None:
+        stats.update({
+            "files": len(files),
+            "bad_files": sum(not x["ok"] for x in report),
+            "bytes": total,
+            "seconds": seconds,
+            "mb_s": total / 2**20 / seconds if seconds > 0 else None,
+        })
+    on_progress(100, f"{action} done: {len(files)} entries, {_mb(total)} in {seconds:.2f}s")
+    return report
@@ -1,140 +1,401 @@
 import base64
+import json
+import mmap
 import os
+import shutil
+import tempfile
+import time
 import zlib
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, Executor, wait
+from contextlib import closing, contextmanager, nullcontext
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Callable, List, Tuple
+from typing import Callable, Iterator, List, Optional, Tuple
 
+from backend.engines.zip_multicore.crc import crc32_combine
+from backend.engines.zip_multicore.zipstream import ZipStreamWriter
+from backend.jobs.cancel import CancelToken, JobCancelled
+from backend.jobs.pool import borrow_pool
 from backend.utils.files import ensure_dir, safe_name
+from backend.utils.trace import span
 
+# Cada cuánto revisa el padre should_stop() mientras espera lecturas
+ZIP_CANCEL_POLL_S = 0.1
 
+# Métodos ZIP soportados (nombre => código en las cabeceras)
+ZIP_METHODS = {"store": 0, "deflate": 8}
+DEFAULT_LEVEL = 6
+
+# Lectura/compresión por bloques: nadie tiene un fichero entero en memoria
+BLOCK_SIZE = 1024 * 1024
+# Payloads deflate mayores no viajan por IPC: el worker los vuelca a un
+# fichero temporal. Con store no viaja nada: el padre copia del original.
+INLINE_MAX = 4 * 1024 * 1024
+
+# Ficheros grandes: se parten en rangos de RANGE_SIZE que los workers procesan
+# en paralelo vía mmap (CRC parcial + deflate estilo pigz). RANGE_SIZE debe ser
+# múltiplo de mmap.ALLOCATIONGRANULARITY.
+SPLIT_MIN = 32 * 1024 * 1024
+RANGE_SIZE = 16 * 1024 * 1024
+RANGE_INLINE_MAX = 64 * 1024
+# Ventana de deflate: cada rango se comprime con los 32 KiB previos como diccionario
+DEFLATE_WINDOW = 32 * 1024
+
+# Formato del manifiesto del modo incremental (outputs.zip.manifest.json)
+MANIFEST_VERSION = 1
+
+
+@contextmanager
+def _cancel_check(cancel_shm: Optional[str]) -> Iterator[Callable[[], None]]:
+    """check() para el worker: lanza JobCancelled si el padre marcó el CancelToken del zip."""
+    if cancel_shm is None:
+        yield lambda: None
+        return
+    token = CancelToken.attach(cancel_shm)
+    def check():
+        if token.is_set():
+            raise JobCancelled("zip cancelled")
+    try:
+        yield check
+    finally:
+        token.close()
 
 @dataclass
 class FileChunk:
     relpath: str
-    data: bytes
-    crc32: int
-    size: int
+    crc32: int        # CRC del contenido original
+    size: int         # tamaño original
+    compressed_size: int
+    method: int
+    data: Optional[bytes] = None   # payload pequeño, en memoria
+    spool: Optional[str] = None    # payload comprimido en un fichero temporal
+    source: Optional[str] = None   # store: el padre copia del original
+    parts: Optional[List["FileChunk"]] = None  # fichero por rangos: payloads en orden
 
-def _read_and_crc(path: Path, base: Path) -> FileChunk:
-    data = path.read_bytes()
-    crc = zlib.crc32(data) & 0xffffffff
+def _read_and_crc(path: Path, base: Path, method: int = 0, level: int = DEFAULT_LEVEL, spool_dir: Optional[str] = None,
+                  cancel_shm: Optional[str] = None) -> FileChunk:
+    """
+    Lee por bloques, calcula el CRC y (method=8) comprime en el worker con
+    deflate "raw" (wbits negativos: sin cabecera/adler zlib, como pide ZIP).
+    Al padre llega el payload deflate si es pequeño; si no, dónde leerlo.
+    Consulta el CancelToken `cancel_shm` en cada bloque.
+    """
     rel = str(path.relative_to(base)).replace("\\", "/")
-    return FileChunk(relpath=rel, data=data, crc32=crc, size=len(data))
+    with span("file", name=rel), _cancel_check(cancel_shm) as check:
+        crc = 0
+        size = 0
+        if method == 0:
+            with open(path, "rb") as f:
+                while block := f.read(BLOCK_SIZE):
+                    check()
+                    crc = zlib.crc32(block, crc)
+                    size += len(block)
+            return FileChunk(rel, crc & 0xffffffff, size, size, 0, source=str(path))
+
+        co = zlib.compressobj(level, zlib.DEFLATED, -15)
+        out = bytearray()
+        spool = None
+        csize = 0
+        try:
+            with open(path, "rb") as f:
+                while True:
+                    check()
+                    block = f.read(BLOCK_SIZE)
+                    piece = co.compress(block) if block else co.flush()
+                    if block:
+                        crc = zlib.crc32(block, crc)
+                        size += len(block)
+                    out += piece
+                    csize += len(piece)
+                    if spool is None and len(out) > INLINE_MAX:
+                        spool = tempfile.NamedTemporaryFile(dir=spool_dir, suffix=".deflate", delete=False)
+                    if spool is not None:
+                        spool.write(out)
+                        out.clear()
+                    if not block:
+                        break
+        finally:
+            if spool is not None:
+                spool.close()
+        if spool is not None:
+            return FileChunk(rel, crc & 0xffffffff, size, csize, 8, spool=spool.name)
+        return FileChunk(rel, crc & 0xffffffff, size, csize, 8, data=bytes(out))
 
-def _zip_store(chunks: List[FileChunk]) -> bytes:
+def _crc_range(path: Path, offset: int, length: int, method: int, level: int, final: bool, spool_dir: str,
+               cancel_shm: Optional[str] = None) -> FileChunk:
     """
-    ZIP mínimo con método STORE (sin compresión) para simplificar.
-    Aun así el pipeline es multinúcleo: lectura+CRC en paralelo.
+    Un rango [offset, offset+length) de un fichero grande, leído con mmap:
+    CRC parcial y, con deflate, un trozo de stream estilo pigz: diccionario
+    con los 32 KiB anteriores y Z_SYNC_FLUSH (Z_FINISH en el último), de modo
+    que concatenar los trozos en orden da un stream deflate válido.
+    Con store solo devuelve el CRC: los datos los copia el padre del original.
+    Recorre el rango por bloques de BLOCK_SIZE para consultar el CancelToken.
     """
-    # Estructuras ZIP
-    # Local file header: 30 bytes + filename + data
-    # Central directory + end record
-    import struct
-    out = bytearray()
-    central = bytearray()
-    offset = 0
-
-    for c in chunks:
-        name_bytes = c.relpath.encode("utf-8")
-        # Local header signature
-        out += struct.pack("<IHHHHHIIIHH",
-            0x04034b50,  # local file header sig
-            20,          # version needed
-            0,           # flags
-            0,           # method 0 store
-            0,           # mtime
-            0,           # mdate
-            c.crc32,
-            c.size,
-            c.size,
-            len(name_bytes),
-            0            
-        )
-        out += name_bytes
-        out += c.data
-
-        # Central dir header
-        central += struct.pack("<IHHHHHHIIIHHHHHII",
-            0x02014b50,  # central dir sig
-            20,          # version made by
-            20,          # version needed
-            0,           # flags
-            0,           # method
-            0,           # mtime
-            0,           # mdate
-            c.crc32,
-            c.size,
-            c.size,
-            len(name_bytes),
-            0, 0,        # extra, comment
-            0, 0,        # disk, int attrs
-            0,           # ext attrs
-            offset
-        )
-        central += name_bytes
-
-        offset += 30 + len(name_bytes) + c.size
-
-    cd_offset = len(out)
-    out += central
-
-    import struct
-    out += struct.pack("<IHHHHIIH",
-        0x06054b50,
-        0, 0,
-        len(chunks),
-        len(chunks),
-        len(central),
-        cd_offset,
-        0
-    )
-
-    return bytes(out)
+    with span("range", name=path.name, offset=offset), _cancel_check(cancel_shm) as check:
+        start = max(0, offset - DEFLATE_WINDOW) // mmap.ALLOCATIONGRANULARITY * mmap.ALLOCATIONGRANULARITY
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), offset - start + length, access=mmap.ACCESS_READ, offset=start) as mm:
+            # las vistas se liberan antes de cerrar el mmap
+            with memoryview(mm) as view:
+                co = None
+                if method != 0:
+                    if offset > 0:
+                        with view[offset - start - DEFLATE_WINDOW:offset - start] as zdict:
+                            co = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=zdict)
+                    else:
+                        co = zlib.compressobj(level, zlib.DEFLATED, -15)
+                crc = 0
+                pieces = []
+                for pos in range(offset - start, offset - start + length, BLOCK_SIZE):
+                    check()
+                    with view[pos:pos + BLOCK_SIZE] as block:
+                        crc = zlib.crc32(block, crc)
+                        if co is not None:
+                            pieces.append(co.compress(block))
+                crc &= 0xffffffff
+                if co is None:
+                    return FileChunk(str(path), crc, length, length, 0)
+                pieces.append(co.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH))
+                data = b"".join(pieces)
+        if len(data) <= RANGE_INLINE_MAX:
+            return FileChunk(str(path), crc, length, len(data), 8, data=data)
+        with tempfile.NamedTemporaryFile(dir=spool_dir, suffix=".deflate", delete=False) as spool:
+            spool.write(data)
+        return FileChunk(str(path), crc, length, len(data), 8, spool=spool.name)
+
+def _join_ranges(rel: str, path: Path, parts: List[FileChunk]) -> FileChunk:
+    """Entrada de un fichero procesado por rangos: CRCs combinados y payloads en orden."""
+    crc = parts[0].crc32
+    for part in parts[1:]:
+        crc = crc32_combine(crc, part.crc32, part.size)
+    size = sum(p.size for p in parts)
+    method = parts[0].method
+    if method == 0:
+        return FileChunk(rel, crc, size, size, 0, source=str(path))
+    return FileChunk(rel, crc, size, sum(p.compressed_size for p in parts), 8, parts=parts)
+
+def _payload(c: FileChunk) -> Iterator[bytes]:
+    """Bloques del payload de una entrada (borra los temporales al terminar)."""
+    if c.parts is not None:
+        for part in c.parts:
+            yield from _payload(part)
+        return
+    if c.data is not None:
+        yield c.data
+        return
+    path = c.spool or c.source
+    try:
+        with open(path, "rb") as f:
+            remaining = c.compressed_size
+            while remaining > 0:
+                block = f.read(min(BLOCK_SIZE, remaining))
+                if not block:
+                    raise RuntimeError(f"{c.relpath}: file shrank while zipping")
+                remaining -= len(block)
+                yield block
+    finally:
+        if c.spool:
+            os.unlink(c.spool)
+
+def manifest_path(zip_path: Path) -> Path:
+    return zip_path.with_name(zip_path.name + ".manifest.json")
+
+def _load_manifest(zip_path: Path, method: str, level: int) -> dict:
+    """
+    Entradas del zip anterior reutilizables: {relpath: {size, mtime_ns, crc32,
+    compressed_size, method, data_offset}}. Vacío si no hay manifiesto, si es
+    de otro método/nivel o si el zip ya no es el que describe.
+    """
+    try:
+        m = json.loads(manifest_path(zip_path).read_text(encoding="utf-8"))
+        st = zip_path.stat()
+    except (OSError, ValueError):
+        return {}
+    archive = m.get("archive", {})
+    if (m.get("version") != MANIFEST_VERSION or m.get("method") != method or m.get("level") != level
+            or archive.get("size") != st.st_size or archive.get("mtime_ns") != st.st_mtime_ns):
+        return {}
+    return m.get("entries", {})
+
+def _save_manifest(zip_path: Path, method: str, level: int, entries: dict):
+    st = zip_path.stat()
+    path = manifest_path(zip_path)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps({
+        "version": MANIFEST_VERSION,
+        "method": method,
+        "level": level,
+        "archive": {"size": st.st_size, "mtime_ns": st.st_mtime_ns},
+        "entries": entries,
+    }, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, path)
+
+def _copy_range(f, offset: int, length: int) -> Iterator[bytes]:
+    """Bloques de f[offset:offset+length] (payload ya comprimido del zip anterior)."""
+    while length > 0:
+        f.seek(offset)
+        block = f.read(min(BLOCK_SIZE, length))
+        if not block:
+            raise RuntimeError("previous archive is truncated")
+        offset += len(block)
+        length -= len(block)
+        yield block
+
+def _mb(n: int) -> str:
+    return f"{n/2**20:.1f} MB"
 
 def zip_outputs(
     input_dir: Path,
     out_dir: Path,
     workers: int = 0,
-    on_progress: Callable[[int,str], None] = lambda pct, msg: None
-) -> Tuple[str, bytes]:
+    on_progress: Callable[[int,str], None] = lambda pct, msg: None,
+    executor: Optional[Executor] = None,
+    should_stop: Callable[[], bool] = lambda: False,
+    method: str = "deflate",
+    level: int = DEFAULT_LEVEL,
+    incremental: bool = True,
+    stats: Optional[dict] = None
+) -> Tuple[str, Path]:
     """
-    Crea ZIP de input_dir. Multinúcleo real en la fase de lectura+CRC.
-    Generación final del zip es secuencial (por simplicidad y robustez).
+    Crea ZIP de input_dir y devuelve (filename, ruta del zip).
+    Multinúcleo real en la fase de lectura+CRC+compresión: con method="deflate"
+    cada worker comprime su fichero (nivel `level`, 0-9); con "store" se guarda
+    sin comprimir. Los ficheros de SPLIT_MIN o más se reparten por rangos
+    entre varios workers (mmap + crc32_combine). Cada entrada se escribe en
+    disco en cuanto está completa (ZipStreamWriter): en memoria solo queda el
+    directorio central.
+    incremental: junto al zip se guarda un manifiesto (ruta, tamaño, mtime,
+    CRC, offset del payload); los ficheros sin cambios copian sus bytes ya
+    comprimidos del zip anterior y solo los nuevos/modificados van al pool.
+    `executor`: pool compartido (backend.jobs.pool); si no, uno propio.
+    Si should_stop() pasa a True se cancelan las lecturas pendientes, las que
+    están en marcha se abandonan en el siguiente bloque (CancelToken) y se lanza
+    JobCancelled.
+    Si se pasa `stats`, se rellena con files, reused_files/bytes, recomputed_files/bytes y seconds.
     """
+    if method not in ZIP_METHODS:
+        raise ValueError(f"method must be one of {tuple(ZIP_METHODS)}")
+    level = int(level)
+    if not 0 <= level <= 9:
+        raise ValueError("level must be between 0 and 9")
     ensure_dir(out_dir)
     if not input_dir.exists():
         raise FileNotFoundError(f"No existe {input_dir}")
 
-    files = [p for p in input_dir.rglob("*") if p.is_file()]
+    files = sorted(p for p in input_dir.rglob("*") if p.is_file())
     if not files:
         raise RuntimeError("No hay archivos para comprimir.")
 
     workers = workers or (os.cpu_count() or 2)
-    on_progress(0, f"Zipping {len(files)} files with {workers} processes…")
-
-    chunks: List[FileChunk] = []
-    with ProcessPoolExecutor(max_workers=workers) as ex:
-        futs = [ex.submit(_read_and_crc, p, input_dir) for p in files]
-        done = 0
-        for f in as_completed(futs):
-            chunks.append(f.result())
-            done += 1
-            pct = int(done*80/len(files))  
-            if done % max(1, len(files)//10) == 0 or done == len(files):
-                on_progress(pct, f"Read+CRC: {done}/{len(files)}")
-
-    on_progress(90, "Building ZIP container…")
-    zip_bytes = _zip_store(sorted(chunks, key=lambda c: c.relpath))
-
     filename = safe_name("outputs.zip")
     out_path = out_dir / filename
-    out_path.write_bytes(zip_bytes)
+    tmp_path = out_path.with_suffix(".zip.tmp")
+
+    previous = _load_manifest(out_path, method, level) if incremental else {}
+    reuse = []   # (relpath, entrada del manifiesto, stat)
+    todo = []    # (path, stat)
+    for p in files:
+        st = p.stat()
+        rel = str(p.relative_to(input_dir)).replace("\\", "/")
+        old = previous.get(rel)
+        if old and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns:
+            reuse.append((rel, old))
+        else:
+            todo.append((p, st))
+    on_progress(0, f"Zipping {len(files)} files ({method}) with {workers} processes: "
+                   f"{len(reuse)} unchanged, {len(todo)} new or modified…")
 
-    on_progress(100, f"ZIP done: {filename}")
-    return filename, zip_bytes
+    t0 = time.perf_counter()
+    entries = {}
+    reused_bytes = 0
+    recomputed_bytes = 0
+    done = 0
+    reported = 0
+    step = max(1, len(files)//10)
+    spool_dir = tempfile.mkdtemp(prefix=".spool-", dir=out_dir)
+    try:
+        with open(tmp_path, "wb") as f, borrow_pool(executor, workers) as ex, \
+                (open(out_path, "rb") if reuse else nullcontext()) as old_zip, closing(CancelToken.create()) as token:
+            writer = ZipStreamWriter(f)
+            code = ZIP_METHODS[method]
+            pending = {}  # future => (stat, None) o (stat, estado del fichero por rangos)
+            for p, st in todo:
+                if st.st_size < SPLIT_MIN:
+                    pending[ex.submit(_read_and_crc, p, input_dir, code, level, spool_dir, token.name)] = (st, None)
+                    continue
+                n = -(-st.st_size // RANGE_SIZE)
+                split = {"path": p, "parts": [None]*n, "left": n}
+                for i in range(n):
+                    offset = i*RANGE_SIZE
+                    length = min(RANGE_SIZE, st.st_size - offset)
+                    fut = ex.submit(_crc_range, p, offset, length, code, level, i == n - 1, spool_dir, token.name)
+                    pending[fut] = (st, (split, i))
+            while pending or reuse:
+                if reuse:
+                    # mientras los workers trabajan, el padre copia las entradas sin cambios
+                    rel, e = reuse.pop()
+                    with span("reuse_entry", name=rel, bytes=e["compressed_size"]):
+                        e = dict(e, data_offset=writer.add(
+                            rel, e["crc32"], e["size"], e["compressed_size"], e["method"],
+                            _copy_range(old_zip, e["data_offset"], e["compressed_size"])
+                        ))
+                    entries[rel] = e
+                    reused_bytes += e["size"]
+                    finished = [fut for fut in pending if fut.done()]
+                    done += 1
+                else:
+                    finished, _ = wait(pending, timeout=ZIP_CANCEL_POLL_S, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    st, split = pending.pop(fut)
+                    c = fut.result()
+                    if split is not None:
+                        state, i = split
+                        state["parts"][i] = c
+                        state["left"] -= 1
+                        if state["left"]:
+                            continue
+                        rel = str(state["path"].relative_to(input_dir)).replace("\\", "/")
+                        c = _join_ranges(rel, state["path"], state["parts"])
+                    with span("write_entry", name=c.relpath, bytes=c.compressed_size):
+                        entries[c.relpath] = {
+                            "size": c.size, "mtime_ns": st.st_mtime_ns, "crc32": c.crc32,
+                            "compressed_size": c.compressed_size, "method": c.method,
+                            "data_offset": writer.add(c.relpath, c.crc32, c.size, c.compressed_size, c.method, _payload(c)),
+                        }
+                    recomputed_bytes += c.size
+                    done += 1
+                if done // step != reported // step or (done == len(files) and reported != done):
+                    reported = done
+                    on_progress(int(done*90/len(files)), f"{done}/{len(files)} files: "
+                                f"reused {_mb(reused_bytes)}, recomputed {_mb(recomputed_bytes)}")
+                if should_stop():
+                    # también con solo entradas reutilizadas por copiar (re-zip incremental)
+                    if pending:
+                        token.set()
+                        for fut in pending:
+                            fut.cancel()
+                        wait(pending)
+                    raise JobCancelled(f"zip cancelled after {done}/{len(files)} files")
+            on_progress(95, "Writing central directory…")
+            with span("central_directory", entries=len(entries)):
+                writer.close()
+        os.replace(tmp_path, out_path)  # atómico: nunca se sirve un zip a medias
+        with span("save_manifest"):
+            _save_manifest(out_path, method, level, entries)
+    finally:
+        shutil.rmtree(spool_dir, ignore_errors=True)
+        tmp_path.unlink(missing_ok=True)
+
+    if stats is not None:
+        stats.update({
+            "files": len(files),
+            "reused_files": len(files) - len(todo),
+            "reused_bytes": reused_bytes,
+            "recomputed_files": len(todo),
+            "recomputed_bytes": recomputed_bytes,
+            "seconds": time.perf_counter() - t0,
+        })
+    on_progress(100, f"ZIP done: {filename} (reused {_mb(reused_bytes)}, recomputed {_mb(recomputed_bytes)})")
+    return filename, out_path
 
 def b64(data: bytes) -> str:
     return base64.b64encode(data).decode("ascii")
-
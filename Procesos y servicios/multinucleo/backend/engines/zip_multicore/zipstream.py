@@ -0,0 +1,131 @@
+"""
+Escritor ZIP en streaming.
+
+Cada entrada se escribe en el fichero de salida en cuanto está lista
+(cabecera local + payload por bloques); en memoria solo se guarda el
+directorio central, que se vuelca al cerrar junto con el EOCD.
+
+Los workers calculan CRC y tamaños antes de que el padre escriba la entrada,
+así que las cabeceras locales van completas y no hacen falta data
+descriptors (bit 3): el zip se puede leer también en streaming.
+
+ZIP64: si un tamaño u offset no cabe en 32 bits o hay demasiadas entradas
+para 16 bits, se escribe el campo extra ZIP64 (0x0001) en esa entrada y el
+registro EOCD64 + localizador antes del EOCD clásico, automáticamente.
+"""
+import struct
+from typing import BinaryIO, Iterable
+
+LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+END_RECORD = struct.Struct("<IHHHHIIH")
+END_RECORD64 = struct.Struct("<IQHHIIQQQQ")
+END_LOCATOR64 = struct.Struct("<IIQI")
+
+LOCAL_SIG = 0x04034b50
+CENTRAL_SIG = 0x02014b50
+END_SIG = 0x06054b50
+END64_SIG = 0x06064b50
+LOCATOR64_SIG = 0x07064b50
+ZIP64_EXTRA_ID = 0x0001
+
+VERSION = 20        # 2.0: deflate
+VERSION_ZIP64 = 45  # 4.5: extensiones ZIP64
+
+# Valor de campo que significa "el dato real está en ZIP64"
+MARK32 = 0xFFFFFFFF
+MARK16 = 0xFFFF
+
+# Umbrales a partir de los cuales hace falta ZIP64 (a nivel de módulo para
+# poder bajarlos en los tests; las marcas de arriba no cambian)
+ZIP64_LIMIT = MARK32
+ZIP_FILECOUNT_LIMIT = MARK16
+
+
+def _zip64_extra(*values: int) -> bytes:
+    return struct.pack(f"<HH{len(values)}Q", ZIP64_EXTRA_ID, 8*len(values), *values)
+
+class ZipStreamWriter:
+    def __init__(self, f: BinaryIO):
+        self.f = f
+        self.offset = 0
+        self.entries = 0
+        self.central = bytearray()
+
+    def add(self, name: str, crc32: int, size: int, compressed_size: int, method: int, payload: Iterable[bytes]) -> int:
+        """
+        Escribe una entrada con CRC y tamaños ya conocidos; payload en bloques.
+        Devuelve el offset del payload en el zip (para reutilizarlo después).
+        """
+        name_bytes = name.encode("utf-8")
+        header_offset = self.offset
+        big = size >= ZIP64_LIMIT or compressed_size >= ZIP64_LIMIT
+        if big:
+            # en la cabecera local ZIP64 lleva siempre los dos tamaños
+            extra = _zip64_extra(size, compressed_size)
+            local_sizes = (MARK32, MARK32)
+        else:
+            extra = b""
+            local_sizes = (compressed_size, size)
+        self._write(LOCAL_HEADER.pack(
+            LOCAL_SIG, VERSION_ZIP64 if big else VERSION, 0, method, 0, 0,
+            crc32, *local_sizes, len(name_bytes), len(extra)
+        ))
+        self._write(name_bytes)
+        self._write(extra)
+        data_offset = self.offset
+        written = 0
+        for block in payload:
+            self._write(block)
+            written += len(block)
+        if written != compressed_size:
+            raise RuntimeError(f"{name}: wrote {written} bytes, header says {compressed_size}")
+
+        # en el directorio central solo van en el extra los campos desbordados, en este orden
+        fields = []
+        if size >= ZIP64_LIMIT:
+            fields.append(size)
+            size = MARK32
+        if compressed_size >= ZIP64_LIMIT:
+            fields.append(compressed_size)
+            compressed_size = MARK32
+        if header_offset >= ZIP64_LIMIT:
+            fields.append(header_offset)
+            header_offset = MARK32
+        extra = _zip64_extra(*fields) if fields else b""
+        version = VERSION_ZIP64 if fields else VERSION
+        self.central += CENTRAL_HEADER.pack(
+            CENTRAL_SIG, version, version, 0, method, 0, 0,
+            crc32, compressed_size, size, len(name_bytes),
+            len(extra), 0,  # extra, comment
+            0, 0,           # disk, int attrs
+            0,              # ext attrs
+            header_offset
+        )
+        self.central += name_bytes
+        self.central += extra
+        self.entries += 1
+        return data_offset
+
+    def close(self):
+        """Directorio central + (EOCD64 + localizador si hace falta) + EOCD."""
+        cd_offset = self.offset
+        cd_size = len(self.central)
+        self._write(self.central)
+        if self.entries >= ZIP_FILECOUNT_LIMIT or cd_size >= ZIP64_LIMIT or cd_offset >= ZIP64_LIMIT:
+            end64_offset = self.offset
+            self._write(END_RECORD64.pack(
+                END64_SIG, END_RECORD64.size - 12, VERSION_ZIP64, VERSION_ZIP64, 0, 0,
+                self.entries, self.entries, cd_size, cd_offset
+            ))
+            self._write(END_LOCATOR64.pack(LOCATOR64_SIG, 0, end64_offset, 1))
+            entries = MARK16 if self.entries >= ZIP_FILECOUNT_LIMIT else self.entries
+            cd_size = MARK32 if cd_size >= ZIP64_LIMIT else cd_size
+            cd_offset = MARK32 if cd_offset >= ZIP64_LIMIT else cd_offset
+        else:
+            entries = self.entries
+        self._write(END_RECORD.pack(END_SIG, 0, 0, entries, entries, cd_size, cd_offset, 0))
+
+    def _write(self, data):
+        self.f.write(data)
+        self.offset += len(data)
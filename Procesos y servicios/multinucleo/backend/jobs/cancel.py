@@ -0,0 +1,44 @@
+"""
+Cancelación de jobs que llega hasta los workers del pool.
+
+El padre cancela los futures pendientes; para los tiles que ya se están
+trazando usa un CancelToken: un byte en memoria compartida que los workers
+consultan entre filas (motor escalar) o entre rebotes (motor numpy) y que les
+hace abandonar el tile con JobCancelled. Así la CPU queda libre en el tiempo
+de una fila, no en el de un tile o un lote entero.
+"""
+from multiprocessing import shared_memory
+
+
+class JobCancelled(Exception):
+    """El job se canceló (acción 'cancel' o desconexión del cliente)."""
+
+class CancelToken:
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self.shm = shm
+        self.owner = owner
+
+    @classmethod
+    def create(cls) -> "CancelToken":
+        shm = shared_memory.SharedMemory(create=True, size=1)
+        shm.buf[0] = 0
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "CancelToken":
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def set(self):
+        self.shm.buf[0] = 1
+
+    def is_set(self) -> bool:
+        return self.shm.buf[0] != 0
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
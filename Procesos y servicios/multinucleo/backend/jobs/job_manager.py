@@ -1,23 +1,94 @@
+import json
+import sqlite3
+import threading
+import time
 import uuid
 from dataclasses import dataclass, field
-from typing import Dict, Optional
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ACTIVE_STATUSES = ("queued", "running")
 
 @dataclass
 class Job:
     job_id: str
     kind: str
-    status: str = "queued"  # queued|running|done|error
+    status: str = "queued"  # queued|running|done|error|cancelled
     error: Optional[str] = None
     meta: dict = field(default_factory=dict)
+    priority: int = 0
+    progress: int = 0
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status,
+            "error": self.error,
+            "meta": self.meta,
+            "priority": self.priority,
+            "progress": self.progress,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id      TEXT PRIMARY KEY,
+    kind        TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    error       TEXT,
+    meta        TEXT NOT NULL,
+    priority    INTEGER NOT NULL DEFAULT 0,
+    progress    INTEGER NOT NULL DEFAULT 0,
+    created_at  REAL NOT NULL,
+    started_at  REAL,
+    finished_at REAL
+)
+"""
 
 class JobManager:
-    def __init__(self):
+    """
+    Registro de jobs. En memoria para los activos y, si se da db_path, persistido
+    en SQLite para que `status` sobreviva a reinicios. Los jobs que estaban
+    queued/running cuando el servidor cayó se marcan como error al arrancar.
+    """
+    def __init__(self, db_path: Optional[Path] = None):
         self.jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path is not None:
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+            self._db.execute(_SCHEMA)
+            self._db.execute(
+                "UPDATE jobs SET status='error', error='interrupted by server restart', finished_at=? "
+                "WHERE status IN ('queued', 'running')",
+                (time.time(),)
+            )
+            self._db.commit()
 
-    def create(self, kind: str, meta: Optional[dict] = None) -> Job:
+    def _save(self, job: Job):
+        if self._db is None:
+            return
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO jobs VALUES (?,?,?,?,?,?,?,?,?,?)",
+                (job.job_id, job.kind, job.status, job.error, json.dumps(job.meta), job.priority,
+                 job.progress, job.created_at, job.started_at, job.finished_at)
+            )
+            self._db.commit()
+
+    def create(self, kind: str, meta: Optional[dict] = None, priority: int = 0) -> Job:
         job_id = uuid.uuid4().hex[:12]
-        job = Job(job_id=job_id, kind=kind, meta=meta or {})
+        job = Job(job_id=job_id, kind=kind, meta=meta or {}, priority=priority)
         self.jobs[job_id] = job
+        self._save(job)
         return job
 
     def set_status(self, job_id: str, status: str, error: Optional[str] = None):
@@ -26,4 +97,43 @@ class JobManager:
             return
         job.status = status
         job.error = error
+        if status == "running":
+            job.started_at = time.time()
+        elif status not in ACTIVE_STATUSES:
+            job.finished_at = time.time()
+            if status == "done":
+                job.progress = 100
+        self._save(job)
 
+    def set_progress(self, job_id: str, pct: int):
+        """Solo en memoria (se llama muy a menudo); se persiste con el siguiente cambio de estado."""
+        job = self.jobs.get(job_id)
+        if job:
+            job.progress = int(pct)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        job = self.jobs.get(job_id)
+        if job:
+            return job.to_dict()
+        if self._db is None:
+            return None
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE job_id=?", (job_id,)).fetchone()
+        if not row:
+            return None
+        keys = ("job_id", "kind", "status", "error", "meta", "priority", "progress",
+                "created_at", "started_at", "finished_at")
+        out = dict(zip(keys, row))
+        out["meta"] = json.loads(out["meta"])
+        return out
+
+    def active(self) -> List[Job]:
+        return [j for j in self.jobs.values() if j.status in ACTIVE_STATUSES]
+
+    def cancel(self, job_id: str) -> bool:
+        """Marca el job para cancelación; el motor la consulta entre tiles/pasadas."""
+        job = self.jobs.get(job_id)
+        if not job or job.status not in ACTIVE_STATUSES:
+            return False
+        job.cancel_event.set()
+        return True
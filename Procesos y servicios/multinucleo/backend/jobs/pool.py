@@ -0,0 +1,190 @@
+"""
+Pool de procesos compartido y de larga vida.
+
+Todos los jobs (render, zip, unzip) envían sus tareas al mismo
+ProcessPoolExecutor: los procesos se crean una vez y varios jobs concurrentes
+se reparten los núcleos en lugar de sobresuscribirlos con un pool cada uno.
+Como el pool no tiene initializer por job, los motores publican su contexto
+(escena, framebuffer) en memoria compartida y cada worker lo carga la primera
+vez que lo ve (ver tracer.job_context).
+
+warm_pool() lo arranca al iniciar el servidor: lanza todos los procesos y
+cada uno importa los motores (PRELOAD_MODULES), así el primer job no paga
+ni el arranque de procesos ni los imports.
+
+Reparto justo: cada job envía a través de su job_executor(job_id). En el
+ProcessPoolExecutor solo hay SLOTS_PER_WORKER tareas por worker; el resto
+espera en una cola por job y los huecos se rellenan por turnos (round robin),
+así un zip de miles de ficheros no deja esperando a un render que llega después.
+"""
+import importlib
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import CancelledError, Executor, Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from multiprocessing import resource_tracker
+from typing import Iterator, Optional
+
+# Módulos que cada worker importa al arrancar (los que usan las tareas)
+PRELOAD_MODULES = (
+    "backend.engines.pathtracer.tracer",
+    "backend.engines.pathtracer.numpy_tracer",
+    "backend.engines.pathtracer.scheduler",
+    "backend.engines.zip_multicore.zipper",
+    "backend.engines.zip_multicore.unzipper",
+)
+# Tareas en vuelo por worker en el pool (una ejecutándose + una en la tubería)
+SLOTS_PER_WORKER = 2
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_FAIR: Optional["FairPool"] = None
+_POOL_WORKERS = 0
+_LOCK = threading.Lock()
+
+
+def _preload(modules=PRELOAD_MODULES):
+    for name in modules:
+        importlib.import_module(name)
+
+def ensure_shared_tracker():
+    """
+    Arranca el resource_tracker del padre antes de crear procesos: si un worker
+    nace sin él, al adjuntar memoria compartida arranca uno propio que da los
+    segmentos del padre por "leaked" (y los borraría si el worker muere).
+    """
+    resource_tracker.ensure_running()
+
+def _ready(delay: float) -> int:
+    time.sleep(delay)  # ocupa el worker para que el siguiente aviso arranque otro proceso
+    return os.getpid()
+
+class FairPool:
+    """Reparte los huecos del pool entre las colas de los jobs, por turnos."""
+
+    def __init__(self, pool: ProcessPoolExecutor, slots: int):
+        self.pool = pool
+        self.slots = slots
+        self._queues: "OrderedDict[str, deque]" = OrderedDict()
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def submit(self, job_id: str, fn, args, kwargs) -> Future:
+        fut = Future()
+        with self._lock:
+            self._queues.setdefault(job_id, deque()).append((fut, fn, args, kwargs))
+        self._dispatch()
+        return fut
+
+    def cancel_job(self, job_id: str):
+        """Cancela lo que el job aún tiene en su cola (lo que está en el pool sigue)."""
+        with self._lock:
+            items = self._queues.pop(job_id, ())
+        for fut, *_ in items:
+            fut.cancel()
+
+    def queued(self) -> dict:
+        with self._lock:
+            return {job_id: len(q) for job_id, q in self._queues.items()}
+
+    def _dispatch(self):
+        while True:
+            with self._lock:
+                if self._in_flight >= self.slots or not self._queues:
+                    return
+                job_id, q = next(iter(self._queues.items()))
+                fut, fn, args, kwargs = q.popleft()
+                if q:
+                    self._queues.move_to_end(job_id)  # el siguiente hueco es de otro job
+                else:
+                    del self._queues[job_id]
+                self._in_flight += 1
+            if not fut.set_running_or_notify_cancel():
+                self._release()
+                continue
+            try:
+                inner = self.pool.submit(fn, *args, **kwargs)
+            except BaseException as e:
+                self._release()
+                fut.set_exception(e)
+                continue
+            inner.add_done_callback(partial(self._done, fut))
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _done(self, fut: Future, inner: Future):
+        self._release()
+        if inner.cancelled():
+            fut.set_exception(CancelledError())
+        elif inner.exception() is not None:
+            fut.set_exception(inner.exception())
+        else:
+            fut.set_result(inner.result())
+        self._dispatch()
+
+class JobExecutor(Executor):
+    """Executor de un job sobre el pool compartido (cola propia en el FairPool)."""
+
+    def __init__(self, fair: FairPool, job_id: str):
+        self._fair = fair
+        self.job_id = job_id
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        return self._fair.submit(self.job_id, fn, args, kwargs)
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        # el pool es compartido: solo se descarta lo pendiente de este job
+        if cancel_futures:
+            self._fair.cancel_job(self.job_id)
+
+def get_pool(workers: int = 0) -> ProcessPoolExecutor:
+    """Pool global (se crea en la primera llamada; workers=0 => os.cpu_count())."""
+    global _POOL, _FAIR, _POOL_WORKERS
+    with _LOCK:
+        if _POOL is None:
+            _POOL_WORKERS = workers or (os.cpu_count() or 2)
+            ensure_shared_tracker()
+            _POOL = ProcessPoolExecutor(max_workers=_POOL_WORKERS, initializer=_preload)
+            _FAIR = FairPool(_POOL, SLOTS_PER_WORKER*_POOL_WORKERS)
+        return _POOL
+
+def warm_pool(workers: int = 0) -> float:
+    """Crea el pool y espera a que todos los workers estén arrancados y con los motores importados; devuelve los segundos."""
+    t0 = time.perf_counter()
+    pool = get_pool(workers)
+    pids = set()
+    delay = 0.01
+    while len(pids) < _POOL_WORKERS and delay < 1:
+        pids.update(f.result() for f in [pool.submit(_ready, delay) for _ in range(_POOL_WORKERS)])
+        delay *= 2
+    return time.perf_counter() - t0
+
+def job_executor(job_id: str) -> JobExecutor:
+    """Executor para las tareas de un job en el pool compartido, con reparto justo entre jobs."""
+    get_pool()
+    return JobExecutor(_FAIR, job_id)
+
+def pool_workers() -> int:
+    return _POOL_WORKERS
+
+def shutdown_pool():
+    global _POOL, _FAIR
+    with _LOCK:
+        if _POOL is not None:
+            _POOL.shutdown(cancel_futures=True)
+            _POOL = None
+            _FAIR = None
+
+@contextmanager
+def borrow_pool(executor: Optional[Executor], workers: int) -> Iterator[Executor]:
+    """El executor dado (sin cerrarlo al salir) o un pool propio de `workers` procesos."""
+    if executor is not None:
+        yield executor
+        return
+    ensure_shared_tracker()
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        yield ex
@@ -0,0 +1,133 @@
+"""
+Canal de un job hacia los clientes WS suscritos: progreso desde los threads
+de los motores sin inundar el event loop, y el resto de mensajes del job
+(estado, resultado) repartidos a todos.
+
+- publish(msg) se llama desde cualquier thread y solo guarda el último
+  mensaje de cada tipo ("progress", "preview"): el más reciente gana. Al loop
+  llega como mucho un aviso pendiente a la vez, da igual cuántas filas o tiles
+  informen entre medias.
+- Cada cliente suscrito tiene su propia tarea de envío: manda lo último que
+  haya y espera min_interval antes del siguiente envío. Un cliente lento
+  (ws.send espera al buffer) recibe menos actualizaciones, no más retraso, y
+  no frena a los demás.
+- flush() envía lo pendiente ya (antes del estado final del job); close()
+  además para las tareas de envío.
+- send(data) / fan_out(fn): mensajes del job a todos los suscriptores a la
+  vez; cada cliente va a su ritmo y el que se desconecta se da de baja.
+"""
+import asyncio
+import json
+import threading
+from typing import Awaitable, Callable, Dict, Optional
+
+import websockets
+
+
+class _Subscriber:
+    def __init__(self, ws):
+        self.ws = ws
+        self.pending: Dict[str, dict] = {}
+        self.wake = asyncio.Event()
+        self.lock = asyncio.Lock()  # un envío a la vez por cliente (tarea o flush)
+        self.task: Optional[asyncio.Task] = None
+
+class ProgressChannel:
+    def __init__(self, loop: asyncio.AbstractEventLoop, min_interval: float):
+        self.loop = loop
+        self.min_interval = min_interval
+        self.sent = 0  # mensajes enviados (todas las suscripciones)
+        self._subs: Dict[int, _Subscriber] = {}
+        self._latest: Dict[str, dict] = {}  # publicado y aún sin repartir (bajo _lock)
+        self._last: Dict[str, dict] = {}    # último repartido de cada tipo (para nuevos suscriptores)
+        self._lock = threading.Lock()
+        self._scheduled = False
+        self._closed = False
+
+    def subscribe(self, ws):
+        """Añade un cliente (desde el loop); recibe lo último publicado en su primer envío."""
+        if self._closed or id(ws) in self._subs:
+            return
+        sub = _Subscriber(ws)
+        sub.pending.update(self._last)
+        if sub.pending:
+            sub.wake.set()
+        self._subs[id(ws)] = sub
+        sub.task = self.loop.create_task(self._pump(sub))
+
+    def unsubscribe(self, ws):
+        sub = self._subs.pop(id(ws), None)
+        if sub is not None and sub.task is not asyncio.current_task():
+            sub.task.cancel()
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subs)
+
+    def publish(self, msg: dict):
+        """Thread-safe: sustituye al último mensaje de su tipo y avisa al loop si no estaba avisado."""
+        with self._lock:
+            self._latest[msg["type"]] = msg
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self.loop.call_soon_threadsafe(self._dispatch)
+
+    def _dispatch(self):
+        with self._lock:
+            latest, self._latest = self._latest, {}
+            self._scheduled = False
+        if not latest:
+            return
+        self._last.update(latest)
+        for sub in self._subs.values():
+            sub.pending.update(latest)
+            sub.wake.set()
+
+    async def _send_pending(self, sub: _Subscriber):
+        async with sub.lock:
+            msgs = list(sub.pending.values())
+            sub.pending.clear()
+            try:
+                for msg in msgs:
+                    await sub.ws.send(json.dumps(msg))
+                    self.sent += 1
+            except websockets.ConnectionClosed:
+                self.unsubscribe(sub.ws)
+
+    async def send(self, data):
+        """Envía un mensaje (str o bytes) a todos los suscriptores."""
+        await self.fan_out(lambda ws: ws.send(data))
+
+    async def fan_out(self, fn: Callable[[object], Awaitable]):
+        """Ejecuta fn(ws) para cada suscriptor, en paralelo y sin mezclarse con su progreso."""
+        await asyncio.gather(*(self._run_for(sub, fn) for sub in list(self._subs.values())))
+
+    async def _run_for(self, sub: _Subscriber, fn):
+        async with sub.lock:
+            try:
+                await fn(sub.ws)
+            except websockets.ConnectionClosed:
+                self.unsubscribe(sub.ws)
+
+    async def _pump(self, sub: _Subscriber):
+        while True:
+            await sub.wake.wait()
+            sub.wake.clear()
+            await self._send_pending(sub)
+            if self._subs.get(id(sub.ws)) is not sub:
+                return  # se desconectó durante el envío
+            await asyncio.sleep(self.min_interval)
+
+    async def flush(self):
+        """Envía ya lo pendiente a todos los suscriptores (sin esperar al intervalo)."""
+        self._dispatch()
+        for sub in list(self._subs.values()):
+            await self._send_pending(sub)
+
+    async def close(self):
+        await self.flush()
+        self._closed = True
+        for sub in self._subs.values():
+            sub.task.cancel()
+        self._subs.clear()
@@ -3,14 +3,126 @@ Mensajes WS (JSON)
 
 Cliente -> Servidor
 - { "action": "render", "scene": {...} }
+- { "action": "render", "scene": {..., "seed": 1}, "cache": true }   (seed => reproducible y cacheable)
+- Opciones de resultado (render y zip_outputs):
+    "format": "ppm" | "png"        (solo render; png = zlib en un worker)
+    "transport": "url" | "binary" | "b64"
+        (por defecto url: solo metadatos y descarga por HTTP; binary sin HTTP;
+        b64 = formato legado)
+- { "action": "render", "scene": {..., "adaptive": true, "min_spp": 8, "noise_threshold": 0.01,
+    "russian_roulette": true, "rr_min_depth": 3} }   (muestreo adaptativo / ruleta rusa)
+- { "action": "render", "scene": {...}, "progressive": true,
+    "target_noise": 0.01, "time_budget_s": 10, "preview_max": 128 }
+- { "action": "render_sequence", "scene": {...}, "frames": [{"camera": {...}}, ...] }
+- { "action": "render_sequence", "scene": {...}, "count": n,
+    "keyframes": [{"frame": 0, "camera": {...}}, {"frame": n-1, "camera": {...}}] }
+    (frames = overrides sobre scene; keyframes = valores numéricos interpolados.
+    Escribe output/renders/sequence_<job_id>/frame_NNNN.ppm; ver engines/pathtracer/sequence.py)
 - { "action": "zip_outputs" }
+- { "action": "zip_outputs", "method": "deflate" | "store", "level": 0-9 }  (por defecto deflate, 6)
+- { "action": "zip_outputs", "incremental": false }  (por defecto true: reutiliza entradas sin cambios)
+- { "action": "unzip", "filename": "outputs.zip", "verify": false }
+    (zip de output/zips; extrae en output/restored/<nombre> o, con verify, solo comprueba CRCs)
+- { "action": "subscribe", "job_id": "..." }    (recibe estado, progreso y resultado de un job ajeno)
+- { "action": "unsubscribe", "job_id": "..." }  (deja de recibirlo; el job sigue)
+    Un render idéntico (escena y opciones de resultado) a otro en cola o en marcha
+    no crea job: suscribe al existente ("deduplicated": true).
+- { "action": "cancel", "job_id": "..." }   (render, progresivo, secuencia, zip o unzip; en cola o en marcha)
+    Cancela para todos los suscriptores. Al desconectarse un cliente se cancelan
+    los jobs a los que ya no queda nadie suscrito. Un job cancelado termina con
+    status "cancelled" y sin resultado (el progresivo entrega lo acumulado); si
+    estaba en cola pasa a "cancelled" en el acto.
+- { "action": "status", "job_id": "..." }   (también jobs de antes de un reinicio)
+- { "action": "jobs" }                       (cola, jobs en ejecución y límites)
+- { "action": "stats", "job_id": "..." }    (spans de la traza del job, en marcha o terminado)
+- { "action": "register_node", "url": "ws://host:port" }  (coordinador: reparte los renders con ese nodo)
+- { "action": "unregister_node", "url": "..." } / { "action": "nodes" }
+- { "action": "render_tiles", "batch": "12 caracteres", "scene": {... "seed": n}, "tiles": [[i, x0, y0, w, h], ...] }
+    (de coordinador a nodo; ver engines/pathtracer/distributed.py)
+- render, render_sequence, zip_outputs y unzip aceptan "priority": int (mayor => antes; por defecto 0)
+    y "profile": true (cProfile en una de cada TRACE_PROFILE_EVERY tareas de worker)
 
 Servidor -> Cliente
-- { "type": "hello", "server": "multinucleo" }
-- { "type": "job", "job_id": "...", "status": "queued|running|done|error" }
+- { "type": "hello", "server": "multinucleo", "workers": n, "http": "http://host:port" | null }
+- { "type": "job", "job_id": "...", "status": "queued|running|done|error|cancelled" }
+- { "type": "job", "job_id": "...", "status": "queued", "position": n }  (0 => lanzado ya)
+- { "type": "job", "job_id": "...", "status": "...", "subscribed": bool, "deduplicated": true? }
+    (respuesta a subscribe o a un render duplicado; subscribed false => ya terminó,
+    con "url" del resultado guardado si lo hay)
+- Estado, progreso y resultado de un job llegan a todos sus suscriptores
 - { "type": "progress", "job_id": "...", "pct": 0-100, "msg": "..." }
-- { "type": "result", "job_id": "...", "kind": "render", "filename": "...", "data_b64": "..." }
-- { "type": "result", "job_id": "...", "kind": "zip", "filename": "...", "data_b64": "..." }
+    (progress y preview se coalescen: como mucho uno de cada tipo por job cada
+    PROGRESS_MIN_INTERVAL_S, siempre el más reciente; el último llega antes del estado final)
+- { "type": "preview", "job_id": "...", "pass": n, "spp": n, "noise": float|null,
+    "elapsed": s, "data_b64": "..." }   (PPM reducido, solo en modo progresivo)
+- { "type": "result", "job_id": "...", "kind": "render|zip", "filename": "...", "mime": "...",
+    "transport": "url", "size": n, "etag": "...", "url": "http://host:port/results/<job_id>/<fichero>" }
+    (GET/HEAD con ETag/If-None-Match y Range/If-Range; ver backend/utils/http_files.py.
+    Con transport binary o b64 el resultado también trae "url" si hay servidor HTTP)
+- { "type": "result", "job_id": "...", "kind": "render|zip", "filename": "...", "mime": "...",
+    "transport": "binary", "size": n, "chunks": n, "chunk_size": n }
+    seguido de `chunks` frames binarios: [job_id 12 bytes ASCII][seq uint32 BE][datos]
+- { "type": "result", "job_id": "...", "kind": "render", "filename": "...", "data_b64": "..." }  (transport b64)
+- { "type": "result", "job_id": "...", "kind": "zip", "filename": "...", "data_b64": "..." }     (transport b64)
+- { "type": "result", ..., "cached": true|false }  (render no progresivo con seed)
+- { "type": "result", "kind": "render", ..., "rays": n, "spp_avg": float }  (render no progresivo trazado)
+- { "type": "result", ..., "stopped": "max_spp|target_noise|time_budget|cancelled" }  (progresivo)
+- { "type": "result", "kind": "zip", ..., "reused_bytes": n, "recomputed_bytes": n }
+- { "type": "result", "kind": "render", ..., "nodes": [{node, tiles, rays, batches, error}] }  (render repartido)
+- { "type": "nodes", "nodes": ["ws://..."] }
+- Nodo => coordinador: un frame binario por tile [batch 12 bytes][índice uint32 BE][rayos uint64 BE][RGB del tile]
+    y { "type": "tiles_done", "batch": "...", "rays": n } | { "type": "error", "batch": "...", "error": "..." }
+- { "type": "unzip", "job_id": "...", "filename": "...", "verify": bool, "ok": bool,
+    "bytes": n, "seconds": s, "mb_s": x, "files": [{name, size, compressed_size, ok, error, seconds, mb_s}] }
+    (seconds/mb_s de cada fichero: tiempo y throughput de worker)
+- { "type": "frame", "job_id": "...", "index": n, "filename": "frame_NNNN.ppm" }
+    (frame de una secuencia terminado; se coalesce como progress)
+- { "type": "sequence", "job_id": "...", "dir": "sequence_<job_id>", "frames": ["frame_0000.ppm", ...],
+    "seconds": s, "frames_per_min": x, "rays": n, "setups_reused": n, "url": "http://.../results/<job_id>/" }
+    (GET de "url": índice JSON { "job_id", "files": [{name, size, etag, href}] }; cada frame en url + nombre)
+- { "type": "cancel", "job_id": "...", "ok": true|false }
+- { "type": "unsubscribe", "job_id": "...", "ok": true|false }
+- { "type": "status", "job": { "job_id", "kind", "status", "error", "meta", "priority",
+    "progress", "created_at", "started_at", "finished_at" } }
+- { "type": "jobs", "queued": [{job_id, kind, priority}], "queue_depth": n, "max_queued": n,
+    "running": [{job_id, kind, priority, progress, started_at}], "limits": {kind: n} }
+- { "type": "stats", "job_id": "...", "running": bool,
+    "spans": {nombre: {count, total_ms, max_ms}}, "workers": {pid: {tasks, busy_ms}},
+    "trace_file": "...|null", "profile": ["líneas de pstats"] | null }
+    (trace_file: JSON de Chrome trace, se abre en chrome://tracing o ui.perfetto.dev)
 - { "type": "error", "error": "..." }
+- { "type": "error", "job_id": "...", "error": "queue_full" | "unknown_job" }
 """
+import struct
 
+
+BINARY_CHUNK_SIZE = 256 * 1024
+JOB_ID_LEN = 12
+_CHUNK_HEADER = struct.Struct(f">{JOB_ID_LEN}sI")
+_TILE_HEADER = struct.Struct(f">{JOB_ID_LEN}sIQ")
+
+MIME_TYPES = {
+    ".ppm": "image/x-portable-pixmap",
+    ".png": "image/png",
+    ".zip": "application/zip",
+    ".json": "application/json",
+}
+
+def chunk_count(size: int, chunk_size: int = BINARY_CHUNK_SIZE) -> int:
+    return max(1, -(-size // chunk_size))
+
+def pack_chunk(job_id: str, seq: int, payload) -> bytes:
+    """Frame binario de resultado: cabecera fija (job_id, seq) + datos."""
+    return _CHUNK_HEADER.pack(job_id.encode("ascii"), seq) + payload
+
+def unpack_chunk(frame: bytes):
+    job_id, seq = _CHUNK_HEADER.unpack_from(frame)
+    return job_id.decode("ascii"), seq, memoryview(frame)[_CHUNK_HEADER.size:]
+
+def pack_tile(batch: str, index: int, rays: int, rgb) -> bytes:
+    """Frame binario de un tile de render_tiles: (lote, índice, rayos) + RGB."""
+    return _TILE_HEADER.pack(batch.encode("ascii"), index, rays) + rgb
+
+def unpack_tile(frame: bytes):
+    batch, index, rays = _TILE_HEADER.unpack_from(frame)
+    return batch.decode("ascii"), index, rays, memoryview(frame)[_TILE_HEADER.size:]
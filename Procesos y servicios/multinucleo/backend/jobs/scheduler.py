@@ -0,0 +1,103 @@
+"""
+Cola de jobs con prioridad y límite de concurrencia por tipo.
+
+Los jobs esperan en un heap (mayor prioridad primero, FIFO a igualdad) y se
+lanzan como tareas asyncio cuando su tipo tiene hueco; el trabajo pesado va
+al pool compartido (backend.jobs.pool). La cola está acotada: por encima de
+max_queued, submit() lanza QueueFull y el servidor responde "queue_full".
+"""
+import asyncio
+import heapq
+import itertools
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, List
+
+from backend.jobs.job_manager import Job, JobManager
+from backend.utils.log import log
+
+
+class QueueFull(Exception):
+    pass
+
+class JobScheduler:
+    def __init__(self, jm: JobManager, limits: Dict[str, int], max_queued: int, default_limit: int = 1):
+        self.jm = jm
+        self.limits = limits
+        self.default_limit = default_limit
+        self.max_queued = max_queued
+        self._heap: List[tuple] = []  # (-priority, seq, job, run)
+        self._seq = itertools.count()
+        self._running: Dict[str, int] = defaultdict(int)
+        self._tasks = set()
+
+    def limit(self, kind: str) -> int:
+        return self.limits.get(kind, self.default_limit)
+
+    def depth(self) -> int:
+        return len(self._heap)
+
+    def submit(self, job: Job, run: Callable[[], Awaitable]) -> int:
+        """Encola el job; run() es la corrutina que lo ejecuta. Devuelve la posición en cola (0 => ya lanzado)."""
+        if len(self._heap) >= self.max_queued:
+            raise QueueFull(f"queue is full ({self.max_queued} jobs waiting)")
+        heapq.heappush(self._heap, (-job.priority, next(self._seq), job, run))
+        self._pump()
+        for pos, (_, _, queued, _) in enumerate(sorted(self._heap), 1):
+            if queued is job:
+                return pos
+        return 0
+
+    def cancel(self, job_id: str) -> bool:
+        """jm.cancel + pump: un job cancelado en cola se cierra ya, sin esperar a otro submit o fin."""
+        if not self.jm.cancel(job_id):
+            return False
+        self._pump()
+        return True
+
+    def _pump(self):
+        """Lanza, por orden de prioridad, todos los jobs cuyo tipo tenga hueco."""
+        waiting = []
+        while self._heap:
+            item = heapq.heappop(self._heap)
+            job = item[2]
+            # un job cancelado en cola se lanza igualmente: run() lo cierra sin trabajar
+            if job.cancel_event.is_set() or self._running[job.kind] < self.limit(job.kind):
+                self._start(item)
+            else:
+                waiting.append(item)
+        for item in waiting:
+            heapq.heappush(self._heap, item)
+
+    def _start(self, item):
+        _, _, job, run = item
+        self._running[job.kind] += 1
+        task = asyncio.create_task(self._run(job, run))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, job: Job, run: Callable[[], Awaitable]):
+        try:
+            await run()
+        except Exception as e:
+            # p.ej. el cliente se desconectó mientras se le enviaba el resultado
+            log(f"Job {job.job_id} ({job.kind}): {type(e).__name__}: {e}")
+        finally:
+            self._running[job.kind] -= 1
+            self._pump()
+
+    def snapshot(self) -> dict:
+        """Profundidad de la cola, jobs en ejecución con su progreso y límites."""
+        return {
+            "queued": [
+                {"job_id": job.job_id, "kind": job.kind, "priority": job.priority}
+                for _, _, job, _ in sorted(self._heap)
+            ],
+            "queue_depth": len(self._heap),
+            "max_queued": self.max_queued,
+            "running": [
+                {"job_id": j.job_id, "kind": j.kind, "priority": j.priority,
+                 "progress": j.progress, "started_at": j.started_at}
+                for j in self.jm.active() if j.status == "running"
+            ],
+            "limits": {kind: self.limit(kind) for kind in sorted(set(self.limits) | set(self._running))},
+        }
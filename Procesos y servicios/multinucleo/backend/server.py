@@ -1,106 +1,682 @@
+import argparse
 import asyncio
 import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+from urllib.parse import quote, urlsplit
+
 import websockets
 
-from backend.config import HOST, PORT, RENDERS_DIR, ZIPS_DIR, DEFAULT_WORKERS
+from backend.config import (
+    HOST, PORT, RENDERS_DIR, ZIPS_DIR, CACHE_DIR, RESTORED_DIR, DEFAULT_WORKERS, RENDER_CACHE_MAX_BYTES,
+    JOBS_DB, MAX_CONCURRENT_JOBS, MAX_QUEUED_JOBS, TRACES_DIR, TRACE_PROFILE_EVERY,
+    PROGRESS_MIN_INTERVAL_S, RESULTS_DIR, RESULTS_MAX_JOBS, HTTP_PORT_OFFSET
+)
+from backend.jobs.cancel import JobCancelled
 from backend.jobs.job_manager import JobManager
-from backend.utils.files import ensure_dir
+from backend.jobs.pool import job_executor, pool_workers, shutdown_pool, warm_pool
+from backend.jobs.progress import ProgressChannel
+from backend.jobs.scheduler import JobScheduler, QueueFull
+from backend.jobs.protocols import BINARY_CHUNK_SIZE, JOB_ID_LEN, MIME_TYPES, chunk_count, pack_chunk, pack_tile
+from backend.utils.files import ensure_dir, safe_name
+from backend.utils.http_files import file_etag, serve_files
 from backend.utils.log import log
-from backend.engines.pathtracer.tracer import render_pathtracer_ppm, b64 as b64_render
-from backend.engines.zip_multicore.zipper import zip_outputs, b64 as b64_zip
+from backend.utils.png import ppm_to_png
+from backend.utils.trace import Trace, TracingExecutor, now_us, span, summarize
+from backend.engines.pathtracer.tracer import render_pathtracer_ppm, render_tiles, b64 as b64_render
+from backend.engines.pathtracer.distributed import render_distributed
+from backend.engines.pathtracer.progressive import render_pathtracer_progressive
+from backend.engines.pathtracer.sequence import expand_frames, render_sequence
+from backend.engines.pathtracer.cache import RenderCache, is_cacheable, scene_key
+from backend.engines.zip_multicore.unzipper import unzip_archive
+from backend.engines.zip_multicore.zipper import DEFAULT_LEVEL, zip_outputs
 
 
-jm = JobManager()
+jm = JobManager(JOBS_DB)
+scheduler = JobScheduler(jm, MAX_CONCURRENT_JOBS, MAX_QUEUED_JOBS)
+render_cache = RenderCache(CACHE_DIR, RENDER_CACHE_MAX_BYTES)
+# Trazas de los jobs en cola o en marcha (job_id => Trace); al terminar van a TRACES_DIR
+traces = {}
+# Canal de cada job en cola o en marcha hacia sus suscriptores (job_id => ProgressChannel)
+channels = {}
+# Renders en cola o en marcha por petición (clave => Job): una petición idéntica se suscribe
+inflight_renders = {}
+# Nodos a los que este servidor reparte tiles (modo coordinador; ver distributed.py)
+nodes = set()
+# Dirección de escucha (--host/--port/--http-port; http_port None => sin HTTP)
+listen = {"host": HOST, "port": PORT, "http_port": None}
+# Índice de los ficheros de un job en RESULTS_DIR/<job_id>/ (oculto: solo vía /results/<job_id>/)
+RESULTS_INDEX = ".index.json"
 
 async def send(ws, obj):
     await ws.send(json.dumps(obj))
 
-def make_progress_sender(loop, ws, job_id: str):
+async def send_result(ws, job_id: str, kind: str, filename: str, data, transport: str = "binary", **extra):
+    """
+    Envía el resultado. transport="binary": cabecera JSON + frames binarios
+    troceados (sin base64 ni copia JSON del fichero). "b64": mensaje legado.
+    """
+    mime = MIME_TYPES.get(Path(filename).suffix, "application/octet-stream")
+    if transport == "b64":
+        with span("b64_encode", bytes=len(data)):
+            data_b64 = b64_render(data)
+        with span("ws_send", transport="b64"):
+            await send(ws, {
+                "type": "result", "job_id": job_id, "kind": kind, "filename": filename,
+                "mime": mime, "data_b64": data_b64, **extra
+            })
+        return
+    view = memoryview(data)
+    with span("ws_send", transport="binary", bytes=len(view)):
+        await send(ws, binary_result_header(job_id, kind, filename, len(view), **extra))
+        for seq in range(chunk_count(len(view))):
+            await ws.send(pack_chunk(job_id, seq, view[seq*BINARY_CHUNK_SIZE:(seq+1)*BINARY_CHUNK_SIZE]))
+
+def binary_result_header(job_id: str, kind: str, filename: str, size: int, **extra) -> dict:
+    return {
+        "type": "result", "job_id": job_id, "kind": kind, "filename": filename,
+        "mime": MIME_TYPES.get(Path(filename).suffix, "application/octet-stream"),
+        "transport": "binary", "size": size, "chunks": chunk_count(size),
+        "chunk_size": BINARY_CHUNK_SIZE, **extra
+    }
+
+async def send_file_result(ws, job_id: str, kind: str, filename: str, path: Path, transport: str = "binary", **extra):
+    """Como send_result pero leyendo el fichero por trozos: nunca está entero en memoria."""
+    if transport == "b64":
+        data = await asyncio.to_thread(path.read_bytes)  # formato legado: necesita el fichero entero
+        await send_result(ws, job_id, kind, filename, data, transport, **extra)
+        return
+    with open(path, "rb") as f, span("ws_send", transport="binary"):
+        size = os.fstat(f.fileno()).st_size
+        await send(ws, binary_result_header(job_id, kind, filename, size, **extra))
+        for seq in range(chunk_count(size)):
+            block = await asyncio.to_thread(f.read, BINARY_CHUNK_SIZE)
+            await ws.send(pack_chunk(job_id, seq, block))
+
+def store_result(job_id: str, filename: str, data=None, source: Optional[Path] = None) -> Path:
+    """
+    Guarda el resultado del job en RESULTS_DIR/<job_id>/ para servirlo por
+    HTTP: `data` en memoria o un hard link a `source` (copia si no se puede).
+    """
+    job_dir = RESULTS_DIR / job_id
+    new = not job_dir.is_dir()
+    path = ensure_dir(job_dir) / safe_name(filename)
+    if source is None:
+        path.write_bytes(data)
+    else:
+        try:
+            os.link(source, path)
+        except OSError:
+            shutil.copyfile(source, path)
+    if new:
+        prune_results()
+    return path
+
+def store_result_index(job_id: str) -> Path:
+    """Índice JSON de los ficheros del job (lo que sirve /results/<job_id>/ si hay varios)."""
+    job_dir = RESULTS_DIR / job_id
+    files = []
+    for p in sorted(job_dir.iterdir()):
+        if p.name.startswith("."):
+            continue
+        st = p.stat()
+        files.append({"name": p.name, "size": st.st_size, "etag": file_etag(st), "href": quote(p.name)})
+    path = job_dir / RESULTS_INDEX
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"job_id": job_id, "files": files}), encoding="utf-8")
+    os.replace(tmp, path)
+    return path
+
+def _result_files(job_dir: Path) -> list:
+    return sorted(p for p in job_dir.iterdir() if not p.name.startswith(".")) if job_dir.is_dir() else []
+
+def prune_results(keep: int = RESULTS_MAX_JOBS):
+    """Borra los resultados guardados más antiguos si hay más de `keep` jobs."""
+    dirs = sorted((d for d in RESULTS_DIR.iterdir() if d.is_dir()), key=lambda d: d.stat().st_mtime)
+    for d in dirs[:max(0, len(dirs) - keep)]:
+        shutil.rmtree(d, ignore_errors=True)
+
+def resolve_result(path: str) -> Optional[Tuple[Path, str]]:
+    """
+    URL del servidor HTTP => (fichero, mime): /results/<job_id>/<fichero>, o
+    /results/<job_id>/ => el índice JSON del job si lo tiene (secuencias) o su
+    único fichero.
+    """
+    parts = path.strip("/").split("/")
+    if len(parts) not in (2, 3) or parts[0] != "results":
+        return None
+    job_id = parts[1]
+    if len(job_id) != JOB_ID_LEN or not job_id.isalnum():
+        return None
+    job_dir = RESULTS_DIR / job_id
+    if len(parts) == 3:
+        name = parts[2]
+        if name != safe_name(name) or name.startswith("."):
+            return None
+        found = job_dir / name
+    elif (job_dir / RESULTS_INDEX).is_file():
+        found = job_dir / RESULTS_INDEX
+    else:
+        files = _result_files(job_dir)
+        found = files[0] if len(files) == 1 else None
+    if found is None or not found.is_file():
+        return None
+    return found, MIME_TYPES.get(found.suffix, "application/octet-stream")
+
+def result_url(ws, job_id: str, filename: str = "") -> Optional[str]:
+    """URL de descarga para este cliente (mismo host con el que abrió el WS); None sin HTTP."""
+    if not listen["http_port"]:
+        return None
+    headers = getattr(ws, "request_headers", None) or {}
+    host = urlsplit("//" + headers.get("Host", "")).hostname or listen["host"]
+    if ":" in host:
+        host = f"[{host}]"  # IPv6
+    return f"http://{host}:{listen['http_port']}/results/{job_id}/{quote(filename)}"
+
+def job_result_url(ws, job_id: str) -> Optional[str]:
+    """URL del resultado guardado de un job terminado (fichero único o índice de frames)."""
+    files = _result_files(RESULTS_DIR / job_id)
+    if not files:
+        return None
+    return result_url(ws, job_id, files[0].name if len(files) == 1 else "")
+
+async def deliver_result(ws, job_id: str, kind: str, filename: str, path: Path, transport: str, data=None, **extra):
+    """
+    Resultado ya guardado en `path` (store_result). transport="url": solo
+    metadatos y la URL de descarga; "binary"/"b64": además el contenido, de
+    `data` si está en memoria o leyendo el fichero. Siempre lleva "url" si hay HTTP.
+    """
+    url = result_url(ws, job_id, path.name)
+    if url:
+        extra["url"] = url
+    if transport == "url":
+        st = path.stat()
+        with span("ws_send", transport="url"):
+            await send(ws, {
+                "type": "result", "job_id": job_id, "kind": kind, "filename": filename,
+                "mime": MIME_TYPES.get(Path(filename).suffix, "application/octet-stream"),
+                "transport": "url", "size": st.st_size, "etag": file_etag(st), **extra
+            })
+    elif data is not None:
+        await send_result(ws, job_id, kind, filename, data, transport, **extra)
+    else:
+        await send_file_result(ws, job_id, kind, filename, path, transport, **extra)
+
+def result_options(payload: dict):
+    transport = payload.get("transport", "url" if listen["http_port"] else "binary")
+    if transport not in ("url", "binary", "b64"):
+        raise ValueError("transport must be 'url', 'binary' or 'b64'")
+    if transport == "url" and not listen["http_port"]:
+        raise ValueError("transport 'url' needs the HTTP server (--http-port)")
+    fmt = payload.get("format", "ppm")
+    if fmt not in ("ppm", "png"):
+        raise ValueError("format must be 'ppm' or 'png'")
+    return transport, fmt
+
+def make_progress_sender(job_id: str):
     """
     Devuelve un callback seguro para llamar desde threads:
-    on_progress(pct, msg) -> envía por WS usando el loop principal.
+    on_progress(pct, msg) -> canal de progreso del job (coalescido y con ritmo máximo por cliente).
     """
+    channel = channels[job_id]
+
     def on_progress(pct, msg):
-        fut = asyncio.run_coroutine_threadsafe(
-            send(ws, {"type": "progress", "job_id": job_id, "pct": pct, "msg": msg}),
-            loop
-        )
-        try:
-            fut.result(timeout=0)
-        except Exception:
-            pass
+        jm.set_progress(job_id, pct)
+        channel.publish({"type": "progress", "job_id": job_id, "pct": pct, "msg": msg})
     return on_progress
 
+def make_preview_sender(job_id: str):
+    """Callback seguro desde threads: on_pass(info, preview_ppm) -> mensaje 'preview' (el último gana)."""
+    channel = channels[job_id]
+
+    def on_pass(info, preview):
+        channel.publish({"type": "preview", "job_id": job_id, **info, "data_b64": b64_render(preview)})
+    return on_pass
+
+async def flush_progress(job):
+    """Antes de un estado final: que ningún progreso pendiente llegue después."""
+    await channels[job.job_id].flush()
+
+def job_pool(job):
+    """Executor del job en el pool compartido, con sus tareas trazadas."""
+    return TracingExecutor(job_executor(job.job_id), traces[job.job_id])
+
+async def run_job(job, run):
+    """
+    Ejecuta run(canal) con la traza del job activa; al terminar cierra el
+    canal y guarda la traza en TRACES_DIR.
+    """
+    trace = traces[job.job_id]
+    t1 = now_us()
+    trace.add("queue_wait", t1 - max(0.0, time.time() - job.created_at) * 1e6, t1)
+    try:
+        with trace.active(), span(job.kind):
+            await run(channels[job.job_id])
+    finally:
+        await channels.pop(job.job_id).close()
+        traces.pop(job.job_id, None)
+        await asyncio.to_thread(trace.save, TRACES_DIR / f"{job.job_id}.json")
+
+async def enqueue(ws, job, run, payload: dict):
+    """
+    Encola el job en el scheduler con `ws` como primer suscriptor; run(out)
+    envía por `out` (el canal del job) a todos los suscriptores. Si la cola
+    está llena responde 'queue_full'.
+    """
+    profile_dir = TRACES_DIR / f"{job.job_id}.prof.d" if payload.get("profile") else None
+    traces[job.job_id] = Trace(job.job_id, profile_dir, TRACE_PROFILE_EVERY)
+    channels[job.job_id] = ProgressChannel(asyncio.get_running_loop(), PROGRESS_MIN_INTERVAL_S)
+    channels[job.job_id].subscribe(ws)
+    try:
+        position = scheduler.submit(job, lambda: run_job(job, run))
+    except QueueFull as e:
+        traces.pop(job.job_id, None)
+        for key, queued in list(inflight_renders.items()):
+            if queued is job:
+                del inflight_renders[key]
+        await channels.pop(job.job_id).close()
+        jm.set_status(job.job_id, "error", "queue_full")
+        await send(ws, {"type": "job", "job_id": job.job_id, "status": "error"})
+        await send(ws, {"type": "error", "job_id": job.job_id, "error": "queue_full", "msg": str(e)})
+        return
+    await send(ws, {"type": "job", "job_id": job.job_id, "status": "queued", "position": position})
+
+async def start_job(out, job) -> bool:
+    """Pasa el job a running; False si se canceló mientras esperaba en cola."""
+    if job.cancel_event.is_set():
+        jm.set_status(job.job_id, "cancelled")
+        await send(out, {"type": "job", "job_id": job.job_id, "status": "cancelled"})
+        return False
+    jm.set_status(job.job_id, "running")
+    await send(out, {"type": "job", "job_id": job.job_id, "status": "running"})
+    return True
+
+async def job_cancelled(out, job):
+    """El motor abortó el job (cancel o desconexión): sin resultado."""
+    await flush_progress(job)
+    jm.set_status(job.job_id, "cancelled")
+    await send(out, {"type": "job", "job_id": job.job_id, "status": "cancelled"})
+
+def job_priority(payload: dict) -> int:
+    try:
+        return int(payload.get("priority", 0))
+    except (TypeError, ValueError):
+        raise ValueError("priority must be an integer")
+
+def render_request_key(payload: dict) -> str:
+    """Escena + opciones que cambian el resultado o cómo se entrega (prioridad y profile no)."""
+    options = {k: payload.get(k) for k in (
+        "progressive", "target_noise", "time_budget_s", "preview_max", "format", "transport", "cache"
+    )}
+    return scene_key(payload["scene"], json.dumps(options, sort_keys=True))
+
+async def subscribe(ws, job, **extra) -> bool:
+    """Suscribe `ws` al canal del job y le envía su estado; False si el job ya terminó."""
+    channel = channels.get(job.job_id)
+    if channel is not None:
+        channel.subscribe(ws)
+    else:
+        extra["url"] = job_result_url(ws, job.job_id)
+    await send(ws, {"type": "job", "job_id": job.job_id, "status": job.status,
+                    "subscribed": channel is not None, **extra})
+    return channel is not None
+
 async def handle_render(ws, payload):
     scene = payload.get("scene")
     if not isinstance(scene, dict):
         raise ValueError("scene must be an object")
+    progressive = bool(payload.get("progressive"))
 
-    job = jm.create("render", meta={"scene": {"width": scene.get("width"), "height": scene.get("height")}})
-    await send(ws, {"type": "job", "job_id": job.job_id, "status": "queued"})
+    key = render_request_key(payload)
+    running = inflight_renders.get(key)
+    if running is not None and not running.cancel_event.is_set() and await subscribe(ws, running, deduplicated=True):
+        return running
 
-    jm.set_status(job.job_id, "running")
-    await send(ws, {"type": "job", "job_id": job.job_id, "status": "running"})
+    job = jm.create("render", meta={
+        "scene": {"width": scene.get("width"), "height": scene.get("height")},
+        "progressive": progressive,
+    }, priority=job_priority(payload))
 
-    loop = asyncio.get_running_loop()
-    on_progress = make_progress_sender(loop, ws, job.job_id)
+    async def run(out):
+        try:
+            await run_render(out, job, payload)
+        finally:
+            if inflight_renders.get(key) is job:
+                del inflight_renders[key]
 
-    try:
-        filename, data = await asyncio.to_thread(
+    inflight_renders[key] = job
+    await enqueue(ws, job, run, payload)
+    return job
+
+async def render_ppm(job, scene: dict, on_progress, extra: dict):
+    """Render no progresivo: en el pool local o, con nodos registrados, repartido entre todos."""
+    stats = {}
+    if not nodes:
+        result = await asyncio.to_thread(
             render_pathtracer_ppm,
             scene,
             RENDERS_DIR,
-            DEFAULT_WORKERS,
-            on_progress
+            pool_workers(),
+            on_progress,
+            stats,
+            executor=job_pool(job),
+            should_stop=job.cancel_event.is_set
+        )
+        extra.update(rays=stats["rays"], spp_avg=round(stats["spp_avg"], 2))
+        return result
+    result = await render_distributed(
+        scene,
+        RENDERS_DIR,
+        sorted(nodes),
+        pool_workers(),
+        on_progress,
+        stats,
+        executor=job_pool(job),
+        should_stop=job.cancel_event.is_set
+    )
+    extra.update(rays=stats["rays"], spp_avg=round(stats["spp_avg"], 2), nodes=stats["nodes"])
+    return result
+
+async def run_render(out, job, payload):
+    if not await start_job(out, job):
+        return
+    scene = payload["scene"]
+    progressive = job.meta["progressive"]
+
+    on_progress = make_progress_sender(job.job_id)
+
+    try:
+        transport, fmt = result_options(payload)
+        extra = {}
+        with span("cache_lookup"):
+            key = scene_key(scene) if is_cacheable(scene) and payload.get("cache", True) and not progressive else None
+            png_hit = render_cache.get(key, "png") if key and fmt == "png" else None
+        if png_hit:
+            filename = f"render_{scene.get('width')}x{scene.get('height')}.png"
+            data = await asyncio.to_thread(png_hit.read_bytes)
+            on_progress(100, f"Cache hit: {key[:12]}")
+            extra["cached"] = True
+        elif progressive:
+            stats = {}
+            filename, data = await asyncio.to_thread(
+                render_pathtracer_progressive,
+                scene,
+                RENDERS_DIR,
+                pool_workers(),
+                on_progress,
+                make_preview_sender(job.job_id),
+                job.cancel_event.is_set,
+                payload.get("target_noise"),
+                payload.get("time_budget_s"),
+                int(payload.get("preview_max") or 128),
+                stats,
+                executor=job_pool(job)
+            )
+            extra["stopped"] = stats["stopped"]
+        elif key:
+            filename = f"render_{scene.get('width')}x{scene.get('height')}.ppm"
+            hit = render_cache.get(key, "ppm")
+            if hit:
+                data = await asyncio.to_thread(hit.read_bytes)
+                on_progress(100, f"Cache hit: {key[:12]}")
+            else:
+                filename, data = await render_ppm(job, scene, on_progress, extra)
+                await asyncio.to_thread(render_cache.put, key, "ppm", data)
+            extra["cached"] = bool(hit)
+        else:
+            filename, data = await render_ppm(job, scene, on_progress, extra)
+        if fmt == "png" and not png_hit:
+            with span("png_encode"):
+                data = await asyncio.to_thread(ppm_to_png, data)
+            filename = str(Path(filename).with_suffix(".png"))
+            if key:
+                await asyncio.to_thread(render_cache.put, key, "png", data)
+        stored = await asyncio.to_thread(store_result, job.job_id, filename, data)
+        status = "cancelled" if job.cancel_event.is_set() else "done"
+        await flush_progress(job)
+        jm.set_status(job.job_id, status)
+        await send(out, {"type": "job", "job_id": job.job_id, "status": status})
+        await out.fan_out(lambda ws: deliver_result(ws, job.job_id, "render", filename, stored, transport, data, **extra))
+    except JobCancelled:
+        await job_cancelled(out, job)
+    except Exception as e:
+        await flush_progress(job)
+        jm.set_status(job.job_id, "error", str(e))
+        await send(out, {"type": "job", "job_id": job.job_id, "status": "error"})
+        await send(out, {"type": "error", "job_id": job.job_id, "error": str(e)})
+
+async def handle_render_sequence(ws, payload):
+    scene = payload.get("scene")
+    if not isinstance(scene, dict):
+        raise ValueError("scene must be an object")
+    scenes = expand_frames(scene, payload.get("frames"), payload.get("keyframes"), payload.get("count"))
+    job = jm.create("render_sequence", meta={
+        "scene": {"width": scene.get("width"), "height": scene.get("height")},
+        "frames": len(scenes),
+    }, priority=job_priority(payload))
+    await enqueue(ws, job, lambda out: run_render_sequence(out, job, scenes), payload)
+    return job
+
+async def run_render_sequence(out, job, scenes):
+    if not await start_job(out, job):
+        return
+
+    on_progress = make_progress_sender(job.job_id)
+    channel = channels[job.job_id]
+    out_dir = RENDERS_DIR / f"sequence_{job.job_id}"
+
+    def on_frame(index, filename):
+        channel.publish({"type": "frame", "job_id": job.job_id, "index": index, "filename": filename})
+
+    try:
+        stats = {}
+        filenames = await asyncio.to_thread(
+            render_sequence,
+            scenes,
+            out_dir,
+            pool_workers(),
+            on_progress,
+            on_frame,
+            stats,
+            executor=job_pool(job),
+            should_stop=job.cancel_event.is_set
         )
+        for name in filenames:
+            await asyncio.to_thread(store_result, job.job_id, name, None, out_dir / name)
+        await asyncio.to_thread(store_result_index, job.job_id)
+        await flush_progress(job)
         jm.set_status(job.job_id, "done")
-        await send(ws, {"type": "job", "job_id": job.job_id, "status": "done"})
-        await send(ws, {
-            "type": "result",
-            "job_id": job.job_id,
-            "kind": "render",
-            "filename": filename,
-            "data_b64": b64_render(data)
-        })
+        await send(out, {"type": "job", "job_id": job.job_id, "status": "done"})
+        msg = {
+            "type": "sequence", "job_id": job.job_id, "dir": str(out_dir.relative_to(RENDERS_DIR)),
+            "frames": filenames, "seconds": round(stats["seconds"], 3),
+            "frames_per_min": round(stats["frames_per_min"], 1), "rays": stats["rays"],
+            "setups_reused": stats["setups_reused"]
+        }
+        await out.fan_out(lambda ws: send(ws, dict(msg, url=result_url(ws, job.job_id))))
+    except JobCancelled:
+        await job_cancelled(out, job)
     except Exception as e:
+        await flush_progress(job)
         jm.set_status(job.job_id, "error", str(e))
-        await send(ws, {"type": "job", "job_id": job.job_id, "status": "error"})
-        await send(ws, {"type": "error", "job_id": job.job_id, "error": str(e)})
+        await send(out, {"type": "job", "job_id": job.job_id, "status": "error"})
+        await send(out, {"type": "error", "job_id": job.job_id, "error": str(e)})
 
-async def handle_zip(ws):
-    job = jm.create("zip_outputs")
-    await send(ws, {"type": "job", "job_id": job.job_id, "status": "queued"})
+async def handle_zip(ws, payload):
+    job = jm.create("zip_outputs", priority=job_priority(payload))
+    await enqueue(ws, job, lambda out: run_zip(out, job, payload), payload)
+    return job
 
-    jm.set_status(job.job_id, "running")
-    await send(ws, {"type": "job", "job_id": job.job_id, "status": "running"})
+async def run_zip(out, job, payload):
+    if not await start_job(out, job):
+        return
 
-    loop = asyncio.get_running_loop()
-    on_progress = make_progress_sender(loop, ws, job.job_id)
+    on_progress = make_progress_sender(job.job_id)
 
     try:
-        filename, data = await asyncio.to_thread(
+        transport, _ = result_options(payload)
+        stats = {}
+        filename, path = await asyncio.to_thread(
             zip_outputs,
             RENDERS_DIR,
             ZIPS_DIR,
-            DEFAULT_WORKERS,
-            on_progress
+            pool_workers(),
+            on_progress,
+            executor=job_pool(job),
+            should_stop=job.cancel_event.is_set,
+            method=payload.get("method", "deflate"),
+            level=int(payload.get("level", DEFAULT_LEVEL)),
+            incremental=bool(payload.get("incremental", True)),
+            stats=stats
         )
+        # enlace al zip de este job: el siguiente zip_outputs reescribe outputs.zip
+        stored = await asyncio.to_thread(store_result, job.job_id, filename, None, path)
+        await flush_progress(job)
         jm.set_status(job.job_id, "done")
-        await send(ws, {"type": "job", "job_id": job.job_id, "status": "done"})
-        await send(ws, {
-            "type": "result",
-            "job_id": job.job_id,
-            "kind": "zip",
-            "filename": filename,
-            "data_b64": b64_zip(data)
+        await send(out, {"type": "job", "job_id": job.job_id, "status": "done"})
+        await out.fan_out(lambda ws: deliver_result(
+            ws, job.job_id, "zip", filename, stored, transport,
+            reused_bytes=stats["reused_bytes"], recomputed_bytes=stats["recomputed_bytes"]
+        ))
+    except JobCancelled:
+        await job_cancelled(out, job)
+    except Exception as e:
+        await flush_progress(job)
+        jm.set_status(job.job_id, "error", str(e))
+        await send(out, {"type": "job", "job_id": job.job_id, "status": "error"})
+        await send(out, {"type": "error", "job_id": job.job_id, "error": str(e)})
+
+async def handle_unzip(ws, payload):
+    job = jm.create("unzip", priority=job_priority(payload))
+    await enqueue(ws, job, lambda out: run_unzip(out, job, payload), payload)
+    return job
+
+async def run_unzip(out, job, payload):
+    if not await start_job(out, job):
+        return
+
+    on_progress = make_progress_sender(job.job_id)
+
+    try:
+        filename = safe_name(payload.get("filename", "outputs.zip"))
+        zip_path = ZIPS_DIR / filename
+        if not zip_path.is_file():
+            raise FileNotFoundError(f"No existe {filename}")
+        verify = bool(payload.get("verify", False))
+        stats = {}
+        files = await asyncio.to_thread(
+            unzip_archive,
+            zip_path,
+            None if verify else RESTORED_DIR / Path(filename).stem,
+            pool_workers(),
+            on_progress,
+            executor=job_pool(job),
+            should_stop=job.cancel_event.is_set,
+            stats=stats
+        )
+        await flush_progress(job)
+        jm.set_status(job.job_id, "done")
+        await send(out, {"type": "job", "job_id": job.job_id, "status": "done"})
+        await send(out, {
+            "type": "unzip", "job_id": job.job_id, "filename": filename, "verify": verify,
+            "ok": stats["bad_files"] == 0, "bytes": stats["bytes"], "seconds": round(stats["seconds"], 3),
+            "mb_s": round(stats["mb_s"] or 0, 1), "files": files
         })
+    except JobCancelled:
+        await job_cancelled(out, job)
     except Exception as e:
+        await flush_progress(job)
         jm.set_status(job.job_id, "error", str(e))
-        await send(ws, {"type": "job", "job_id": job.job_id, "status": "error"})
-        await send(ws, {"type": "error", "job_id": job.job_id, "error": str(e)})
+        await send(out, {"type": "job", "job_id": job.job_id, "status": "error"})
+        await send(out, {"type": "error", "job_id": job.job_id, "error": str(e)})
+
+def job_stats(job_id: str):
+    """Resumen de la traza de un job (en marcha o ya guardada); None si no hay traza."""
+    trace = traces.get(job_id)
+    if trace is None and jm.get(job_id) is None:
+        return None  # ni job conocido: job_id no llega nunca a una ruta
+    trace_file = TRACES_DIR / f"{job_id}.json"
+    if trace is not None:
+        summary = trace.summary()
+    elif trace_file.is_file():
+        summary = summarize(json.loads(trace_file.read_text(encoding="utf-8"))["traceEvents"])
+    else:
+        return None
+    profile = trace_file.with_suffix(".prof.txt")
+    return {
+        "type": "stats", "job_id": job_id, "running": trace is not None, **summary,
+        "trace_file": str(trace_file) if trace is None else None,
+        "profile": profile.read_text(encoding="utf-8").splitlines() if profile.is_file() else None,
+    }
+
+async def handle_render_tiles(ws, payload, tile_tasks: dict):
+    """
+    Modo nodo: renderiza los tiles de un lote de un coordinador y devuelve un
+    frame binario por tile (pack_tile: id de lote, índice y rayos del tile)
+    y {"type": "tiles_done"}. No es un job: comparte el pool por turnos con
+    los jobs de este servidor y se cancela si el coordinador se desconecta.
+    """
+    batch = payload.get("batch")
+    scene = payload.get("scene")
+    tiles = payload.get("tiles")
+    if not (isinstance(batch, str) and len(batch) == JOB_ID_LEN and batch.isascii()):
+        raise ValueError(f"batch must be a {JOB_ID_LEN}-character ASCII id")
+    if not isinstance(scene, dict) or scene.get("seed") is None:
+        raise ValueError("scene must be an object with a fixed seed")
+    if not isinstance(tiles, list) or not all(isinstance(t, list) and len(t) == 5 for t in tiles):
+        raise ValueError("tiles must be a list of [index, x0, y0, w, h]")
+    stop = threading.Event()
+
+    async def run():
+        try:
+            results = await asyncio.to_thread(
+                render_tiles,
+                scene,
+                [tuple(int(v) for v in t) for t in tiles],
+                pool_workers(),
+                executor=job_executor(f"tiles:{id(ws)}"),
+                should_stop=stop.is_set
+            )
+            for tile, rgb, rays in results:
+                await ws.send(pack_tile(batch, tile[0], rays, rgb))
+            await send(ws, {"type": "tiles_done", "batch": batch, "rays": sum(n for *_, n in results)})
+        except (JobCancelled, websockets.ConnectionClosed):
+            pass
+        except Exception as e:
+            try:
+                await send(ws, {"type": "error", "batch": batch, "error": str(e)})
+            except websockets.ConnectionClosed:
+                pass
+        finally:
+            tile_tasks.pop(batch, None)
+
+    tile_tasks[batch] = stop
+    asyncio.create_task(run())
 
 async def handler(ws):
-    await send(ws, {"type": "hello", "server": "multinucleo", "ws": f"ws://{HOST}:{PORT}"})
+    await send(ws, {"type": "hello", "server": "multinucleo", "workers": pool_workers(),
+                    "ws": f"ws://{listen['host']}:{listen['port']}",
+                    "http": f"http://{listen['host']}:{listen['http_port']}" if listen["http_port"] else None})
+    own_jobs = []  # jobs lanzados o suscritos desde esta conexión
+    tile_tasks = {}  # lotes render_tiles en marcha de esta conexión (batch => Event de parada)
+    try:
+        await serve_messages(ws, own_jobs, tile_tasks)
+    finally:
+        for stop in tile_tasks.values():
+            stop.set()
+        # cliente desconectado: si nadie más espera el resultado se liberan los núcleos
+        for job in own_jobs:
+            channel = channels.get(job.job_id)
+            if channel is not None:
+                channel.unsubscribe(ws)
+                if channel.subscribers == 0 and scheduler.cancel(job.job_id):
+                    log(f"Client gone: cancelling job {job.job_id}")
+
+async def serve_messages(ws, own_jobs: list, tile_tasks: dict):
     async for msg in ws:
         try:
             data = json.loads(msg)
@@ -109,22 +685,105 @@ async def handler(ws):
             continue
 
         action = data.get("action")
-        if action == "render":
-            await handle_render(ws, data)
-        elif action == "zip_outputs":
-            await handle_zip(ws)
-        elif action == "ping":
-            await send(ws, {"type": "pong"})
-        else:
-            await send(ws, {"type": "error", "error": f"unknown_action: {action}"})
+        try:
+            if action == "render":
+                own_jobs.append(await handle_render(ws, data))
+            elif action == "render_sequence":
+                own_jobs.append(await handle_render_sequence(ws, data))
+            elif action == "zip_outputs":
+                own_jobs.append(await handle_zip(ws, data))
+            elif action == "unzip":
+                own_jobs.append(await handle_unzip(ws, data))
+            elif action == "render_tiles":
+                await handle_render_tiles(ws, data, tile_tasks)
+            elif action in ("register_node", "unregister_node"):
+                url = data.get("url")
+                if not isinstance(url, str) or not url.startswith(("ws://", "wss://")):
+                    raise ValueError("url must be a ws:// or wss:// address")
+                if action == "register_node":
+                    nodes.add(url)
+                else:
+                    nodes.discard(url)
+                log(f"Nodes: {sorted(nodes)}")
+                await send(ws, {"type": "nodes", "nodes": sorted(nodes)})
+            elif action == "nodes":
+                await send(ws, {"type": "nodes", "nodes": sorted(nodes)})
+            elif action == "subscribe":
+                job_id = data.get("job_id")
+                job = jm.jobs.get(job_id) if isinstance(job_id, str) else None
+                info = jm.get(job_id) if job is None and isinstance(job_id, str) else None
+                if info is not None:  # de antes de un reinicio: ya terminado
+                    await send(ws, {"type": "job", "job_id": job_id, "status": info["status"], "subscribed": False,
+                                    "url": job_result_url(ws, job_id)})
+                elif job is None:
+                    await send(ws, {"type": "error", "job_id": job_id, "error": "unknown_job"})
+                elif await subscribe(ws, job):
+                    own_jobs.append(job)
+            elif action == "unsubscribe":
+                job_id = data.get("job_id")
+                channel = channels.get(job_id) if isinstance(job_id, str) else None
+                if channel is not None:
+                    channel.unsubscribe(ws)
+                await send(ws, {"type": "unsubscribe", "job_id": job_id, "ok": channel is not None})
+            elif action == "cancel":
+                job_id = data.get("job_id")
+                ok = isinstance(job_id, str) and scheduler.cancel(job_id)
+                await send(ws, {"type": "cancel", "job_id": job_id, "ok": ok})
+            elif action == "status":
+                job_id = data.get("job_id")
+                info = jm.get(job_id) if isinstance(job_id, str) else None
+                if info is None:
+                    await send(ws, {"type": "error", "job_id": job_id, "error": "unknown_job"})
+                else:
+                    await send(ws, {"type": "status", "job": info})
+            elif action == "stats":
+                job_id = data.get("job_id")
+                stats = await asyncio.to_thread(job_stats, job_id) if isinstance(job_id, str) else None
+                if stats is None:
+                    await send(ws, {"type": "error", "job_id": job_id, "error": "unknown_job"})
+                else:
+                    await send(ws, stats)
+            elif action == "jobs":
+                await send(ws, {"type": "jobs", **scheduler.snapshot()})
+            elif action == "ping":
+                await send(ws, {"type": "pong"})
+            else:
+                await send(ws, {"type": "error", "error": f"unknown_action: {action}"})
+        except ValueError as e:
+            await send(ws, {"type": "error", "error": str(e)})
 
-async def main():
+async def main(host: str = HOST, port: int = PORT, workers: int = DEFAULT_WORKERS, http_port: Optional[int] = None):
     ensure_dir(RENDERS_DIR)
     ensure_dir(ZIPS_DIR)
-    log(f"WebSocket server on ws://{HOST}:{PORT}")
-    async with websockets.serve(handler, HOST, PORT):
-        await asyncio.Future()
+    ensure_dir(RESULTS_DIR)
+    http_port = port + HTTP_PORT_OFFSET if http_port is None else http_port
+    listen.update(host=host, port=port, http_port=http_port or None)
+    # un solo pool para todos los jobs, arrancado y con los motores importados antes de aceptar clientes
+    secs = warm_pool(workers)
+    log(f"WebSocket server on ws://{host}:{port} ({pool_workers()} worker processes, warmed in {secs:.2f}s)")
+    if nodes:
+        log(f"Coordinator mode: renders split with {sorted(nodes)}")
+    http = None
+    try:
+        if http_port:
+            http = await serve_files(host, http_port, resolve_result)
+            log(f"Results over HTTP on http://{host}:{http_port}/results/<job_id>/<file>")
+        async with websockets.serve(handler, host, port):
+            await asyncio.Future()
+    finally:
+        if http is not None:
+            http.close()
+        shutdown_pool()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    ap = argparse.ArgumentParser(description="Servidor WebSocket multinucleo")
+    ap.add_argument("--host", default=HOST)
+    ap.add_argument("--port", type=int, default=PORT)
+    ap.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="procesos del pool (0 => nº de CPUs)")
+    ap.add_argument("--nodes", default="", help="coordinador: URLs ws:// de los nodos, separadas por comas")
+    ap.add_argument("--http-port", type=int, default=None,
+                    help=f"descarga de resultados por HTTP (por defecto puerto + {HTTP_PORT_OFFSET}; 0 => desactivada)")
+    args = ap.parse_args()
+    nodes.update(url.strip() for url in args.nodes.split(",") if url.strip())
+    asyncio.run(main(args.host, args.port, args.workers, args.http_port))
 
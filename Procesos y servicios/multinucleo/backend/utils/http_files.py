@@ -0,0 +1,163 @@
+"""
+Servidor HTTP mínimo (asyncio) para descargar ficheros ya generados:
+
+- GET y HEAD; resolve(ruta) decide qué fichero sirve cada URL (None => 404).
+- ETag por tamaño y mtime: If-None-Match => 304.
+- Range de un solo tramo ("bytes=a-b", "a-", "-n") => 206 con Content-Range;
+  fuera del fichero => 416. If-Range con otro ETag => fichero entero.
+  Varios tramos o un Range mal formado se ignoran (200 entero, como permite
+  el RFC 9110).
+- El cuerpo va con loop.sendfile: os.sendfile del fichero al socket, sin
+  pasar por memoria del proceso (con TLS o sin sendfile, lectura por bloques).
+- Conexiones keep-alive de HTTP/1.1 (se cierran tras IDLE_TIMEOUT_S sin
+  peticiones).
+"""
+import asyncio
+import os
+from email.utils import formatdate
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+MAX_HEADER_BYTES = 16 * 1024
+IDLE_TIMEOUT_S = 30.0
+
+_REASONS = {
+    200: "OK", 206: "Partial Content", 304: "Not Modified", 400: "Bad Request", 404: "Not Found",
+    405: "Method Not Allowed", 416: "Range Not Satisfiable", 431: "Request Header Fields Too Large",
+}
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+def file_etag(st: os.stat_result) -> str:
+    """ETag fuerte del fichero: cambia si cambian tamaño o mtime."""
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+def parse_range(value: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Cabecera Range => (inicio, fin) inclusivos dentro de [0, size). None si
+    hay que ignorarla (mal formada o de varios tramos); RangeNotSatisfiable
+    si es válida pero cae fuera del fichero.
+    """
+    unit, _, spec = value.strip().partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if not first:
+            n = int(last)
+            if n <= 0 or size == 0:
+                raise RangeNotSatisfiable(value)
+            return max(0, size - n), size - 1
+        start = int(first)
+        end = int(last) if last else None
+    except ValueError:
+        return None
+    if start < 0 or (end is not None and end < start):
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable(value)
+    return start, size - 1 if end is None else min(end, size - 1)
+
+def _head(status: int, headers: Dict[str, str]) -> bytes:
+    lines = [f"HTTP/1.1 {status} {_REASONS[status]}"] + [f"{k}: {v}" for k, v in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+async def _send_file(writer: asyncio.StreamWriter, method: str, path: Path, req: Dict[str, str],
+                     content_type: str, keep: bool):
+    with open(path, "rb") as f:
+        st = os.fstat(f.fileno())
+        size = st.st_size
+        etag = file_etag(st)
+        headers = {
+            "Content-Type": content_type,
+            "ETag": etag,
+            "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+            "Accept-Ranges": "bytes",
+            "Content-Disposition": f'attachment; filename="{path.name}"',
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Expose-Headers": "ETag, Content-Range, Content-Length",
+            "Connection": "keep-alive" if keep else "close",
+        }
+        match = req.get("if-none-match")
+        if match and (match.strip() == "*" or etag in (t.strip() for t in match.split(","))):
+            writer.write(_head(304, headers))
+            return
+        rng = req.get("range")
+        if rng and req.get("if-range", etag) != etag:
+            rng = None  # el cliente tiene otra versión: fichero entero
+        try:
+            part = parse_range(rng, size) if rng else None
+        except RangeNotSatisfiable:
+            writer.write(_head(416, dict(headers, **{"Content-Range": f"bytes */{size}", "Content-Length": "0"})))
+            return
+        if part is None:
+            status, offset, count = 200, 0, size
+        else:
+            status, offset, count = 206, part[0], part[1] - part[0] + 1
+            headers["Content-Range"] = f"bytes {part[0]}-{part[1]}/{size}"
+        headers["Content-Length"] = str(count)
+        writer.write(_head(status, headers))
+        if method == "GET" and count:
+            await writer.drain()
+            await asyncio.get_running_loop().sendfile(writer.transport, f, offset, count)
+
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                  resolve: Callable[[str], Optional[Tuple[Path, str]]]):
+    try:
+        while True:
+            try:
+                head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), IDLE_TIMEOUT_S)
+            except asyncio.LimitOverrunError:
+                writer.write(_head(431, {"Content-Length": "0", "Connection": "close"}))
+                return
+            except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                return
+            lines = head.decode("latin-1").split("\r\n")
+            try:
+                method, target, version = lines[0].split(" ", 2)
+            except ValueError:
+                writer.write(_head(400, {"Content-Length": "0", "Connection": "close"}))
+                return
+            req = {}
+            for line in lines[1:]:
+                key, sep, value = line.partition(":")
+                if sep:
+                    req[key.strip().lower()] = value.strip()
+            # sin cuerpos de petición: si llega uno, no se puede seguir en la misma conexión
+            keep = version == "HTTP/1.1" and req.get("connection", "").lower() != "close" \
+                and req.get("content-length", "0") == "0" and "transfer-encoding" not in req
+            if method not in ("GET", "HEAD"):
+                writer.write(_head(405, {"Allow": "GET, HEAD", "Content-Length": "0", "Connection": "close"}))
+                return
+            found = resolve(unquote(urlsplit(target).path))
+            if found is None:
+                writer.write(_head(404, {"Content-Length": "0", "Access-Control-Allow-Origin": "*",
+                                         "Connection": "keep-alive" if keep else "close"}))
+            else:
+                try:
+                    await _send_file(writer, method, found[0], req, found[1], keep)
+                except FileNotFoundError:  # borrado entre resolve y open
+                    writer.write(_head(404, {"Content-Length": "0", "Connection": "close"}))
+                    return
+            await writer.drain()
+            if not keep:
+                return
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+async def serve_files(host: str, port: int, resolve: Callable[[str], Optional[Tuple[Path, str]]]) -> asyncio.Server:
+    """Arranca el servidor; resolve(ruta de la URL) => (fichero, Content-Type) o None."""
+    return await asyncio.start_server(
+        lambda r, w: _handle(r, w, resolve), host, port, limit=MAX_HEADER_BYTES
+    )
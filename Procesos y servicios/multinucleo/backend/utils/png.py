@@ -0,0 +1,43 @@
+import struct
+import zlib
+
+
+def parse_ppm_header(data) -> tuple:
+    """(width, height, offset del cuerpo) de un P6 con maxval 255."""
+    fields = []
+    pos = 0
+    while len(fields) < 4:
+        while data[pos] in b" \t\r\n":
+            pos += 1
+        start = pos
+        while data[pos] not in b" \t\r\n":
+            pos += 1
+        fields.append(bytes(data[start:pos]))
+    if fields[0] != b"P6" or fields[3] != b"255":
+        raise ValueError("solo se admite PPM P6 con maxval 255")
+    return int(fields[1]), int(fields[2]), pos + 1
+
+def _chunk(kind: bytes, payload: bytes) -> bytes:
+    crc = zlib.crc32(payload, zlib.crc32(kind)) & 0xffffffff
+    return struct.pack(">I", len(payload)) + kind + payload + struct.pack(">I", crc)
+
+def ppm_to_png(ppm, level: int = 6) -> bytes:
+    """
+    Convierte un PPM P6 a PNG RGB 8 bits (filtro 0, zlib por filas).
+    zlib suelta el GIL: ejecutarlo en un thread no bloquea el loop.
+    """
+    w, h, off = parse_ppm_header(ppm)
+    view = memoryview(ppm)
+    row = w*3
+    comp = zlib.compressobj(level)
+    idat = []
+    for y in range(h):
+        idat.append(comp.compress(b"\x00"))
+        idat.append(comp.compress(view[off + y*row: off + (y+1)*row]))
+    idat.append(comp.flush())
+    return b"".join((
+        b"\x89PNG\r\n\x1a\n",
+        _chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 2, 0, 0, 0)),
+        _chunk(b"IDAT", b"".join(idat)),
+        _chunk(b"IEND", b""),
+    ))
@@ -1,5 +1,9 @@
+import os
+import resource
 import time
 from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
 
 @contextmanager
 def timer():
@@ -10,3 +14,60 @@ def timer():
         t1 = time.perf_counter()
         print(f"[timing] {t1 - t0:.3f}s")
 
+def _cpu_seconds(pid: int) -> Optional[float]:
+    """utime+stime de un proceso vivo (Linux, /proc); None si no se puede leer."""
+    try:
+        fields = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+def _peak_rss_kb(pid: int) -> Optional[int]:
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def _reset_peak_rss(pid: int):
+    try:
+        Path(f"/proc/{pid}/clear_refs").write_text("5")  # 5 => reinicia VmHWM
+    except OSError:
+        pass
+
+@contextmanager
+def measure(pids: Iterable[int] = ()) -> Iterator[dict]:
+    """
+    Mide un bloque y rellena el dict que devuelve al salir: wall_s, cpu_s
+    (padre + procesos `pids`, p.ej. los workers del pool), cores_busy
+    (cpu_s / wall_s) y peak_rss_mb (máximo entre padre y `pids` durante el bloque).
+    Los workers se miden por /proc (Linux); fuera de Linux solo cuenta el padre
+    y el pico es el de toda la vida del proceso.
+    """
+    pids = list(pids)
+    out = {}
+    for pid in [os.getpid(), *pids]:
+        _reset_peak_rss(pid)
+    cpu0 = {pid: _cpu_seconds(pid) for pid in pids}
+    self0 = time.process_time()
+    t0 = time.perf_counter()
+    try:
+        yield out
+    finally:
+        wall = time.perf_counter() - t0
+        cpu = time.process_time() - self0
+        for pid, before in cpu0.items():
+            after = _cpu_seconds(pid)
+            if before is not None and after is not None:
+                cpu += after - before
+        peaks = [_peak_rss_kb(pid) for pid in [os.getpid(), *pids]]
+        if peaks[0] is None:
+            peaks[0] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        out.update({
+            "wall_s": wall,
+            "cpu_s": cpu,
+            "cores_busy": cpu / wall if wall > 0 else 0.0,
+            "peak_rss_mb": max(p for p in peaks if p is not None) / 1024,
+        })
@@ -0,0 +1,200 @@
+"""
+Trazas por job: spans con tiempos de cada fase, en el padre y en los workers.
+
+- Trace: spans de un job (eventos "X" del formato Chrome trace, en µs; se
+  abre en chrome://tracing o https://ui.perfetto.dev). Un proceso = un
+  carril: el servidor y cada worker del pool.
+- span(nombre, **args): registra en la traza activa (ContextVar, así
+  asyncio.to_thread la hereda); sin traza activa no hace nada.
+- TracingExecutor: envuelve el executor de un job. Cada tarea corre en el
+  worker con su propia traza (run_traced) y sus spans vuelven con el
+  resultado; el span "task" lleva la espera en cola + IPC de ida y de vuelta.
+  Con profile_every=N se ejecuta con cProfile una de cada N tareas.
+"""
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+_TRACE: ContextVar[Optional["Trace"]] = ContextVar("trace", default=None)
+
+
+def now_us() -> float:
+    # reloj monótono del sistema: comparable entre procesos de la misma máquina
+    return time.perf_counter_ns() / 1000
+
+class Trace:
+    def __init__(self, name: str, profile_dir: Optional[Path] = None, profile_every: int = 0):
+        self.name = name
+        self.events: List[dict] = []
+        self.profile_dir = profile_dir
+        self.profile_every = profile_every
+        self._lock = threading.Lock()
+
+    def add(self, name: str, t0: float, t1: float, pid: int = 0, tid: int = 0, args: Optional[dict] = None):
+        event = {"name": name, "ph": "X", "ts": t0, "dur": t1 - t0,
+                 "pid": pid or os.getpid(), "tid": tid or threading.get_native_id()}
+        if args:
+            event["args"] = args
+        with self._lock:
+            self.events.append(event)
+
+    def extend(self, events: List[dict]):
+        with self._lock:
+            self.events.extend(events)
+
+    @contextmanager
+    def span(self, name: str, /, **args):
+        t0 = now_us()
+        try:
+            yield
+        finally:
+            self.add(name, t0, now_us(), args=args)
+
+    @contextmanager
+    def active(self):
+        """Hace de esta la traza de span() en el contexto actual."""
+        token = _TRACE.set(self)
+        try:
+            yield self
+        finally:
+            _TRACE.reset(token)
+
+    def summary(self) -> dict:
+        """Por nombre de span: count, total_ms y max_ms; por worker: tareas y ms ocupado."""
+        with self._lock:
+            events = list(self.events)
+        return summarize(events)
+
+    def save(self, path: Path):
+        """Escribe la traza (JSON de Chrome trace) y, si hubo cProfile, el perfil combinado."""
+        with self._lock:
+            events = list(self.events)
+        pids = sorted({e["pid"] for e in events})
+        meta = [{"name": "process_name", "ph": "M", "pid": pid,
+                 "args": {"name": "server" if pid == os.getpid() else f"worker {pid}"}} for pid in pids]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({"traceEvents": meta + events, "displayTimeUnit": "ms",
+                                    "otherData": {"job": self.name}}), encoding="utf-8")
+        if self.profile_dir is not None:
+            merge_profiles(self.profile_dir, path.with_suffix(".prof"))
+
+def summarize(events: List[dict]) -> dict:
+    spans = {}
+    workers = {}
+    for e in events:
+        if e.get("ph") != "X":
+            continue
+        ms = e["dur"] / 1000
+        s = spans.setdefault(e["name"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        s["count"] += 1
+        s["total_ms"] += ms
+        s["max_ms"] = max(s["max_ms"], ms)
+        if e["name"] == "task":
+            w = workers.setdefault(str(e["pid"]), {"tasks": 0, "busy_ms": 0.0})
+            w["tasks"] += 1
+            w["busy_ms"] += ms
+    for s in [*spans.values(), *workers.values()]:
+        for k in ("total_ms", "max_ms", "busy_ms"):
+            if k in s:
+                s[k] = round(s[k], 3)
+    return {"spans": spans, "workers": workers}
+
+def merge_profiles(profile_dir: Path, out: Path, top: int = 25):
+    """Junta los .prof de los workers en `out` y deja un resumen en texto (`out`.txt)."""
+    parts = sorted(profile_dir.glob("*.prof"))
+    if not parts:
+        return
+    stats = pstats.Stats(*map(str, parts))
+    stats.dump_stats(out)
+    with open(out.with_suffix(".prof.txt"), "w", encoding="utf-8") as f:
+        stats.stream = f
+        stats.sort_stats("cumulative").print_stats(top)
+    for p in parts:
+        p.unlink()
+    try:
+        profile_dir.rmdir()
+    except OSError:
+        pass
+
+@contextmanager
+def span(name: str, /, **args) -> Iterator[None]:
+    trace = _TRACE.get()
+    if trace is None:
+        yield
+        return
+    with trace.span(name, **args):
+        yield
+
+def run_traced(fn, args, kwargs, profile_path: Optional[str]):
+    """Worker: ejecuta fn con una traza propia (y cProfile si hay profile_path); devuelve (resultado, spans)."""
+    trace = Trace(fn.__name__)
+    with trace.active(), trace.span("task", fn=fn.__name__):
+        if profile_path is None:
+            result = fn(*args, **kwargs)
+        else:
+            prof = cProfile.Profile()
+            result = prof.runcall(fn, *args, **kwargs)
+            prof.dump_stats(profile_path)
+    return result, trace.events
+
+class _TracedFuture(Future):
+    """Future del padre; cancelarlo cancela la tarea real si aún no ha empezado."""
+
+    def __init__(self, inner: Future):
+        super().__init__()
+        self._inner = inner
+        self._notified = False
+
+    def cancel(self) -> bool:
+        self._inner.cancel()  # si se cancela, su callback cancela también este
+        return self.cancelled()
+
+    def _set_cancelled(self):
+        # sin executor detrás: hay que avisar a los wait() igual que haría uno
+        with self._condition:
+            if not self._notified and Future.cancel(self):
+                self._notified = True
+                Future.set_running_or_notify_cancel(self)
+
+class TracingExecutor(Executor):
+    def __init__(self, executor: Executor, trace: Trace):
+        self._executor = executor
+        self._trace = trace
+        self._submitted = 0
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        trace = self._trace
+        profile_path = None
+        if trace.profile_dir is not None and self._submitted % max(1, trace.profile_every) == 0:
+            trace.profile_dir.mkdir(parents=True, exist_ok=True)
+            profile_path = str(trace.profile_dir / f"{self._submitted:06d}.prof")
+        self._submitted += 1
+        t_submit = now_us()
+        inner = self._executor.submit(run_traced, fn, args, kwargs, profile_path)
+        outer = _TracedFuture(inner)
+
+        def done(f: Future):
+            if f.cancelled():
+                outer._set_cancelled()
+            elif f.exception() is not None:
+                outer.set_exception(f.exception())
+            else:
+                result, events = f.result()
+                task = events[-1]  # el span "task" se cierra el último
+                task["args"]["queue_ms"] = round((task["ts"] - t_submit) / 1000, 3)
+                task["args"]["return_ms"] = round((now_us() - task["ts"] - task["dur"]) / 1000, 3)
+                trace.extend(events)
+                outer.set_result(result)
+        inner.add_done_callback(done)
+        return outer
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        self._executor.shutdown(wait, cancel_futures=cancel_futures)
@@ -6,12 +6,19 @@ const logBox = $("log");
 const btnConnect = $("btnConnect");
 const btnRender = $("btnRender");
 const btnZip = $("btnZip");
+const btnCancel = $("btnCancel");
+const chkProgressive = $("chkProgressive");
 const wsUrl = $("wsUrl");
 
 const resultMeta = $("resultMeta");
 const downloadLink = $("downloadLink");
+const preview = $("preview");
+const previewMeta = $("previewMeta");
 
 let ws = null;
+let currentJob = null;
+// resultados binarios en curso: job_id -> { meta, parts, received }
+const incoming = new Map();
 
 // worker UI
 const uiWorker = new Worker("./js/workers/ui_worker.js");
@@ -22,8 +29,60 @@ uiWorker.onmessage = (e) => {
     logBox.textContent = e.data.text;
     logBox.scrollTop = logBox.scrollHeight;
   }
+  else if (e.data?.type === "image") {
+    const { w, h, rgba, meta } = e.data;
+    preview.width = w;
+    preview.height = h;
+    preview.getContext("2d").putImageData(new ImageData(rgba, w, h), 0, 0);
+    preview.classList.remove("hidden");
+    if (meta) previewMeta.textContent = meta;
+  }
 };
 
+function showPPM(bytes, meta){
+  uiWorker.postMessage({ type:"decodePPM", payload:{ bytes, meta }});
+}
+
+async function showPNG(bytes){
+  const bmp = await createImageBitmap(new Blob([bytes], { type:"image/png" }));
+  preview.width = bmp.width;
+  preview.height = bmp.height;
+  preview.getContext("2d").drawImage(bmp, 0, 0);
+  preview.classList.remove("hidden");
+}
+
+function onResult(msg, bin){
+  pushLog(`Result (${msg.kind}): ${msg.filename}${msg.stopped ? ` [${msg.stopped}]` : ""}${msg.cached ? " [cache]" : ""}`);
+  const mime = msg.mime || (msg.kind === "zip" ? "application/zip" : "image/x-portable-pixmap");
+  setResult(msg.filename, bin, mime);
+  if (mime === "image/x-portable-pixmap") showPPM(bin, null);
+  else if (mime === "image/png") showPNG(bin);
+}
+
+function onChunk(ev){
+  const r = incoming.get(ev.job_id);
+  if (!r) return;
+  r.parts[ev.seq] = ev.data;
+  r.received++;
+  if (r.received < r.meta.chunks) return;
+  incoming.delete(ev.job_id);
+  const bin = new Uint8Array(r.meta.size);
+  let off = 0;
+  for (const p of r.parts) { bin.set(p, off); off += p.byteLength; }
+  onResult(r.meta, bin);
+}
+
+// resultado por URL: el servidor solo manda metadatos y se descarga por HTTP
+async function fetchResult(msg){
+  try {
+    const res = await fetch(msg.url);
+    if (!res.ok) throw new Error(`HTTP ${res.status}`);
+    onResult(msg, new Uint8Array(await res.arrayBuffer()));
+  } catch (e) {
+    pushLog(`ERROR descargando ${msg.url}: ${e.message}`);
+  }
+}
+
 function pushLog(text){
   const ts = new Date().toLocaleTimeString();
   logItems.push({ ts, text });
@@ -47,6 +106,7 @@ async function loadDefaultScene(){
     height: 140,
     samples_per_pixel: 12,
     max_depth: 4,
+    seed: 1,
     camera: { origin:[0,1,3], look_at:[0,0.6,0], fov_degrees:45 },
     world: {
       spheres: [
@@ -65,14 +125,24 @@ btnConnect.onclick = async () => {
   try {
     ws = new WSClient(wsUrl.value.trim(), (msg) => {
       if (msg.type === "hello") pushLog(`Server: ${msg.server} (${msg.ws})`);
-      else if (msg.type === "job") pushLog(`Job ${msg.job_id}: ${msg.status}`);
+      else if (msg.type === "job") {
+        pushLog(`Job ${msg.job_id}: ${msg.status}`);
+        if (msg.status === "running") { currentJob = msg.job_id; btnCancel.disabled = false; }
+        else if (msg.job_id === currentJob && msg.status !== "queued") btnCancel.disabled = true;
+      }
       else if (msg.type === "progress") pushLog(`Job ${msg.job_id}: ${msg.pct}% - ${msg.msg}`);
-      else if (msg.type === "result") {
-        pushLog(`Result (${msg.kind}): ${msg.filename}`);
+      else if (msg.type === "preview") {
         const bin = Uint8Array.from(atob(msg.data_b64), c => c.charCodeAt(0));
-        if (msg.kind === "render") setResult(msg.filename, bin, "image/x-portable-pixmap");
-        if (msg.kind === "zip") setResult(msg.filename, bin, "application/zip");
+        const noise = msg.noise == null ? "-" : msg.noise.toFixed(4);
+        showPPM(bin, `Pasada ${msg.pass}: ${msg.spp} spp, ruido ${noise}, ${msg.elapsed}s`);
+      }
+      else if (msg.type === "result") {
+        if (msg.transport === "url") fetchResult(msg);
+        else if (msg.transport === "binary") incoming.set(msg.job_id, { meta: msg, parts: [], received: 0 });
+        else onResult(msg, Uint8Array.from(atob(msg.data_b64), c => c.charCodeAt(0)));
       }
+      else if (msg.type === "chunk") onChunk(msg);
+      else if (msg.type === "cancel") pushLog(`Cancel ${msg.job_id}: ${msg.ok ? "ok" : "no aplicable"}`);
       else if (msg.type === "error") pushLog(`ERROR: ${msg.error}`);
       else if (msg.type === "close") pushLog("WS closed");
       else pushLog(`MSG: ${JSON.stringify(msg)}`);
@@ -92,7 +162,8 @@ btnRender.onclick = async () => {
   if (!ws) return;
   downloadLink.classList.add("hidden");
   const scene = await loadDefaultScene();
-  ws.send({ action:"render", scene });
+  if (chkProgressive.checked) ws.send({ action:"render", scene, progressive:true, time_budget_s:60, format:"png" });
+  else ws.send({ action:"render", scene, format:"png" });
   pushLog("➡️ Render request sent");
 };
 
@@ -103,3 +174,9 @@ btnZip.onclick = async () => {
   pushLog("➡️ ZIP request sent");
 };
 
+
+btnCancel.onclick = () => {
+  if (!ws || !currentJob) return;
+  ws.send({ action:"cancel", job_id: currentJob });
+  pushLog(`➡️ Cancel request sent (${currentJob})`);
+};
@@ -10,5 +10,22 @@ self.onmessage = (e) => {
     }
     self.postMessage({ type:"logText", text: s });
   }
+  else if (type === "decodePPM") {
+    // P6 binario -> RGBA para pintarlo en un <canvas>
+    const bytes = payload.bytes;
+    let pos = 0, fields = [];
+    while (fields.length < 4) {
+      while (bytes[pos] === 0x20 || bytes[pos] === 0x0a || bytes[pos] === 0x0d || bytes[pos] === 0x09) pos++;
+      let tok = "";
+      while (bytes[pos] !== 0x20 && bytes[pos] !== 0x0a && bytes[pos] !== 0x0d && bytes[pos] !== 0x09) tok += String.fromCharCode(bytes[pos++]);
+      fields.push(tok);
+    }
+    pos++;
+    const w = parseInt(fields[1], 10), h = parseInt(fields[2], 10);
+    const rgba = new Uint8ClampedArray(w*h*4);
+    for (let i = 0, j = pos; i < w*h; i++, j += 3) {
+      rgba[4*i] = bytes[j]; rgba[4*i+1] = bytes[j+1]; rgba[4*i+2] = bytes[j+2]; rgba[4*i+3] = 255;
+    }
+    self.postMessage({ type:"image", w, h, rgba, meta: payload.meta }, [rgba.buffer]);
+  }
 };
-
@@ -8,12 +8,20 @@ export class WSClient {
   connect(){
     return new Promise((resolve, reject) => {
       const ws = new WebSocket(this.url);
+      ws.binaryType = "arraybuffer";
       this.ws = ws;
 
       ws.onopen = () => resolve();
       ws.onerror = (e) => reject(e);
 
       ws.onmessage = (ev) => {
+        if (ev.data instanceof ArrayBuffer) {
+          // frame binario de resultado: [job_id 12 bytes ASCII][seq uint32 BE][datos]
+          const job_id = new TextDecoder().decode(new Uint8Array(ev.data, 0, 12));
+          const seq = new DataView(ev.data).getUint32(12);
+          this.onEvent?.({ type:"chunk", job_id, seq, data: new Uint8Array(ev.data, 16) });
+          return;
+        }
         try {
           const msg = JSON.parse(ev.data);
           this.onEvent?.(msg);
@@ -0,0 +1,76 @@
+"""
+Benchmark del muestreo adaptativo y la ruleta rusa (sin WS):
+- Referencia por estimador: render uniforme con REF_SPP muestras (numpy)
+- Barrido uniforme de spp => curva ruido (RMSE vs referencia) / rayos / tiempo
+- Render adaptativo (min_spp..MAX_SPP, noise_threshold) con y sin ruleta rusa
+- Para cada adaptativo: spp uniforme con el mismo ruido medido (interpolado
+  en log-log) y rayos / tiempo ahorrados frente a él
+
+Uso: python tests/bench_adaptive.py [engine] [workers] [noise_threshold]
+"""
+import json
+import math
+import sys
+import tempfile
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.engines.pathtracer.tracer import render_pathtracer_ppm
+
+ROOT = Path(__file__).resolve().parents[1]
+WIDTH, HEIGHT = 120, 75
+REF_SPP = 512
+MAX_SPP = 64
+UNIFORM_SPP = (4, 8, 16, 32, 64)
+
+
+def render(scene: dict, tmp: Path, workers: int):
+    stats = {}
+    _, data = render_pathtracer_ppm(scene, tmp, workers=workers, stats=stats)
+    return data[-WIDTH*HEIGHT*3:], stats
+
+def rmse(a: bytes, b: bytes) -> float:
+    """Ruido medido: RMSE por canal frente a la referencia, en niveles de 8 bits."""
+    return math.sqrt(sum((x - y)**2 for x, y in zip(a, b)) / len(a))
+
+def equal_noise(curve, noise: float):
+    """(spp, rayos, segundos) uniformes con ese ruido, interpolando la curva en log-log."""
+    pts = sorted(curve, key=lambda p: -p[0])  # de más a menos ruido
+    for (e0, *a), (e1, *b) in zip(pts, pts[1:]):
+        if e1 <= noise <= e0 or (noise > e0 and (e0, *a) == pts[0]) or (noise < e1 and (e1, *b) == pts[-1]):
+            t = (math.log(noise) - math.log(e0)) / (math.log(e1) - math.log(e0))
+            return tuple(math.exp(math.log(x) + t*(math.log(y) - math.log(x))) for x, y in zip(a, b))
+    return tuple(pts[-1][1:])
+
+if __name__ == "__main__":
+    engine = sys.argv[1] if len(sys.argv) > 1 else "numpy"
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    threshold = float(sys.argv[3]) if len(sys.argv) > 3 else 0.01
+
+    base = json.loads((ROOT / "backend/engines/pathtracer/scene_default.json").read_text(encoding="utf-8"))
+    base.update(width=WIDTH, height=HEIGHT, engine=engine, seed=7)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        for rr in (False, True):
+            label = "russian roulette" if rr else f"max_depth {base.get('max_depth', 4)}"
+            scene = dict(base, russian_roulette=rr)
+            ref, _ = render(dict(scene, engine="numpy", samples_per_pixel=REF_SPP, seed=99), tmp, workers)
+
+            print(f"\n[{engine}, {label}] reference {REF_SPP} spp")
+            print(f"{'mode':>10} {'spp':>7} {'rays':>9} {'time':>8} {'noise':>7}")
+            curve = []
+            for spp in UNIFORM_SPP:
+                img, st = render(dict(scene, samples_per_pixel=spp), tmp, workers)
+                e = rmse(img, ref)
+                curve.append((e, spp, st["rays"], st["seconds"]))
+                print(f"{'uniform':>10} {spp:>7} {st['rays']:>9} {st['seconds']:>7.3f}s {e:>7.2f}")
+
+            img, st = render(dict(scene, samples_per_pixel=MAX_SPP, adaptive=True, noise_threshold=threshold), tmp, workers)
+            e = rmse(img, ref)
+            print(f"{'adaptive':>10} {st['spp_avg']:>7.1f} {st['rays']:>9} {st['seconds']:>7.3f}s {e:>7.2f}")
+
+            spp_eq, rays_eq, secs_eq = equal_noise(curve, e)
+            print(f"equal noise: uniform ~{spp_eq:.1f} spp, {rays_eq:.0f} rays, {secs_eq:.3f}s => "
+                  f"saved {1 - st['rays']/rays_eq:+.0%} rays, {secs_eq - st['seconds']:+.3f}s "
+                  f"({1 - st['seconds']/secs_eq:+.0%})")
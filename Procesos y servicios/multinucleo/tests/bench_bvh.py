@@ -0,0 +1,47 @@
+"""
+Benchmark del BVH (sin WS):
+- Genera campos de N esferas aleatorias (scenes.random_spheres_scene)
+- Renderiza con y sin aceleración en ambos motores e informa tiempo vs N
+
+Uso: python tests/bench_bvh.py [workers] [N1,N2,...]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.engines.pathtracer.scenes import random_spheres_scene
+from backend.engines.pathtracer.tracer import prepare_scene, render_pathtracer_ppm
+
+# sin BVH el coste es O(N) por rayo: por encima de esto solo se mide con BVH
+LINEAR_LIMIT = {"python": 1000, "numpy": 4000}
+
+
+if __name__ == "__main__":
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+    sizes = [int(n) for n in sys.argv[2].split(",")] if len(sys.argv) > 2 else [10, 100, 1000, 4000]
+
+    print(f"{'engine':>7} {'N':>6} {'build':>8} {'bvh':>9} {'linear':>9} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for engine in ("python", "numpy"):
+            for n in sizes:
+                scene = dict(random_spheres_scene(n, seed=n), engine=engine)
+
+                t0 = time.perf_counter()
+                nodes = prepare_scene(dict(scene, accel="bvh")).bvh.nodes
+                build = time.perf_counter() - t0
+
+                times = {}
+                for accel in ("bvh", "none"):
+                    if accel == "none" and n > LINEAR_LIMIT[engine]:
+                        continue
+                    stats = {}
+                    render_pathtracer_ppm(dict(scene, accel=accel), Path(tmp), workers=workers, stats=stats)
+                    times[accel] = stats["seconds"]
+
+                t_bvh = times["bvh"]
+                t_lin = times.get("none")
+                lin = f"{t_lin:.3f}s" if t_lin else "-"
+                speedup = f"{t_lin / t_bvh:.1f}x" if t_lin else "-"
+                print(f"{engine:>7} {n:>6} {build:>7.3f}s {t_bvh:>8.3f}s {lin:>9} {speedup:>8}  ({nodes} nodes)")
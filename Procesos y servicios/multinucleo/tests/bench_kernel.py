@@ -0,0 +1,139 @@
+"""
+Micro-benchmark del kernel escalar (un proceso, sin pool). Muestras por
+segundo por núcleo, separando los dos cambios del kernel plano:
+- baseline: copia congelada del tracer.ray_color anterior (recursivo, Hit
+  por intersección, muestreo por rechazo en la esfera unidad)
+- sampler: tracer.ray_color actual (recursivo, vector unitario sin rechazo):
+  solo cambia el muestreo del rebote, que también cambia el estimador
+  (otra imagen con la misma seed; de ahí CACHE_VERSION 2)
+- kernel: kernel.trace_path (iterativo sobre FlatScene, mismo muestreo)
+Escena por defecto (lineal), con ruleta rusa y un campo de esferas con BVH;
+cada cifra es la mejor de REPEATS pasadas.
+
+Uso: python tests/bench_kernel.py [samples]
+"""
+import json
+import math
+import random
+import sys
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.engines.pathtracer.bvh import closest_hit
+from backend.engines.pathtracer.framebuffer import clamp
+from backend.engines.pathtracer.kernel import RR_MAX_P, RR_MIN_P, flat_scene, trace_path
+from backend.engines.pathtracer.scenes import random_spheres_scene
+from backend.engines.pathtracer.tracer import (
+    Hit, prepare_scene, primary_ray, ray_color, v_add, v_dot, v_mul, v_sub, v_unit
+)
+
+ROOT = Path(__file__).resolve().parents[1]
+REPEATS = 3
+
+
+# --- baseline: tracer.ray_color antes del kernel plano (no tocar) ---
+
+def _baseline_random_in_unit_sphere(rng):
+    while True:
+        p = (rng.uniform(-1,1), rng.uniform(-1,1), rng.uniform(-1,1))
+        if v_dot(p, p) < 1:
+            return p
+
+def _baseline_hit_sphere(ray_o, ray_d, sphere, t_min=0.001, t_max=1e9):
+    oc = v_sub(ray_o, sphere.center)
+    a = v_dot(ray_d, ray_d)
+    b = v_dot(oc, ray_d)
+    c = v_dot(oc, oc) - sphere.radius*sphere.radius
+    disc = b*b - a*c
+    if disc < 0:
+        return None
+    sqrtd = math.sqrt(disc)
+    root = (-b - sqrtd) / a
+    if root < t_min or root > t_max:
+        root = (-b + sqrtd) / a
+        if root < t_min or root > t_max:
+            return None
+    p = v_add(ray_o, v_mul(ray_d, root))
+    n = v_mul(v_sub(p, sphere.center), 1.0/sphere.radius)
+    return Hit(t=root, p=p, normal=n, albedo=sphere.albedo)
+
+def _baseline_hit_ground_plane(ray_o, ray_d, y0, albedo, t_min=0.001, t_max=1e9):
+    if abs(ray_d[1]) < 1e-8:
+        return None
+    t = (y0 - ray_o[1]) / ray_d[1]
+    if t < t_min or t > t_max:
+        return None
+    p = v_add(ray_o, v_mul(ray_d, t))
+    n = (0.0, 1.0 if ray_d[1] < 0 else -1.0, 0.0)
+    return Hit(t=t, p=p, normal=n, albedo=tuple(albedo))
+
+def baseline_ray_color(ray_o, ray_d, spheres, ground_y, ground_albedo, depth, rng, bvh=None, rr_below=0):
+    if depth <= 0:
+        return (0.0, 0.0, 0.0)
+    closest = None
+    closest_t = 1e9
+    if bvh is not None:
+        closest = closest_hit(bvh, spheres, ray_o, ray_d, closest_t, _baseline_hit_sphere)
+        if closest:
+            closest_t = closest.t
+    else:
+        for s in spheres:
+            h = _baseline_hit_sphere(ray_o, ray_d, s, t_max=closest_t)
+            if h and h.t < closest_t:
+                closest_t = h.t
+                closest = h
+    hg = _baseline_hit_ground_plane(ray_o, ray_d, ground_y, ground_albedo, t_max=closest_t)
+    if hg and hg.t < closest_t:
+        closest = hg
+        closest_t = hg.t
+    if closest:
+        atten = closest.albedo
+        if depth <= rr_below:
+            p = clamp(max(atten), RR_MIN_P, RR_MAX_P)
+            if rng.random() >= p:
+                return (0.0, 0.0, 0.0)
+            atten = (atten[0]/p, atten[1]/p, atten[2]/p)
+        target = v_add(closest.p, v_add(closest.normal, _baseline_random_in_unit_sphere(rng)))
+        new_d = v_unit(v_sub(target, closest.p))
+        col = baseline_ray_color(closest.p, new_d, spheres, ground_y, ground_albedo, depth-1, rng, bvh, rr_below)
+        return (atten[0]*col[0], atten[1]*col[1], atten[2]*col[2])
+    u = v_unit(ray_d)
+    t = 0.5*(u[1] + 1.0)
+    return ((1.0-t)*1.0 + t*0.5, (1.0-t)*1.0 + t*0.7, (1.0-t)*1.0 + t*1.0)
+
+# ---
+
+def bench(setup, samples: int, mode: str) -> float:
+    """Muestras/s de cámara (con sus rebotes) en puntos aleatorios de la imagen."""
+    rng = random.Random(0)
+    rays = [primary_ray(setup, rng.random(), rng.random()) for _ in range(samples)]
+    fs = flat_scene(setup)
+    random_ = rng.random
+    t0 = time.perf_counter()
+    if mode == "kernel":
+        for (ox, oy, oz), (dx, dy, dz) in rays:
+            trace_path(fs, ox, oy, oz, dx, dy, dz, random_)
+    else:
+        fn = baseline_ray_color if mode == "baseline" else ray_color
+        for o, d in rays:
+            fn(o, d, setup.spheres, setup.ground_y, setup.ground_albedo,
+               setup.max_depth, rng, setup.bvh, setup.rr_below)
+    return samples / (time.perf_counter() - t0)
+
+if __name__ == "__main__":
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    base = json.loads((ROOT / "backend/engines/pathtracer/scene_default.json").read_text(encoding="utf-8"))
+    cases = {
+        "default": base,
+        "default+rr": dict(base, russian_roulette=True),
+        "200 spheres bvh": dict(random_spheres_scene(200, seed=3), accel="bvh"),
+    }
+    print(f"{'scene':>16} {'baseline':>10} {'sampler':>10} {'kernel':>10} "
+          f"{'sampler x':>10} {'kernel x':>9} {'total x':>8}   (samples/s per core)")
+    for name, scene in cases.items():
+        setup = prepare_scene(scene)
+        before, sampled, after = (max(bench(setup, samples, mode) for _ in range(REPEATS))
+                                  for mode in ("baseline", "sampler", "kernel"))
+        print(f"{name:>16} {before:>10.0f} {sampled:>10.0f} {after:>10.0f} "
+              f"{sampled / before:>9.2f}x {after / sampled:>8.2f}x {after / before:>7.2f}x")
@@ -0,0 +1,48 @@
+"""
+Benchmark del path tracer (sin WS):
+- Renderiza scene_default.json con el motor escalar y con el motor NumPy
+- Informa rayos de cámara por segundo y la diferencia de brillo medio
+
+Uso: python tests/bench_pathtracer.py [workers] [scale]
+  scale < 1 reduce la resolución para pruebas rápidas (p.ej. 0.5)
+"""
+import json
+import sys
+import tempfile
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.engines.pathtracer.tracer import render_pathtracer_ppm
+
+SCENE_PATH = Path(__file__).resolve().parents[1] / "backend/engines/pathtracer/scene_default.json"
+
+
+def mean_rgb(ppm: bytes, w: int, h: int):
+    body = ppm[-w*h*3:]
+    return [sum(body[i::3]) / (w*h) for i in range(3)]
+
+def run(engine: str, scene: dict, workers: int, out_dir: Path):
+    sc = dict(scene, engine=engine)
+    stats = {}
+    _, data = render_pathtracer_ppm(sc, out_dir, workers=workers, stats=stats)
+    return stats, mean_rgb(data, sc["width"], sc["height"])
+
+if __name__ == "__main__":
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+    scale = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+
+    scene = json.loads(SCENE_PATH.read_text(encoding="utf-8"))
+    scene["width"] = max(2, int(scene["width"]*scale))
+    scene["height"] = max(2, int(scene["height"]*scale))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for engine in ("python", "numpy"):
+            stats, rgb = run(engine, scene, workers, Path(tmp))
+            results[engine] = (stats, rgb)
+            print(f"{engine:>7}: {stats['rays']} rays in {stats['seconds']:.3f}s "
+                  f"=> {stats['rays_per_sec']:,.0f} rays/s  mean RGB={[round(c, 1) for c in rgb]}")
+
+    (sp, rgb_p), (sn, rgb_n) = results["python"], results["numpy"]
+    print(f"speedup numpy/python: {sn['rays_per_sec'] / sp['rays_per_sec']:.1f}x")
+    print(f"max |mean RGB diff|: {max(abs(a - b) for a, b in zip(rgb_p, rgb_n)):.2f} (0-255)")
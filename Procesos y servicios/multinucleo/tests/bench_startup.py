@@ -0,0 +1,66 @@
+"""
+Benchmark de latencia de arranque de job (sin WS) con trabajo trivial, donde
+manda el coste fijo y no el cálculo:
+- "cold": pool propio por llamada (como antes: procesos + imports en cada job)
+- "warm": pool compartido arrancado con warm_pool() (motores ya importados)
+para un render de 8x8 a 1 spp y un zip de 3 ficheros pequeños.
+Con --spawn se usa el método de arranque "spawn" (macOS/Windows), donde cada
+proceso nuevo vuelve a importarlo todo.
+
+Uso: python tests/bench_startup.py [repeticiones] [--spawn]
+"""
+import multiprocessing
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.engines.pathtracer.tracer import render_pathtracer_ppm
+from backend.engines.zip_multicore.zipper import zip_outputs
+from backend.jobs.pool import job_executor, pool_workers, shutdown_pool, warm_pool
+
+TINY = {
+    "width": 8, "height": 8, "samples_per_pixel": 1, "max_depth": 1,
+    "camera": {"origin": [0, 1, 3], "look_at": [0, 0.6, 0], "fov_degrees": 45},
+    "world": {"spheres": [{"center": [0, 0.6, 0], "radius": 0.6, "albedo": [0.7, 0.3, 0.2]}],
+              "ground": {"y": 0.0, "albedo": [0.8, 0.8, 0.8]}},
+}
+
+
+def measure(fn, reps: int):
+    times = []
+    for i in range(reps):
+        t0 = time.perf_counter()
+        fn(i)
+        times.append((time.perf_counter() - t0)*1000)
+    return statistics.median(times), min(times)
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    reps = int(args[0]) if args else 10
+    if "--spawn" in sys.argv:
+        multiprocessing.set_start_method("spawn")
+    method = multiprocessing.get_start_method()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        files = tmp / "in"
+        files.mkdir()
+        for i in range(3):
+            (files / f"f{i}.txt").write_bytes(b"hola\n"*100)
+
+        warm_s = warm_pool()
+        workers = pool_workers()
+        jobs = {
+            "render 8x8": lambda ex, i: render_pathtracer_ppm(TINY, tmp / "r", workers, executor=ex),
+            "zip 3 files": lambda ex, i: zip_outputs(files, tmp / "z", workers, executor=ex, incremental=False),
+        }
+        print(f"{workers} workers, start method {method}, pool warmed in {warm_s*1000:.0f} ms, {reps} reps")
+        print(f"{'job':>12} {'cold ms':>9} {'warm ms':>9} {'speedup':>8}")
+        for name, job in jobs.items():
+            cold, _ = measure(lambda i: job(None, i), reps)
+            warm, _ = measure(lambda i: job(job_executor(f"bench-{i}"), i), reps)
+            print(f"{name:>12} {cold:>9.1f} {warm:>9.1f} {cold/warm:>7.1f}x")
+        shutdown_pool()
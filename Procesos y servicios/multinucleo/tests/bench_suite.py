@@ -0,0 +1,190 @@
+"""
+Suite de benchmarks de los motores (sin WS):
+- Path tracer: resoluciones x spp x profundidad x motor, para cada nº de workers
+- Zipper: nº de ficheros x tamaño x método, para cada nº de workers
+Por caso registra wall time, rays/s o MB/s, utilización de CPU (padre +
+workers, por /proc) y pico de RSS; calcula speedup y eficiencia frente al
+menor nº de workers y lo guarda todo en JSON.
+
+Con una línea base (--baseline, por defecto tests/bench_baseline.json si
+existe) compara throughput y memoria caso a caso y sale con código 1 si algo
+empeora más de --tolerance. La línea base depende de la máquina: se genera
+en ella con --save-baseline (no se versiona).
+
+Uso: python tests/bench_suite.py [--full] [--workers 1,2,4] [--reps N]
+         [--out bench_results.json] [--baseline FICHERO] [--save-baseline] [--tolerance 0.15]
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.engines.pathtracer.tracer import render_pathtracer_ppm
+from backend.engines.zip_multicore.zipper import zip_outputs
+from backend.jobs.pool import _preload, ensure_shared_tracker
+from backend.utils.timing import measure
+from tests.bench_zip import make_inputs
+
+SCENE_PATH = Path(__file__).resolve().parents[1] / "backend/engines/pathtracer/scene_default.json"
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "bench_baseline.json"
+
+PROFILES = {
+    "quick": {
+        "render": {"size": [(64, 40), (128, 80)], "spp": [2], "depth": [2], "engine": ["python"]},
+        "zip": {"files": [8], "mb": [0.5], "method": ["deflate"]},
+    },
+    "full": {
+        "render": {"size": [(80, 50), (160, 100), (320, 200)], "spp": [4, 16], "depth": [2, 5],
+                   "engine": ["python", "numpy"]},
+        "zip": {"files": [16, 64], "mb": [0.25, 2.0], "method": ["store", "deflate"]},
+    },
+}
+# Métrica de throughput de cada suite (la que se compara con la línea base)
+THROUGHPUT = {"render": "rays_per_sec", "zip": "mb_s"}
+
+
+def render_cases(grid: dict, scene: dict, tmp: Path):
+    for (w, h), spp, depth, engine in itertools.product(grid["size"], grid["spp"], grid["depth"], grid["engine"]):
+        sc = dict(scene, width=w, height=h, samples_per_pixel=spp, max_depth=depth, engine=engine, seed=1)
+
+        def run(ex, workers, sc=sc):
+            stats = {}
+            render_pathtracer_ppm(sc, tmp / "renders", workers, executor=ex, stats=stats)
+            return {"rays": stats["rays"]}
+        yield f"{w}x{h} spp{spp} d{depth} {engine}", run
+
+def zip_cases(grid: dict, tmp: Path):
+    for files, mb, method in itertools.product(grid["files"], grid["mb"], grid["method"]):
+        src = tmp / f"zip_{files}x{mb}"
+        if not src.exists():
+            src.mkdir()
+            make_inputs(src, files, mb)
+        total = sum(p.stat().st_size for p in src.iterdir())
+
+        def run(ex, workers, src=src, method=method, total=total):
+            zip_outputs(src, tmp / "zips", workers, executor=ex, method=method, incremental=False)
+            return {"bytes": total}
+        yield f"{files} files x {mb} MB {method}", run
+
+def run_suite(suite: str, cases, counts, reps: int) -> list:
+    cases = list(cases)
+    results = []
+    ensure_shared_tracker()
+    for workers in counts:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_preload) as ex:
+            list(ex.map(abs, range(workers)))  # arranque del pool fuera de la medida
+            pids = [p.pid for p in multiprocessing.active_children()]
+            for case, run in cases:
+                run(ex, workers)  # primera ejecución sin medir: contexto del job, cachés, páginas
+                best = None
+                for _ in range(reps):
+                    with measure(pids) as m:
+                        work = run(ex, workers)
+                    if best is None or m["wall_s"] < best["wall_s"]:
+                        best = dict(m, **work)
+                row = {
+                    "suite": suite, "case": case, "workers": workers,
+                    "wall_s": round(best["wall_s"], 4),
+                    "cpu_util": round(best["cores_busy"] / workers, 3),
+                    "peak_rss_mb": round(best["peak_rss_mb"], 1),
+                }
+                if "rays" in best:
+                    row["rays_per_sec"] = round(best["rays"] / best["wall_s"])
+                else:
+                    row["mb_s"] = round(best["bytes"] / 2**20 / best["wall_s"], 2)
+                results.append(row)
+                print(f"  {suite:>6} {case:<32} {workers:>3}w {row['wall_s']:>8.3f}s", flush=True)
+    return results
+
+def add_scaling(results: list):
+    """speedup y eficiencia de cada caso frente a su ejecución con menos workers."""
+    by_case = {}
+    for r in results:
+        by_case.setdefault((r["suite"], r["case"]), []).append(r)
+    for rows in by_case.values():
+        base = min(rows, key=lambda r: r["workers"])
+        for r in rows:
+            r["speedup"] = round(base["wall_s"] / r["wall_s"], 3)
+            r["efficiency"] = round(r["speedup"] * base["workers"] / r["workers"], 3)
+
+def compare(results: list, baseline: dict, tolerance: float) -> list:
+    """Casos que empeoran frente a la línea base: throughput por debajo o pico de RSS por encima de la tolerancia."""
+    old = {(r["suite"], r["case"], r["workers"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for r in results:
+        b = old.get((r["suite"], r["case"], r["workers"]))
+        if b is None:
+            continue
+        key = THROUGHPUT[r["suite"]]
+        if r[key] < b[key] * (1 - tolerance):
+            regressions.append(f"{r['suite']} {r['case']} {r['workers']}w: {key} {b[key]} -> {r[key]}")
+        # margen absoluto de 8 MB: en casos pequeños el RSS es sobre todo el intérprete
+        if r["peak_rss_mb"] > b["peak_rss_mb"] * (1 + tolerance) + 8:
+            regressions.append(f"{r['suite']} {r['case']} {r['workers']}w: peak_rss_mb {b['peak_rss_mb']} -> {r['peak_rss_mb']}")
+    return regressions
+
+def print_table(results: list):
+    print(f"{'suite':>6} {'case':<32} {'w':>3} {'wall s':>8} {'throughput':>14} {'speedup':>7} {'eff':>5} {'cpu':>5} {'rss MB':>7}")
+    for r in results:
+        key = THROUGHPUT[r["suite"]]
+        unit = "rays/s" if key == "rays_per_sec" else "MB/s"
+        print(f"{r['suite']:>6} {r['case']:<32} {r['workers']:>3} {r['wall_s']:>8.3f} "
+              f"{r[key]:>9,} {unit:<4} {r['speedup']:>6.2f}x {r['efficiency']:>5.2f} "
+              f"{r['cpu_util']:>5.0%} {r['peak_rss_mb']:>7.1f}")
+
+if __name__ == "__main__":
+    cpus = os.cpu_count() or 1
+    ap = argparse.ArgumentParser(description="Benchmarks del path tracer y del zipper")
+    ap.add_argument("--full", action="store_true", help="rejilla completa (por defecto la rápida)")
+    ap.add_argument("--workers", help="nº de workers separados por comas (por defecto potencias de 2 hasta nº de CPUs)")
+    ap.add_argument("--reps", type=int, default=1, help="repeticiones por caso (se queda el mejor wall time)")
+    ap.add_argument("--out", type=Path, default=Path("bench_results.json"))
+    ap.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    ap.add_argument("--save-baseline", action="store_true", help="guarda estos resultados como línea base")
+    ap.add_argument("--tolerance", type=float, default=0.15)
+    args = ap.parse_args()
+
+    if args.workers:
+        counts = [int(x) for x in args.workers.split(",")]
+    else:
+        counts = sorted({n for n in (1, 2, 4, 8, 16, 32, 64) if n <= cpus} | {cpus})
+    profile = "full" if args.full else "quick"
+    grid = PROFILES[profile]
+    scene = json.loads(SCENE_PATH.read_text(encoding="utf-8"))
+
+    print(f"profile {profile}, workers {counts}, {cpus} CPUs")
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        results = run_suite("render", render_cases(grid["render"], scene, tmp), counts, args.reps)
+        results += run_suite("zip", zip_cases(grid["zip"], tmp), counts, args.reps)
+    add_scaling(results)
+    print_table(results)
+
+    report = {
+        "meta": {
+            "profile": profile, "cpus": cpus, "python": platform.python_version(),
+            "platform": platform.platform(), "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    args.out.write_text(json.dumps(report, indent=1), encoding="utf-8")
+    print(f"results: {args.out}")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=1), encoding="utf-8")
+        print(f"baseline saved: {args.baseline}")
+    elif args.baseline.exists():
+        regressions = compare(results, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        print(f"baseline {args.baseline}: {len(regressions)} regressions (tolerance {args.tolerance:.0%})")
+        if regressions:
+            sys.exit(1)
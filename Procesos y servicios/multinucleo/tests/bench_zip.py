@@ -0,0 +1,66 @@
+"""
+Benchmark del zipper (sin WS):
+- Genera un directorio de PPM sintéticos (degradados con ruido, compresibles
+  como un render real)
+- Comprime con STORE y DEFLATE (niveles 1, 6, 9) para cada nº de workers
+- Informa MB/s de entrada, ratio (zip / original) y speedup frente a 1 worker
+
+Uso: python tests/bench_zip.py [workers1,workers2,...] [files] [MB por fichero]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.engines.zip_multicore.zipper import zip_outputs
+
+MODES = [("store", 0), ("deflate", 1), ("deflate", 6), ("deflate", 9)]
+
+
+def synthetic_ppm(rng: random.Random, w: int, h: int) -> bytes:
+    """Degradado horizontal + ruido en una de cada 4 filas."""
+    base = bytes((x*255//max(1, w-1)) for x in range(w) for _ in range(3))
+    rows = []
+    for y in range(h):
+        rows.append(rng.randbytes(w*3) if y % 4 == 3 else base[y % 3:] + base[:y % 3])
+    return f"P6\n{w} {h}\n255\n".encode("ascii") + b"".join(rows)
+
+def make_inputs(root: Path, files: int, mb: float):
+    rng = random.Random(1)
+    w = 512
+    h = max(1, int(mb*1024*1024 / (w*3)))
+    for i in range(files):
+        (root / f"render_{i:03d}.ppm").write_bytes(synthetic_ppm(rng, w, h))
+
+if __name__ == "__main__":
+    cpus = os.cpu_count() or 1
+    default = sorted({1, 2, 4, cpus} - {0})
+    counts = [int(x) for x in sys.argv[1].split(",")] if len(sys.argv) > 1 else default
+    files = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    mb = float(sys.argv[3]) if len(sys.argv) > 3 else 2.0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = Path(tmp) / "in"
+        out = Path(tmp) / "out"
+        src.mkdir()
+        make_inputs(src, files, mb)
+        total = sum(p.stat().st_size for p in src.iterdir())
+        print(f"{files} files, {total/2**20:.1f} MB total, {cpus} CPUs")
+        print(f"{'mode':>10} {'workers':>7} {'MB/s':>8} {'ratio':>6} {'speedup':>7}")
+
+        for method, level in MODES:
+            base = None
+            for workers in counts:
+                with ProcessPoolExecutor(max_workers=workers) as ex:
+                    list(ex.map(abs, range(workers)))  # arranque del pool fuera de la medida
+                    t0 = time.perf_counter()
+                    _, path = zip_outputs(src, out, workers, executor=ex, method=method, level=level)
+                    secs = time.perf_counter() - t0
+                mbps = total / 2**20 / secs
+                base = base or mbps
+                label = method if method == "store" else f"deflate-{level}"
+                print(f"{label:>10} {workers:>7} {mbps:>8.1f} {path.stat().st_size/total:>6.3f} {mbps/base:>6.2f}x")
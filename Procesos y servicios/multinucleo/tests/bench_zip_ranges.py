@@ -0,0 +1,64 @@
+"""
+Benchmark del zipper con carga mixta (sin WS): un fichero enorme + muchos
+pequeños, que es el caso en que un worker por fichero deja a los demás
+parados esperando al grande.
+- "ranges": el fichero grande se reparte por rangos (mmap + crc32_combine)
+- "whole":  un worker por fichero (SPLIT_MIN desactivado)
+Informa MB/s de entrada por modo, método y nº de workers.
+
+Uso: python tests/bench_zip_ranges.py [workers1,workers2,...] [MB del grande] [nº pequeños]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.engines.zip_multicore import zipper
+from tests.bench_zip import synthetic_ppm
+
+MODES = [("store", 0), ("deflate", 1), ("deflate", 6)]
+
+
+def make_inputs(root: Path, big_mb: int, small: int):
+    rng = random.Random(1)
+    with open(root / "huge.ppm", "wb") as f:
+        block = synthetic_ppm(rng, 512, 682)  # ~1 MB
+        for _ in range(big_mb):
+            f.write(block)
+    for i in range(small):
+        (root / f"small_{i:03d}.ppm").write_bytes(synthetic_ppm(rng, 128, 64 + i % 32))
+
+if __name__ == "__main__":
+    cpus = os.cpu_count() or 1
+    default = sorted({1, 2, 4, cpus} - {0})
+    counts = [int(x) for x in sys.argv[1].split(",")] if len(sys.argv) > 1 else default
+    big_mb = int(sys.argv[2]) if len(sys.argv) > 2 else 256
+    small = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    split_min = zipper.SPLIT_MIN
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = Path(tmp) / "in"
+        out = Path(tmp) / "out"
+        src.mkdir()
+        make_inputs(src, big_mb, small)
+        total = sum(p.stat().st_size for p in src.iterdir())
+        print(f"1 x {big_mb} MB + {small} small files, {total/2**20:.1f} MB total, {cpus} CPUs")
+        print(f"{'mode':>10} {'split':>6} {'workers':>7} {'MB/s':>8} {'zip MB':>8}")
+
+        for method, level in MODES:
+            for split in ("whole", "ranges"):
+                zipper.SPLIT_MIN = split_min if split == "ranges" else float("inf")
+                for workers in counts:
+                    with ProcessPoolExecutor(max_workers=workers) as ex:
+                        list(ex.map(abs, range(workers)))  # arranque del pool fuera de la medida
+                        t0 = time.perf_counter()
+                        _, path = zipper.zip_outputs(src, out, workers, executor=ex, method=method,
+                                                     level=level, incremental=False)
+                        secs = time.perf_counter() - t0
+                    label = method if method == "store" else f"deflate-{level}"
+                    print(f"{label:>10} {split:>6} {workers:>7} {total/2**20/secs:>8.1f} {path.stat().st_size/2**20:>8.1f}")
+        zipper.SPLIT_MIN = split_min
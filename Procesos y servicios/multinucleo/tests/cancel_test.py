@@ -0,0 +1,171 @@
+"""
+Test de cancelación (sin WS):
+- Lanza un render grande en el pool compartido y lo cancela a mitad
+- Comprueba que render_pathtracer_ppm lanza JobCancelled en < DEADLINE_S
+- Comprueba que los workers del pool quedan ociosos (CPU vía /proc)
+- El pool sigue sirviendo jobs después de la cancelación
+- Lo mismo con un zip deflate de ficheros grandes: los workers abandonan
+  el fichero/rango en curso en el siguiente bloque
+- Re-zip incremental sin cambios (solo copia entradas del zip anterior):
+  cancelar también corta y el zip anterior queda intacto
+
+Uso: python tests/cancel_test.py
+"""
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.engines.pathtracer.tracer import render_pathtracer_ppm
+from backend.engines.zip_multicore.zipper import zip_outputs
+from backend.jobs.cancel import JobCancelled
+from backend.jobs.pool import get_pool, pool_workers, shutdown_pool
+
+DEADLINE_S = 2.0
+IDLE_WINDOW_S = 1.0
+IDLE_MAX_CPU = 0.1  # segundos de CPU de todos los workers durante la ventana
+
+scene = {
+  "width": 640, "height": 400, "samples_per_pixel": 64, "max_depth": 4, "seed": 3,
+  "camera": { "origin":[0,1,3], "look_at":[0,0.6,0], "fov_degrees":45 },
+  "world": {
+    "spheres":[ { "center":[0,0.6,0], "radius":0.6, "albedo":[0.7,0.3,0.2] } ],
+    "ground": { "y":0.0, "albedo":[0.8,0.8,0.8] }
+  }
+}
+
+def workers_cpu_seconds() -> float:
+    """utime+stime de los procesos hijos vivos (Linux)."""
+    tick = os.sysconf("SC_CLK_TCK")
+    total = 0
+    for p in multiprocessing.active_children():
+        try:
+            fields = Path(f"/proc/{p.pid}/stat").read_text().rsplit(")", 1)[1].split()
+        except FileNotFoundError:
+            continue
+        total += int(fields[11]) + int(fields[12])
+    return total / tick
+
+def cancel_after(engine: str, out_dir: Path, delay: float) -> float:
+    stop = threading.Event()
+    outcome = {}
+
+    def run():
+        try:
+            render_pathtracer_ppm(dict(scene, engine=engine), out_dir, pool_workers(), executor=get_pool(), should_stop=stop.is_set)
+            outcome["result"] = "finished"
+        except JobCancelled:
+            outcome["result"] = "cancelled"
+
+    t = threading.Thread(target=run)
+    t.start()
+    time.sleep(delay)
+    t_cancel = time.perf_counter()
+    stop.set()
+    t.join(timeout=30)
+    latency = time.perf_counter() - t_cancel
+    assert outcome.get("result") == "cancelled", f"{engine}: render not cancelled ({outcome})"
+    assert latency < DEADLINE_S, f"{engine}: cancellation took {latency:.2f}s (> {DEADLINE_S}s)"
+    return latency
+
+def zip_cancel_after(tmp: Path, delay: float) -> float:
+    """Zip deflate-9 de un fichero por rangos y otro entero, cancelado a mitad."""
+    src = tmp / "zip_in"
+    src.mkdir()
+    rng = random.Random(0)
+    words = [bytes(rng.choices(b"abcdefghij ", k=rng.randint(2, 9))) for _ in range(5000)]
+    blob = b" ".join(rng.choices(words, k=8_000_000))[:36 * 1024 * 1024]
+    (src / "split.bin").write_bytes(blob)
+    (src / "whole.bin").write_bytes(blob[:24 * 1024 * 1024])
+    stop = threading.Event()
+    outcome = {}
+
+    def run():
+        try:
+            zip_outputs(src, tmp / "zip_out", pool_workers(), executor=get_pool(), should_stop=stop.is_set,
+                        level=9, incremental=False)
+            outcome["result"] = "finished"
+        except JobCancelled:
+            outcome["result"] = "cancelled"
+
+    t = threading.Thread(target=run)
+    t.start()
+    time.sleep(delay)
+    t_cancel = time.perf_counter()
+    stop.set()
+    t.join(timeout=60)
+    latency = time.perf_counter() - t_cancel
+    assert outcome.get("result") == "cancelled", f"zip not cancelled ({outcome})"
+    assert latency < DEADLINE_S, f"zip: cancellation took {latency:.2f}s (> {DEADLINE_S}s)"
+    return latency
+
+def zip_reuse_cancel(tmp: Path):
+    """Re-zip sin ficheros nuevos: el padre solo copia entradas; should_stop se mira en cada una."""
+    src = tmp / "reuse_in"
+    src.mkdir()
+    for i in range(50):
+        (src / f"f{i:02d}.bin").write_bytes(bytes([i]) * 4096)
+    out = tmp / "reuse_out"
+    zip_outputs(src, out, pool_workers(), executor=get_pool())
+    before = (out / "outputs.zip").read_bytes()
+    checks = []
+
+    def should_stop():
+        checks.append(1)
+        return len(checks) > 5
+
+    try:
+        zip_outputs(src, out, pool_workers(), executor=get_pool(), should_stop=should_stop)
+        raise AssertionError("reuse-only zip not cancelled")
+    except JobCancelled:
+        pass
+    assert len(checks) == 6, f"cancel seen after {len(checks)} checks"
+    assert (out / "outputs.zip").read_bytes() == before, "previous zip replaced after cancel"
+    assert not (out / "outputs.zip.tmp").exists()
+
+def idle_cpu() -> float:
+    """CPU de los workers durante IDLE_WINDOW_S (nan si no hay /proc)."""
+    if not Path("/proc").exists():
+        return float("nan")
+    c0 = workers_cpu_seconds()
+    time.sleep(IDLE_WINDOW_S)
+    return workers_cpu_seconds() - c0
+
+if __name__ == "__main__":
+    get_pool()
+    engines = ["python"]
+    try:
+        import numpy  # noqa: F401
+        engines.append("numpy")
+    except ImportError:
+        print("numpy not installed: skipping engine 'numpy'")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        out_dir = Path(tmp)
+        try:
+            for engine in engines:
+                latency = cancel_after(engine, out_dir, delay=1.0)
+                busy = idle_cpu()
+                assert not busy > IDLE_MAX_CPU, f"{engine}: workers still busy after cancel ({busy:.2f}s CPU in {IDLE_WINDOW_S}s)"
+                print(f"{engine}: cancelled in {latency:.3f}s, worker CPU after cancel {busy:.2f}s/{IDLE_WINDOW_S}s")
+
+            latency = zip_cancel_after(out_dir, delay=1.0)
+            busy = idle_cpu()
+            assert not busy > IDLE_MAX_CPU, f"zip: workers still busy after cancel ({busy:.2f}s CPU in {IDLE_WINDOW_S}s)"
+            print(f"zip: cancelled in {latency:.3f}s, worker CPU after cancel {busy:.2f}s/{IDLE_WINDOW_S}s")
+
+            zip_reuse_cancel(out_dir)
+            print("zip (reuse only): cancelled before writing the archive")
+
+            # el pool compartido sigue sano tras cancelar
+            small = dict(scene, width=32, height=20, samples_per_pixel=2)
+            _, data = render_pathtracer_ppm(small, out_dir, pool_workers(), executor=get_pool())
+            assert data.startswith(b"P6\n32 20\n255\n")
+        finally:
+            shutdown_pool()
+    print("OK")
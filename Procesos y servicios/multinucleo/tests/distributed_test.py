@@ -0,0 +1,91 @@
+"""
+Test del render repartido en una sola máquina:
+- Arranca NODES servidores multinucleo como nodos (puertos BASE_PORT+i, 1 worker)
+- Renderiza con render_distributed (pool local + nodos + un nodo inexistente)
+  y compara bit a bit con render_pathtracer_ppm en local (misma seed)
+- Repite matando un nodo a mitad de render: sus tiles se reparten entre el
+  resto y la imagen sigue siendo idéntica
+
+Uso: python tests/distributed_test.py
+"""
+import asyncio
+import json
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.engines.pathtracer.distributed import render_distributed
+from backend.engines.pathtracer.tracer import render_pathtracer_ppm
+
+ROOT = Path(__file__).resolve().parents[1]
+NODES = 2
+BASE_PORT = 8791
+DEAD_NODE = "ws://127.0.0.1:8799"  # nadie escucha: el coordinador debe seguir sin él
+
+scene = json.loads((ROOT / "backend/engines/pathtracer/scene_default.json").read_text(encoding="utf-8"))
+scene.update(width=160, height=96, samples_per_pixel=4, max_depth=3, seed=11)
+
+
+def start_node(port: int) -> subprocess.Popen:
+    proc = subprocess.Popen([sys.executable, "-m", "backend.server", "--port", str(port), "--workers", "1"],
+                            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"node on port {port} did not start")
+
+async def distributed(out_dir: Path, urls, kill: subprocess.Popen = None):
+    stats = {}
+    killed = []
+
+    def on_progress(pct, msg):
+        if kill is not None and pct >= 20 and not killed:
+            kill.send_signal(signal.SIGKILL)
+            killed.append(pct)
+
+    _, data = await render_distributed(scene, out_dir, urls, workers=1, on_progress=on_progress, stats=stats)
+    return data, stats
+
+def main():
+    procs = [start_node(BASE_PORT + i) for i in range(NODES)]
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            local_stats = {}
+            _, expected = render_pathtracer_ppm(scene, tmp, workers=1, stats=local_stats)
+            urls = [f"ws://127.0.0.1:{BASE_PORT + i}" for i in range(NODES)]
+
+            data, stats = asyncio.run(distributed(tmp, urls + [DEAD_NODE]))
+            assert data == expected, "distributed render differs from local render"
+            by_node = {n["node"]: n for n in stats["nodes"]}
+            print("nodes:", {k: (v["tiles"], v["error"]) for k, v in by_node.items()})
+            assert sum(n["tiles"] for n in stats["nodes"]) == stats["tiles"]
+            # cada tile cuenta sus rayos una vez, aunque se haya repetido en otro nodo
+            assert stats["rays"] == local_stats["rays"], (stats["rays"], local_stats["rays"])
+            assert by_node[DEAD_NODE]["error"] and by_node[DEAD_NODE]["tiles"] == 0
+            assert any(by_node[u]["tiles"] > 0 for u in urls), "no tile rendered by a remote node"
+
+            data, stats = asyncio.run(distributed(tmp, urls, kill=procs[0]))
+            assert data == expected, "render with a killed node differs from local render"
+            by_node = {n["node"]: n for n in stats["nodes"]}
+            print("after kill:", {k: (v["tiles"], v["error"]) for k, v in by_node.items()})
+            assert by_node[urls[0]]["error"], "killed node not reported"
+            assert stats["rays"] == local_stats["rays"], (stats["rays"], local_stats["rays"])
+    finally:
+        for p in procs:
+            p.kill()
+            p.wait()
+
+if __name__ == "__main__":
+    main()
+    print("OK")
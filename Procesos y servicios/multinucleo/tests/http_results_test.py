@@ -0,0 +1,147 @@
+"""
+Test de la descarga de resultados por HTTP (arranca un servidor en PORT):
+- Un render con el transport por defecto ("url") trae solo metadatos y la
+  URL; el GET devuelve el mismo PPM que el transport binario
+- ETag / If-None-Match => 304; Range => 206 (tramo, sufijo, abierto);
+  fuera del fichero => 416; If-Range con otro ETag => 200 entero; HEAD
+- Otra conexión que se suscribe al job ya terminado recibe la URL
+- Rutas fuera de results/<job_id>/ => 404
+- La URL de una secuencia (/results/<job_id>/) devuelve el índice JSON de
+  sus frames y cada href se descarga
+
+Uso: python tests/http_results_test.py
+"""
+import asyncio
+import http.client
+import json
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import websockets
+
+ROOT = Path(__file__).resolve().parents[1]
+PORT = 8781
+HTTP_PORT = 8881
+
+scene = json.loads((ROOT / "backend/engines/pathtracer/scene_default.json").read_text(encoding="utf-8"))
+scene.update(width=64, height=40, samples_per_pixel=2, seed=9)
+
+
+def wait_port(port: int):
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server on port {port} did not start")
+
+async def render(ws, **options):
+    """Lanza un render y devuelve (mensaje result, bytes si llegaron por WS)."""
+    await ws.send(json.dumps({"action": "render", "scene": scene, "cache": False, **options}))
+    result, parts = None, []
+    while True:
+        msg = await ws.recv()
+        if isinstance(msg, bytes):
+            parts.append(msg[16:])
+            if len(parts) == result["chunks"]:
+                return result, b"".join(parts)
+            continue
+        msg = json.loads(msg)
+        assert msg["type"] != "error", msg
+        if msg["type"] == "result":
+            result = msg
+            if msg["transport"] == "url":
+                return msg, None
+
+async def render_sequence(ws) -> dict:
+    """Secuencia de 2 frames (solo cambia la cámara); devuelve el mensaje sequence."""
+    small = dict(scene, width=32, height=20)
+    frames = [{}, {"camera": {"fov_degrees": 50}}]
+    await ws.send(json.dumps({"action": "render_sequence", "scene": small, "frames": frames}))
+    while True:
+        msg = json.loads(await ws.recv())
+        assert msg["type"] != "error", msg
+        if msg["type"] == "sequence":
+            return msg
+
+def get(url: str, method: str = "GET", **headers):
+    u = urlsplit(url)
+    conn = http.client.HTTPConnection(u.hostname, u.port, timeout=10)
+    conn.request(method, u.path, headers=headers)
+    resp = conn.getresponse()
+    body = resp.read()
+    conn.close()
+    return resp.status, dict(resp.getheaders()), body
+
+async def main():
+    async with websockets.connect(f"ws://127.0.0.1:{PORT}", max_size=None) as ws:
+        hello = json.loads(await ws.recv())
+        assert hello["http"] == f"http://127.0.0.1:{HTTP_PORT}", hello
+
+        meta, inline = await render(ws)
+        assert meta["transport"] == "url" and inline is None and "data_b64" not in meta
+        _, expected = await render(ws, transport="binary")
+
+        status, headers, body = get(meta["url"])
+        assert status == 200 and body == expected, status
+        assert headers["ETag"] == meta["etag"] and int(headers["Content-Length"]) == meta["size"]
+        assert headers["Accept-Ranges"] == "bytes"
+        size = len(body)
+
+        assert get(meta["url"], **{"If-None-Match": meta["etag"]})[0] == 304
+        status, headers, part = get(meta["url"], Range="bytes=10-19")
+        assert status == 206 and part == body[10:20] and headers["Content-Range"] == f"bytes 10-19/{size}"
+        status, _, part = get(meta["url"], Range="bytes=-7")
+        assert status == 206 and part == body[-7:]
+        status, _, part = get(meta["url"], Range=f"bytes={size - 3}-")
+        assert status == 206 and part == body[-3:]
+        status, headers, _ = get(meta["url"], Range=f"bytes={size}-")
+        assert status == 416 and headers["Content-Range"] == f"bytes */{size}"
+        status, _, part = get(meta["url"], Range="bytes=0-9", **{"If-Range": '"other"'})
+        assert status == 200 and part == body
+        status, headers, part = get(meta["url"], "HEAD")
+        assert status == 200 and part == b"" and int(headers["Content-Length"]) == size
+
+        base = f"http://127.0.0.1:{HTTP_PORT}"
+        for path in ("/results/../config.py", "/results/zzz/render.ppm", "/", f"/results/{meta['job_id']}/..%2Fx"):
+            assert get(base + path)[0] == 404, path
+
+        seq = await render_sequence(ws)
+        status, headers, body = get(seq["url"])
+        assert status == 200 and headers["Content-Type"] == "application/json", (status, headers)
+        index = json.loads(body)
+        assert index["job_id"] == seq["job_id"] and [f["name"] for f in index["files"]] == seq["frames"], index
+        for f in index["files"]:
+            status, headers, frame = get(urljoin(seq["url"], f["href"]))
+            assert status == 200 and frame.startswith(b"P6\n32 20\n") and len(frame) == f["size"]
+            assert headers["ETag"] == f["etag"]
+        assert get(f"{base}/results/{seq['job_id']}/.index.json")[0] == 404  # solo vía el directorio
+
+    # un cliente que vuelve: suscribirse al job terminado trae la URL
+    async with websockets.connect(f"ws://127.0.0.1:{PORT}") as ws:
+        await ws.recv()
+        await ws.send(json.dumps({"action": "subscribe", "job_id": meta["job_id"]}))
+        msg = json.loads(await ws.recv())
+        assert msg["subscribed"] is False and msg["url"] == meta["url"], msg
+        await ws.send(json.dumps({"action": "subscribe", "job_id": seq["job_id"]}))
+        msg = json.loads(await ws.recv())
+        assert msg["url"] == seq["url"], msg
+    print(f"served {size} bytes from {meta['url']}")
+
+if __name__ == "__main__":
+    proc = subprocess.Popen([sys.executable, "-m", "backend.server", "--port", str(PORT), "--workers", "1"],
+                            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_port(PORT)
+        asyncio.run(main())
+    finally:
+        proc.kill()
+        proc.wait()
+    print("OK")
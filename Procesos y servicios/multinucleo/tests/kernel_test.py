@@ -0,0 +1,58 @@
+"""
+Test del kernel escalar plano (sin WS):
+- Con el mismo RNG, kernel.trace_path da el mismo color que la referencia
+  recursiva tracer.ray_color (salvo redondeo) en la escena por defecto, con
+  BVH y con ruleta rusa
+- random_unit_vector devuelve vectores unitarios
+
+Uso: python tests/kernel_test.py
+"""
+import json
+import random
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.engines.pathtracer.kernel import flat_scene, random_unit_vector, trace_path
+from backend.engines.pathtracer.scenes import random_spheres_scene
+from backend.engines.pathtracer.tracer import prepare_scene, primary_ray, ray_color
+
+ROOT = Path(__file__).resolve().parents[1]
+PATHS = 2000
+
+
+def max_diff(scene: dict) -> float:
+    setup = prepare_scene(scene)
+    fs = flat_scene(setup)
+    worst = 0.0
+    for i in range(PATHS):
+        ref_rng, rng = random.Random(i), random.Random(i)
+        u, v = ref_rng.random(), ref_rng.random()
+        rng.random(), rng.random()
+        o, d = primary_ray(setup, u, v)
+        expected = ray_color(o, d, setup.spheres, setup.ground_y, setup.ground_albedo,
+                             setup.max_depth, ref_rng, setup.bvh, setup.rr_below)
+        got = trace_path(fs, *o, *d, rng.random)
+        worst = max(worst, *(abs(a - b) for a, b in zip(expected, got)))
+    return worst
+
+def main():
+    base = json.loads((ROOT / "backend/engines/pathtracer/scene_default.json").read_text(encoding="utf-8"))
+    cases = {
+        "default": base,
+        "bvh": dict(random_spheres_scene(200, seed=3), accel="bvh"),
+        "roulette": dict(base, russian_roulette=True),
+    }
+    for name, scene in cases.items():
+        diff = max_diff(scene)
+        print(f"{name}: max diff {diff:.2e}")
+        assert diff < 1e-9, name
+
+    rng = random.Random(1)
+    for _ in range(1000):
+        x, y, z = random_unit_vector(rng.random)
+        assert abs(x*x + y*y + z*z - 1.0) < 1e-12
+
+if __name__ == "__main__":
+    main()
+    print("OK")
@@ -0,0 +1,73 @@
+"""
+Test del canal de progreso (sin servidor, con clientes WS falsos):
+- 20000 actualizaciones desde un thread => pocos envíos por cliente
+  (ritmo máximo) y el último valor siempre llega tras flush()
+- Un cliente lento recibe menos mensajes pero no frena al rápido
+- Un cliente desconectado se da de baja solo
+
+Uso: python tests/progress_test.py
+"""
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import websockets
+
+from backend.jobs.progress import ProgressChannel
+
+UPDATES = 20000
+INTERVAL_S = 0.05
+
+
+class FakeWS:
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.msgs = []
+
+    async def send(self, data):
+        if self.fail:
+            raise websockets.ConnectionClosed(None, None)
+        await asyncio.sleep(self.delay)
+        self.msgs.append(json.loads(data))
+
+async def main():
+    loop = asyncio.get_running_loop()
+    channel = ProgressChannel(loop, INTERVAL_S)
+    fast, slow, gone = FakeWS(), FakeWS(delay=0.2), FakeWS(fail=True)
+    for ws in (fast, slow, gone):
+        channel.subscribe(ws)
+
+    def producer():
+        for i in range(UPDATES):
+            channel.publish({"type": "progress", "pct": i * 100 // (UPDATES - 1)})
+            if i % 1000 == 0:
+                time.sleep(0.01)  # ~0.2 s de "render"
+
+    t0 = time.perf_counter()
+    await asyncio.to_thread(producer)
+    await channel.flush()
+    elapsed = time.perf_counter() - t0
+
+    assert fast.msgs[-1]["pct"] == 100 and slow.msgs[-1]["pct"] == 100
+    max_fast = elapsed / INTERVAL_S + 2
+    assert 1 < len(fast.msgs) <= max_fast, (len(fast.msgs), max_fast)
+    assert len(slow.msgs) < len(fast.msgs), (len(slow.msgs), len(fast.msgs))
+    assert channel.subscribers == 2  # el desconectado se dio de baja
+    pcts = [m["pct"] for m in fast.msgs]
+    assert pcts == sorted(pcts)
+
+    # un suscriptor tardío recibe el último estado
+    late = FakeWS()
+    channel.subscribe(late)
+    await channel.close()
+    assert late.msgs and late.msgs[-1]["pct"] == 100
+
+    print(f"{UPDATES} updates in {elapsed:.2f}s -> fast {len(fast.msgs)} msgs, slow {len(slow.msgs)} msgs")
+
+if __name__ == "__main__":
+    asyncio.run(main())
+    print("OK")
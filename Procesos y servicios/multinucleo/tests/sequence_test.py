@@ -0,0 +1,79 @@
+"""
+Test del render de secuencias (sin WS):
+- expand_frames interpola los keyframes de cámara
+- Cada frame de render_sequence es idéntico al render suelto de su escena
+  (misma seed) y los frames que solo mueven la cámara reutilizan el setup
+- Frames por minuto frente a renderizar los frames uno a uno en el mismo
+  pool: en un campo de esferas con BVH la secuencia no vuelve a preparar ni
+  a publicar la escena en cada frame y debe ser al menos MIN_SPEEDUP veces
+  más rápida (se toma la mejor de REPEATS pasadas de cada modo)
+
+Uso: python tests/sequence_test.py [workers]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.engines.pathtracer.scenes import random_spheres_scene
+from backend.engines.pathtracer.sequence import expand_frames, render_sequence
+from backend.engines.pathtracer.tracer import render_pathtracer_ppm
+from backend.jobs.pool import get_pool, pool_workers, shutdown_pool
+
+FRAMES = 12
+REPEATS = 2
+MIN_SPEEDUP = 1.15
+
+base = dict(random_spheres_scene(2000, seed=3, samples_per_pixel=1), accel="bvh", seed=5)
+
+
+def main(workers: int):
+    start = base["camera"]["origin"]
+    end = [start[0] + 1.0, start[1] + 0.5, start[2]]
+    scenes = expand_frames(base, keyframes=[
+        {"frame": 0, "camera": {"origin": start}},
+        {"frame": FRAMES - 1, "camera": {"origin": end}},
+    ])
+    assert len(scenes) == FRAMES
+    assert scenes[0]["camera"]["origin"] == start and scenes[-1]["camera"]["origin"] == end
+    mid = scenes[FRAMES // 2]["camera"]["origin"][0]
+    assert abs(mid - (start[0] + (FRAMES // 2) / (FRAMES - 1))) < 1e-9
+    assert scenes[1]["camera"]["look_at"] == base["camera"]["look_at"]  # lo no animado se mantiene
+
+    ex = get_pool()
+    workers = workers or pool_workers()
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        render_pathtracer_ppm(scenes[0], tmp / "single", workers, executor=ex)  # workers en caliente
+        seq_s, single_s = [], []
+        for _ in range(REPEATS):
+            stats = {}
+            seen = []
+            names = render_sequence(scenes, tmp / "seq", workers, on_frame=lambda i, name: seen.append(i),
+                                    stats=stats, executor=ex)
+            seq_s.append(stats["seconds"])
+            assert names == [f"frame_{i:04d}.ppm" for i in range(FRAMES)]
+            assert sorted(seen) == list(range(FRAMES))
+            assert stats["setups_reused"] == FRAMES - 1, stats
+
+            frames = []
+            t0 = time.perf_counter()
+            for scene in scenes:
+                frames.append(render_pathtracer_ppm(scene, tmp / "single", workers, executor=ex)[1])
+            single_s.append(time.perf_counter() - t0)
+        for i, expected in enumerate(frames):
+            assert (tmp / "seq" / names[i]).read_bytes() == expected, f"frame {i} differs"
+
+    seq_fpm = FRAMES*60 / min(seq_s)
+    single_fpm = FRAMES*60 / min(single_s)
+    print(f"{FRAMES} frames: sequence {seq_fpm:.0f} frames/min, one by one {single_fpm:.0f} frames/min "
+          f"({seq_fpm / single_fpm:.2f}x)")
+    assert seq_fpm >= MIN_SPEEDUP * single_fpm, "sequence is not faster than rendering frames one by one"
+
+if __name__ == "__main__":
+    try:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 0)
+    finally:
+        shutdown_pool()
+    print("OK")
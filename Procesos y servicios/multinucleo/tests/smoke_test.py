@@ -1,9 +1,11 @@
 """
 Smoke test rápido (sin WS):
-- Renderiza una escena
+- Renderiza una escena (e informa pico de memoria y copias del framebuffer)
 - Hace ZIP de outputs
 """
+import resource
 import sys
+import tracemalloc
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
@@ -25,6 +27,26 @@ if __name__ == "__main__":
     out_z = Path("backend/output/zips")
 
     render_pathtracer_ppm(scene, out_r, workers=0, on_progress=lambda p,m: print(p,m))
+
+    # pico de memoria Python del padre en un render ya "en caliente" (imports
+    # y pool hechos): con el framebuffer compartido ronda 1x la imagen, que es
+    # la copia que se devuelve; antes eran ~3x (filas + join + cabecera).
+    big = dict(scene, width=320, height=200, samples_per_pixel=1, max_depth=2)
+    tracemalloc.start()
+    _, data = render_pathtracer_ppm(big, out_r, workers=0)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"memory: image {len(data)} bytes, peak parent alloc {peak} bytes "
+          f"(~{peak/len(data):.1f} image copies), "
+          f"max RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss} KiB")
+    (out_r / "render_320x200.ppm").unlink()
+
+    # con seed el render es reproducible (base de la caché de renders)
+    seeded = dict(scene, seed=7)
+    a = render_pathtracer_ppm(seeded, out_r, workers=1)[1]
+    b = render_pathtracer_ppm(seeded, out_r, workers=0)[1]
+    assert a == b, "seeded renders must be identical"
+
     zip_outputs(out_r, out_z, workers=0, on_progress=lambda p,m: print(p,m))
     print("OK")
 
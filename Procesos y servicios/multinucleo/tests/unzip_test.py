@@ -0,0 +1,82 @@
+"""
+Test del unzipper (sin WS):
+- Ida y vuelta zip_outputs -> unzip_archive con store y deflate, con rangos
+  rebajados para que el fichero grande se reparta entre workers
+- Verificación: un byte corrupto da "CRC mismatch" en su entrada
+- Zips de `zipfile` (comentario, directorios) y ZIP64 con umbrales rebajados
+- Nombres peligrosos ('../') rechazados
+
+Uso: python tests/unzip_test.py
+"""
+import os
+import sys
+import tempfile
+import zipfile
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.engines.zip_multicore import unzipper, zipper, zipstream
+
+
+def fixture(root: Path):
+    (root / "sub").mkdir(parents=True)
+    (root / "big.bin").write_bytes((os.urandom(50000) + bytes(100000))*20)
+    (root / "sub" / "ñ.txt").write_bytes(b"hola\n"*1000)
+    for i in range(5):
+        (root / f"s{i}.txt").write_bytes(b"x"*i*100)
+
+def same_tree(a: Path, b: Path):
+    files = sorted(p.relative_to(a) for p in a.rglob("*") if p.is_file())
+    assert files == sorted(p.relative_to(b) for p in b.rglob("*") if p.is_file())
+    for rel in files:
+        assert (a / rel).read_bytes() == (b / rel).read_bytes(), rel
+
+if __name__ == "__main__":
+    zipper.SPLIT_MIN = unzipper.SPLIT_MIN = 2**20
+    zipper.RANGE_SIZE = unzipper.RANGE_SIZE = 2**18
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        src = tmp / "in"
+        fixture(src)
+        for method in ("store", "deflate"):
+            _, path = zipper.zip_outputs(src, tmp / "out", 2, method=method, incremental=False)
+            stats = {}
+            report = unzipper.unzip_archive(path, tmp / method, 2, stats=stats)
+            assert all(r["ok"] for r in report), report
+            same_tree(src, tmp / method)
+            assert stats["files"] == 7 and stats["bad_files"] == 0
+
+            entry = next(e for e in unzipper.read_central_directory(path) if e.name == "big.bin")
+            data = bytearray(path.read_bytes())
+            data[entry.header_offset + 200] ^= 0xff  # dentro del payload de big.bin
+            path.write_bytes(data)
+            bad = [r for r in unzipper.unzip_archive(path, None, 2) if not r["ok"]]
+            assert [r["name"] for r in bad] == ["big.bin"], bad
+            print(f"round trip + verify ({method}): OK, {stats['mb_s']:.1f} MB/s")
+
+        with zipfile.ZipFile(tmp / "py.zip", "w", zipfile.ZIP_DEFLATED) as z:
+            z.writestr("a/b.txt", "hey"*100)
+            z.writestr("dir/", "")
+            z.comment = b"c"*100
+        report = unzipper.unzip_archive(tmp / "py.zip", tmp / "py")
+        assert [r["name"] for r in report] == ["a/b.txt"] and (tmp / "py" / "dir").is_dir()
+
+        saved = zipstream.ZIP64_LIMIT, zipstream.ZIP_FILECOUNT_LIMIT
+        zipstream.ZIP64_LIMIT, zipstream.ZIP_FILECOUNT_LIMIT = 1500, 3
+        try:
+            _, path = zipper.zip_outputs(src, tmp / "out", 1, method="store", incremental=False)
+        finally:
+            zipstream.ZIP64_LIMIT, zipstream.ZIP_FILECOUNT_LIMIT = saved
+        assert all(r["ok"] for r in unzipper.unzip_archive(path, tmp / "z64"))
+        same_tree(src, tmp / "z64")
+        print("zipfile archive + ZIP64: OK")
+
+        with zipfile.ZipFile(tmp / "evil.zip", "w") as z:
+            z.writestr("../evil.txt", "x")
+        try:
+            unzipper.unzip_archive(tmp / "evil.zip", tmp / "evil")
+            raise AssertionError("'../' entry was extracted")
+        except ValueError:
+            pass
+        assert not (tmp / "evil.txt").exists()
+    print("OK")
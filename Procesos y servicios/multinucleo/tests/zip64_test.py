@@ -0,0 +1,90 @@
+"""
+Test ZIP64 del zipper (sin WS), validado con el lector de `zipfile`:
+- Umbrales rebajados (ZIP64_LIMIT, ZIP_FILECOUNT_LIMIT) para ejercitar los
+  extras ZIP64, offsets > límite y el EOCD64 + localizador en segundos
+- Sin ZIP64 cuando no hace falta (el zip pequeño sigue siendo clásico)
+- Con --big: fichero disperso de 4.1 GiB real (lento: ~20 s con deflate nivel 1)
+
+Uso: python tests/zip64_test.py [--big]
+"""
+import os
+import sys
+import tempfile
+import zipfile
+import zlib
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.engines.zip_multicore import zipstream
+from backend.engines.zip_multicore.zipper import zip_outputs
+
+END64 = zipstream.END64_SIG.to_bytes(4, "little")
+
+
+def check(path: Path, src: Path, expect_zip64: bool):
+    raw = path.read_bytes() if path.stat().st_size < 64*2**20 else None
+    with zipfile.ZipFile(path) as z:
+        assert z.testzip() is None, "CRC mismatch"
+        names = sorted(z.namelist())
+        assert names == sorted(str(p.relative_to(src)) for p in src.rglob("*") if p.is_file())
+        if raw is not None:
+            for name in names:
+                assert z.read(name) == (src / name).read_bytes(), name
+    if raw is not None:
+        assert (END64 in raw) == expect_zip64, f"EOCD64 present={END64 in raw}, expected {expect_zip64}"
+
+def small_fixture(root: Path, files: int):
+    for i in range(files):
+        (root / f"f{i:03d}.bin").write_bytes(os.urandom(100) + bytes(2000 + 37*i))
+
+def test_lowered_thresholds(tmp: Path):
+    src = tmp / "small"
+    src.mkdir()
+    small_fixture(src, 20)
+    for method in ("store", "deflate"):
+        _, path = zip_outputs(src, tmp / "out", 1, method=method)
+        check(path, src, expect_zip64=False)
+
+    saved = zipstream.ZIP64_LIMIT, zipstream.ZIP_FILECOUNT_LIMIT
+    zipstream.ZIP64_LIMIT, zipstream.ZIP_FILECOUNT_LIMIT = 1500, 10
+    try:
+        for method in ("store", "deflate"):
+            _, path = zip_outputs(src, tmp / "out", 1, method=method)
+            check(path, src, expect_zip64=True)
+            with zipfile.ZipFile(path) as z:
+                infos = z.infolist()
+                assert any(i.header_offset >= 1500 for i in infos)
+                if method == "store":
+                    assert all(i.file_size >= 1500 for i in infos)
+            print(f"lowered thresholds ({method}): OK, {len(infos)} entries")
+    finally:
+        zipstream.ZIP64_LIMIT, zipstream.ZIP_FILECOUNT_LIMIT = saved
+
+def test_big_sparse(tmp: Path):
+    src = tmp / "big"
+    src.mkdir()
+    big = src / "sparse.bin"
+    size = 4*2**30 + 2**27  # 4.125 GiB, casi todo huecos
+    with open(big, "wb") as f:
+        f.truncate(size)
+        f.seek(size // 2)
+        f.write(b"mitad")
+    (src / "small.txt").write_bytes(b"hola\n")
+    _, path = zip_outputs(src, tmp / "out", 0, method="deflate", level=1)
+    with zipfile.ZipFile(path) as z:
+        info = z.getinfo("sparse.bin")
+        assert info.file_size == size, info.file_size
+        crc = 0
+        with z.open(info) as f:
+            while block := f.read(2**24):
+                crc = zlib.crc32(block, crc)
+        assert crc == info.CRC
+        assert z.read("small.txt") == b"hola\n"
+    print(f"big sparse ({size/2**30:.2f} GiB, deflate): OK, zip {path.stat().st_size/2**20:.1f} MB")
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        test_lowered_thresholds(Path(tmp))
+        if "--big" in sys.argv:
+            test_big_sparse(Path(tmp))
+    print("OK")